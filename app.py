@@ -6,45 +6,223 @@ Semester 4 (Sem4) SGPA for individual and class data.
 """
 
 import io
-import pickle
-from flask import Flask, render_template, request, jsonify, send_file
-import numpy as np
-import pandas as pd
-import logging
-
-from src.DataCleaning import clean_data
+import os
+import time
+from flask import Flask, Response, g, render_template, request, jsonify, send_file, url_for
+
+from src.Analytics import (
+    ANALYTICS_STORE_SIZE,
+    ANALYTICS_TTL,
+    AnalyticsStore,
+    build_cohort_index,
+    upload_digest,
+)
+from src.DataCleaning import clean_marks
 from src.FeatureExtraction import get_combined_sgpa, get_sgpa
+from src.Instrumentation import (
+    configure,
+    flush_metrics,
+    observe_request,
+    render_metrics,
+    stage,
+    start_request,
+)
+from src.JobQueue import JobNotFoundError, JobQueue, QueueFullError
+from src.LogConfig import (
+    LOG_BACKUP_COUNT,
+    LOG_MAX_BYTES,
+    PAGE_VIEW,
+    PAGE_VIEW_SAMPLE_RATE,
+    setup_logging,
+)
+from src.ModelRegistry import ModelNotFoundError, ModelRegistry
+from src.Pipeline import Pipeline, SemesterProcessingError
+from src.Prediction import parse_sgpa_history, predict_histories, predict_what_if
+from src.PredictionCache import PredictionCache
+from src.ResultWriter import CSV_CHUNK_ROWS, iter_csv, iter_gzip
+from src.SemesterCache import SemesterCache, digest_source
+from src.Validation import UploadValidationError, validate_upload
+
+# Models are loaded on first use and reloaded when their file changes
+models = ModelRegistry("models")
 
-with open("models/sem5_model.pkl", "rb") as model_file:
-    sem5_model = pickle.load(model_file)
+# Predictions of repeated SGPA histories, invalidated when a model changes
+prediction_cache = PredictionCache()
 
-with open("models/sem4_model.pkl", "rb") as model_file:
-    sem4_model = pickle.load(model_file)
+app = Flask(__name__)
 
-with open("models/sem3_model.pkl", "rb") as model_file:
-    sem3_model = pickle.load(model_file)
+# How uploaded semester files are processed: "serial", "thread" or "process"
+app.config["SEMESTER_EXECUTOR"] = os.environ.get("EDUINSIGHT_SEMESTER_EXECUTOR", "thread")
+app.config["SEMESTER_WORKERS"] = int(os.environ.get("EDUINSIGHT_SEMESTER_WORKERS", 0)) or None
+
+# Stage timings and request histograms served on /metrics; memory tracing
+# slows every allocation down and is off unless asked for, and its peaks are
+# per process, so concurrent requests add to each other's. Processes sharing
+# EDUINSIGHT_METRICS_DIR (set by gunicorn.conf.py) serve their summed metrics
+app.config["METRICS_ENABLED"] = os.environ.get("EDUINSIGHT_METRICS", "1") != "0"
+app.config["TRACE_MEMORY"] = os.environ.get("EDUINSIGHT_TRACE_MEMORY", "0") == "1"
+app.config["METRICS_DIR"] = os.environ.get("EDUINSIGHT_METRICS_DIR") or None
+configure(app.config["METRICS_ENABLED"], app.config["TRACE_MEMORY"], app.config["METRICS_DIR"])
+
+# Cleaned data and SGPA of uploaded files, keyed by their content
+app.config["DATA_CACHE_DIR"] = os.environ.get("EDUINSIGHT_DATA_CACHE_DIR", "cache")
+app.config["DATA_CACHE_MB"] = int(os.environ.get("EDUINSIGHT_DATA_CACHE_MB", 256))
+
+# Class prediction results are streamed in chunks of rows, gzipped on request
+app.config["CSV_CHUNK_ROWS"] = int(os.environ.get("EDUINSIGHT_CSV_CHUNK_ROWS", CSV_CHUNK_ROWS))
+app.config["GZIP_RESULTS"] = os.environ.get("EDUINSIGHT_GZIP_RESULTS", "1") != "0"
+
+# Background class prediction jobs and their results on disk
+app.config["RESULTS_DIR"] = os.environ.get("EDUINSIGHT_RESULTS_DIR", "results")
+app.config["RESULTS_TTL"] = float(os.environ.get("EDUINSIGHT_RESULTS_TTL", 3600))
+app.config["JOB_WORKERS"] = int(os.environ.get("EDUINSIGHT_JOB_WORKERS", 2))
+app.config["JOB_QUEUE_DEPTH"] = int(os.environ.get("EDUINSIGHT_JOB_QUEUE_DEPTH", 16))
+
+semester_cache = (
+    SemesterCache(app.config["DATA_CACHE_DIR"], app.config["DATA_CACHE_MB"] * 1024 * 1024)
+    if app.config["DATA_CACHE_DIR"]
+    else None
+)
 
-with open("models/sem2_model.pkl", "rb") as model_file:
-    sem2_model = pickle.load(model_file)
+# Clean each semester file and calculate its SGPA concurrently
+pipeline = Pipeline(
+    models,
+    executor=app.config["SEMESTER_EXECUTOR"],
+    max_workers=app.config["SEMESTER_WORKERS"],
+    cache=semester_cache,
+)
 
-app = Flask(__name__)
+jobs = JobQueue(
+    app.config["RESULTS_DIR"],
+    max_workers=app.config["JOB_WORKERS"],
+    max_queued=app.config["JOB_QUEUE_DEPTH"],
+    ttl=app.config["RESULTS_TTL"],
+)
+
+# Cohort analytics of every class upload, served on /api/analytics/<upload id>
+app.config["ANALYTICS_DIR"] = os.environ.get("EDUINSIGHT_ANALYTICS_DIR", "analytics")
+app.config["ANALYTICS_MB"] = int(
+    os.environ.get("EDUINSIGHT_ANALYTICS_MB", ANALYTICS_STORE_SIZE // (1024 * 1024))
+)
+app.config["ANALYTICS_TTL"] = float(os.environ.get("EDUINSIGHT_ANALYTICS_TTL", ANALYTICS_TTL))
+analytics_store = AnalyticsStore(
+    app.config["ANALYTICS_DIR"],
+    max_bytes=app.config["ANALYTICS_MB"] * 1024 * 1024,
+    ttl=app.config["ANALYTICS_TTL"],
+)
+
+
+# JSON log lines written by a background thread to a size-rotated file, or
+# to a file rotated by logrotate with EDUINSIGHT_LOG_MAX_BYTES=0 (the default
+# under gunicorn); only a sample of the page views is kept
+app.config["LOG_FILE"] = os.environ.get("EDUINSIGHT_LOG_FILE", "logs.log")
+app.config["LOG_MAX_BYTES"] = int(os.environ.get("EDUINSIGHT_LOG_MAX_BYTES", LOG_MAX_BYTES))
+app.config["LOG_BACKUP_COUNT"] = int(os.environ.get("EDUINSIGHT_LOG_BACKUPS", LOG_BACKUP_COUNT))
+app.config["PAGE_VIEW_SAMPLE_RATE"] = float(
+    os.environ.get("EDUINSIGHT_PAGE_VIEW_SAMPLE_RATE", PAGE_VIEW_SAMPLE_RATE)
+)
+
+
+
+def start_logging():
+    """
+    Start the logging of this process.
 
+    The listener writing the log is a thread, and threads do not survive a
+    fork, so a gunicorn worker forked from a preloaded master calls this
+    again (see gunicorn.conf.py).
+    """
+    return setup_logging(
+        app.config["LOG_FILE"],
+        max_bytes=app.config["LOG_MAX_BYTES"],
+        backup_count=app.config["LOG_BACKUP_COUNT"],
+        page_view_sample_rate=app.config["PAGE_VIEW_SAMPLE_RATE"],
+    )
+
+
+log_listener = start_logging()
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("logs.log"),
-    ],
+# A minimal result sheet run through the pipeline by 'preload'
+WARM_UP_SHEET = (
+    b"StudentId,StudentName,INT_BIT101,EXT_BIT101,INT_BIT1P1,EXT_BIT1P1\n"
+    b"1,Student1,20,45,AB,11*5\n"
+    b"2,Student2,25,CC,20,30@2\n"
 )
 
 
+def preload():
+    """
+    Load the models and warm up the pipeline in this process.
+
+    Called by gunicorn.conf.py in the master process before the workers are
+    forked: the models are loaded once, and the lazily initialized parts of
+    pandas, the CSV validation and the cleaning code run once, so every
+    worker starts with them instead of paying for them on its first request.
+    """
+    semesters = models.preload()
+    validate_upload(WARM_UP_SHEET)
+    sgpa = get_sgpa(clean_marks(io.BytesIO(WARM_UP_SHEET)))
+    get_combined_sgpa(sgpa, sgpa)
+    app.logger.info("Preloaded the models of %s", ", ".join(f"Sem{s}" for s in semesters))
+
+
+@app.before_request
+def start_timing():
+    """Start timing the request and collecting the stages it runs."""
+    g.request_start = time.perf_counter()
+    g.stage_records = start_request()
+
+
+@app.after_request
+def record_timing(response):
+    """Record the request in the request histogram and log its stages."""
+    if request.endpoint in (None, "metrics", "static"):
+        return response
+
+    observe_request(
+        request.endpoint,
+        request.method,
+        response.status_code,
+        time.perf_counter() - g.request_start,
+    )
+    if g.stage_records:
+        app.logger.info(
+            "Stages of %s: %s",
+            request.endpoint,
+            summarize_stages(g.stage_records),
+            extra={"stages": g.stage_records},
+        )
+    flush_metrics(cache_metrics())
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Endpoint serving the request, stage and cache metrics in Prometheus text format."""
+    return Response(render_metrics(cache_metrics()), mimetype="text/plain; version=0.0.4")
+
+
+def cache_metrics() -> dict:
+    """Return the prediction cache counters as extra metrics for 'render_metrics'."""
+    cache_stats = prediction_cache.stats()
+    return {
+        "eduinsight_prediction_cache_hits_total": (
+            "counter", "Predictions served from the prediction cache.", cache_stats["hits"]
+        ),
+        "eduinsight_prediction_cache_misses_total": (
+            "counter", "Predictions not found in the prediction cache.", cache_stats["misses"]
+        ),
+        "eduinsight_prediction_cache_size": (
+            "gauge", "Predictions currently held by the prediction cache.", cache_stats["size"]
+        ),
+    }
+
+
 @app.route("/", methods=["GET"])
 @app.route("/home", methods=["GET"])
 def home():
     """Render the home page."""
-    app.logger.info("Home page: Accessed Successfully")
+    app.logger.info("Home page: Accessed Successfully", extra=PAGE_VIEW)
     return render_template("index.html")
 
 
@@ -52,7 +230,7 @@ def home():
 def individual_prediction():
     """Endpoint for individual SGPA prediction."""
     if request.method == "GET":
-        app.logger.info("Individual Prediction: Accessed Successfully")
+        app.logger.info("Individual Prediction: Accessed Successfully", extra=PAGE_VIEW)
         return render_template("individual-prediction.html")
     # sem1 = request.form["sem1"]
     # sem2 = request.form["sem2"]
@@ -66,50 +244,91 @@ def individual_prediction():
     # return jsonify({"prediction": predict[0]})
     # Get the form data from the request
     form_data = request.form.to_dict()
-    app.logger.info(
-        f"Individual Prediction: Selected number of semsters: {len(form_data)}"
-    )
+    app.logger.info("Individual Prediction: Selected number of semsters: %d", len(form_data))
 
     # Extract the semester data from the form data
     sem_data = [value for value in form_data.values() if value]
     # for value in form_data.values():
     #     if value:
     #         sem_data.append(value)
-    app.logger.info(
-        f"Individual Prediction: Successfully received the following marks: {sem_data}"
-    )
-
-    # Create a dictionary with the semester data
-    new_data = {f"Sem{i+1}": [sem_data[i]] for i in range(len(sem_data))}
+    app.logger.info("Individual Prediction: Received SGPA of %d semesters", len(sem_data))
 
-    # Create a DataFrame with the semester data
-    df = pd.DataFrame(new_data)
-
-    num_semesters = len(sem_data)
-    if num_semesters == 1:
-        model = sem2_model
-    elif num_semesters == 2:
-        model = sem3_model
-    elif num_semesters == 3:
-        model = sem4_model
-    else:
-        model = sem5_model
+    try:
+        # Validate the semester data and convert it to numbers
+        sem_data = parse_sgpa_history(sem_data)
+    except ValueError as e:
+        app.logger.error("Individual Prediciton: Invalid input \n\t%s", e)
+        return jsonify({"error": str(e)}), 400
 
     try:
         # Make the prediction
-        predict = np.round(model.predict(df), decimals=1)
+        predict = predict_histories(models, [sem_data], prediction_cache)
 
-        return jsonify({"prediction": predict[0]})
+        return jsonify({"prediction": float(predict[0])})
     except Exception as e:
-        app.logger.error(f"Individual Prediciton: Error occured \n\t{str(e)}")
+        app.logger.error("Individual Prediciton: Error occured \n\t%s", e)
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/predict", methods=["POST"])
+def api_predict():
+    """
+    Endpoint for batch SGPA prediction.
+
+    Accepts a JSON array of SGPA histories of mixed length, either directly
+    or as {"histories": [...]}, and returns {"predictions": [...]} in the
+    same order, e.g. [[9.1, 8.5], [7.2]] -> {"predictions": [8.4, 5.8]}.
+    """
+    payload = request.get_json(silent=True)
+    histories = payload.get("histories") if isinstance(payload, dict) else payload
+
+    try:
+        predictions = predict_histories(models, histories, prediction_cache)
+    except (ValueError, ModelNotFoundError) as e:
+        app.logger.error("Batch Prediction: Invalid input \n\t%s", e)
+        return jsonify({"error": str(e)}), 400
+
+    app.logger.info("Batch Prediction: Predicted %d histories", len(predictions))
+    return jsonify({"predictions": predictions.tolist()})
+
+
+@app.route("/api/what-if", methods=["POST"])
+def api_what_if():
+    """
+    Endpoint predicting the next semester SGPA over a grid of possible SGPAs.
+
+    Accepts {"history": [...], "unknown": 1, "min": 0, "max": 10, "step": 0.5},
+    where every field but "history" is optional, and returns the predictions
+    for every combination of values of the unknown semesters, e.g.
+    {"history": [9.1, 8.5], "min": 6, "max": 8, "step": 1} ->
+    {"semesters": ["Sem3"], "values": [6.0, 7.0, 8.0], "predicted": "Sem4",
+    "predictions": [7.4, 7.8, 8.2]}.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+
+    fields = {"unknown": "unknown", "min": "start", "max": "stop", "step": "step"}
+    options = {option: payload[field] for field, option in fields.items() if field in payload}
+    try:
+        surface = predict_what_if(models, payload.get("history") or [], **options)
+    except (ValueError, ModelNotFoundError) as e:
+        app.logger.error("What-if Prediction: Invalid input \n\t%s", e)
+        return jsonify({"error": str(e)}), 400
+
+    app.logger.info(
+        "What-if Prediction: Predicted %d points of %s",
+        len(surface["values"]) ** len(surface["semesters"]),
+        surface["predicted"],
+    )
+    return jsonify(surface)
+
+
 @app.route("/class-prediction", methods=["GET", "POST"])
 def class_prediction():
     """Endpoint for class SGPA prediction."""
     if request.method == "GET":
-        app.logger.info("Class Prediction: Page accessed successfully")
+        app.logger.info("Class Prediction: Page accessed successfully", extra=PAGE_VIEW)
         return render_template("class-prediction.html")
     # sem1 = request.files["sem1"]
     # sem2 = request.files["sem2"]
@@ -130,63 +349,240 @@ def class_prediction():
 
     try:
         # Check that each file is of type CSV
-        for file in files.values():
-            if not file or not file.filename.endswith(".csv"):
-                return (
-                    jsonify(
-                        {"error": "Invalid file type. Only CSV files are allowed."}
-                    ),
-                    400,
-                )
-        # Extract the semester data from the form data
-        sem_data = [clean_data(file) for file in files.values() if file]
-        # for file in files.values():
-        #     if file:
-        #         sem_data.append(clean_data(file))
-        app.logger.info(
-            f"Class Prediction: Recevied files for {len(sem_data)} semesters"
+        error = check_csv_files(files)
+        if error:
+            return jsonify({"error": error}), 400
+        error = validate_files(files)
+        if error:
+            return jsonify(error), 400
+
+        result, upload_id = predict_class(
+            [(file.filename, file) for file in files.values() if file]
         )
 
-        # Create a list of DataFrames with the semester data
-        sem_sgpa = [get_sgpa(df) for df in sem_data]
+        # return jsonify(result.to_dict(orient='records'))
+        # Stream the CSV in row chunks instead of building it in memory
+        response = csv_response(result, "predicted_data.csv")
+        response.headers["X-Analytics-Url"] = url_for("analytics", upload_id=upload_id)
+        return response
 
-        # Determine the appropriate model based on the number of semesters
-        num_semesters = len(sem_sgpa)
-        if num_semesters == 1:
-            model = sem2_model
-        elif num_semesters == 2:
-            model = sem3_model
-        elif num_semesters == 3:
-            model = sem4_model
-        else:
-            model = sem5_model
+    except SemesterProcessingError as e:
+        app.logger.error("Class predicition: Invalid file \n\t %s", e)
+        return jsonify({"error": str(e), "file": e.filename}), 400
 
-        # Combine the semester data
-        result = get_combined_sgpa(*sem_sgpa)
+    except Exception as e:
+        app.logger.error("Class predicition: Error Occured \n\t %s", e)
+        return jsonify({"error": str(e)}), 500
 
-        predict = list(np.round(model.predict(result.iloc[:, 1:]), decimals=1))
-        predict = [0 if x < 4 else x for x in predict]
-        result[f"Sem{num_semesters+1}_Predicted"] = predict
 
-        # return jsonify(result.to_dict(orient='records'))
-        result_csv = result.to_csv(index=False)  # Convert DataFrame to CSV string
-
-        # Create an in-memory file-like object
-        csv_file = io.BytesIO(result_csv.encode())
-
-        # Send the file for download
-        return send_file(
-            csv_file,
-            mimetype="text/csv",
-            as_attachment=True,
-            download_name="predicted_data.csv",
-            conditional=True,
-        )
+@app.route("/class-prediction/jobs", methods=["POST"])
+def submit_class_prediction():
+    """
+    Endpoint submitting a class SGPA prediction as a background job.
+
+    Takes the same files as '/class-prediction' and answers 202 with the job
+    id and the URLs to poll its status and download its result.
+    """
+    files = request.files.to_dict()
+    error = check_csv_files(files)
+    if error:
+        return jsonify({"error": error}), 400
+    error = validate_files(files)
+    if error:
+        return jsonify(error), 400
+
+    try:
+        job_id = jobs.create()
+    except QueueFullError as e:
+        app.logger.error("Class Prediction Job: Rejected \n\t %s", e)
+        return jsonify({"error": str(e)}), 503
 
+    try:
+        # Keep the uploads next to the job, they are gone after this request
+        semester_files = []
+        for semester, file in enumerate((file for file in files.values() if file), 1):
+            path = jobs.path(job_id, f"sem{semester}.csv")
+            file.save(path)
+            semester_files.append((file.filename, path))
+        digests = [digest_source(path)[0] for _, path in semester_files]
+        upload_id = upload_digest(digests)
     except Exception as e:
-        app.logger.error(f"Class predicition: Error Occured \n\t {str(e)}")
+        jobs.fail(job_id, str(e))
+        app.logger.error("Class Prediction Job: Error Occured \n\t %s", e)
         return jsonify({"error": str(e)}), 500
 
+    jobs.start(job_id, run_class_prediction_job, semester_files, digests)
+    app.logger.info("Class Prediction Job: Submitted job %s", job_id)
+
+    return (
+        jsonify(
+            {
+                "job_id": job_id,
+                "status_url": url_for("class_prediction_status", job_id=job_id),
+                "download_url": url_for("class_prediction_result", job_id=job_id),
+                "analytics_url": url_for("analytics", upload_id=upload_id),
+            }
+        ),
+        202,
+    )
+
+
+@app.route("/class-prediction/jobs/<job_id>", methods=["GET"])
+def class_prediction_status(job_id):
+    """Endpoint returning the status of a class prediction job."""
+    try:
+        return jsonify(jobs.status(job_id))
+    except JobNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+
+
+@app.route("/class-prediction/jobs/<job_id>/result", methods=["GET"])
+def class_prediction_result(job_id):
+    """Endpoint downloading the predictions of a finished class prediction job."""
+    try:
+        result_path = jobs.result_path(job_id)
+    except JobNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+
+    if result_path is None:
+        return jsonify({"error": f"Job {job_id} is not finished"}), 409
+
+    return send_file(
+        os.path.abspath(result_path),
+        mimetype="text/csv",
+        as_attachment=True,
+        download_name="predicted_data.csv",
+        conditional=True,
+    )
+
+
+@app.route("/api/analytics/<upload_id>", methods=["GET"])
+def analytics(upload_id):
+    """
+    Endpoint returning the cohort analytics of a class upload.
+
+    The upload id is given by the "X-Analytics-Url" header of
+    '/class-prediction' and the "analytics_url" of a submitted job. The
+    index is built once, with the predictions, so this only reads a file.
+    """
+    index = analytics_store.get(upload_id)
+    if index is None:
+        return jsonify({"error": f"No analytics for upload {upload_id}"}), 404
+    return jsonify(index)
+
+
+def csv_response(df, download_name: str) -> Response:
+    """
+    Stream a DataFrame as a CSV attachment.
+
+    The CSV is written in row chunks while the response is sent and is gzip
+    compressed when enabled and accepted by the client.
+    """
+    chunks = iter_csv(df, app.config["CSV_CHUNK_ROWS"])
+    headers = {
+        "Content-Disposition": f"attachment; filename={download_name}",
+        "Vary": "Accept-Encoding",
+    }
+    if app.config["GZIP_RESULTS"] and "gzip" in request.accept_encodings:
+        chunks = iter_gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(chunks, mimetype="text/csv", headers=headers)
+
+
+def summarize_stages(records: list) -> str:
+    """Sum the stage records of a request per stage, e.g. "clean_data 0.120s 1000 rows"."""
+    totals = {}
+    for record in records:
+        seconds, rows, peak = totals.get(record["stage"], (0.0, None, None))
+        if record["rows"] is not None:
+            rows = (rows or 0) + record["rows"]
+        if record["peak_memory"] is not None:
+            peak = max(peak or 0, record["peak_memory"])
+        totals[record["stage"]] = (seconds + record["seconds"], rows, peak)
+
+    parts = []
+    for name, (seconds, rows, peak) in totals.items():
+        part = f"{name} {seconds:.3f}s"
+        if rows is not None:
+            part += f" {rows} rows"
+        if peak is not None:
+            part += f" {peak / 2**20:.1f}MiB peak"
+        parts.append(part)
+    return ", ".join(parts)
+
+
+def check_csv_files(files: dict) -> str:
+    """Return an error message unless every uploaded file is a CSV file."""
+    for file in files.values():
+        if not file or not file.filename.endswith(".csv"):
+            return "Invalid file type. Only CSV files are allowed."
+    return None
+
+
+def validate_files(files: dict) -> dict:
+    """
+    Check the header and first rows of every uploaded file before any parsing.
+
+    Returns:
+    - dict: The error of the first invalid file, with the file, semester,
+    column and row at fault, or None if every file passed.
+    """
+    for semester, file in enumerate((file for file in files.values() if file), 1):
+        try:
+            validate_upload(file)
+        except UploadValidationError as e:
+            app.logger.error("Class Prediction: Invalid file %s \n\t %s", file.filename, e)
+            return {**e.to_dict(), "file": file.filename, "semester": semester}
+    return None
+
+
+def predict_class(files: list, digests: list = None):
+    """
+    Run the class prediction pipeline on uploaded semester files.
+
+    Parameters:
+    - files (list): (filename, source) pairs in semester order.
+    - digests (list): The 'digest_source' of each file, if already known.
+
+    Returns:
+    - tuple: The combined SGPA of every student with the predicted SGPA of
+    the next semester in "Sem<N>_Predicted", and the upload id of the
+    cohort analytics of the files.
+    """
+    # Identify the upload by its content. Uploads are hashed block by block
+    # and rewound, and the digests are reused as the semester cache keys
+    if digests is None:
+        digests = [digest_source(source)[0] for _, source in files]
+    upload_id = upload_digest(digests)
+
+    prediction = pipeline.run(files, digests)
+    app.logger.info(
+        "Class Prediction: Predicted %d students from %d semesters",
+        len(prediction.result),
+        len(prediction.sem_sgpa),
+    )
+
+    # Built once per upload and model, from the predictions before failing
+    # ones are shown as 0
+    if analytics_store.get(upload_id, prediction.model_version) is None:
+        with stage("analytics", len(prediction.result)):
+            analytics_store.put(
+                upload_id,
+                build_cohort_index(prediction.sem_sgpa, prediction.result, prediction.predicted),
+                prediction.model_version,
+            )
+
+    return prediction.result, upload_id
+
+
+def run_class_prediction_job(result_path: str, files: list, digests: list = None):
+    """Background job writing the class predictions of 'files' to 'result_path'."""
+    try:
+        predict_class(files, digests)[0].to_csv(result_path, index=False)
+    finally:
+        # The job outlives its request, so its stages are written here
+        flush_metrics(cache_metrics())
+
 
 if __name__ == "__main__":
     app.logger.info("Starting the Flask application....")
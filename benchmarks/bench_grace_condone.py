@@ -0,0 +1,52 @@
+"""
+Benchmark: per-cell vs column-wise grace/condone parsing
+
+Compares 'DataFrame.map(parse_grace_condone)' with
+'DataFrame.apply(parse_grace_condone_column)' on synthetic result sheets.
+
+Usage:
+    python -m benchmarks.bench_grace_condone --students 1000 10000 100000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import as_uploaded, generate_semester
+from src.DataCleaning import parse_grace_condone, parse_grace_condone_column
+
+
+def best_of(func, repeat: int) -> float:
+    """Return the fastest of 'repeat' runs of 'func' in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--students", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--marker-rate", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'students':>10} {'per-cell (s)':>14} {'column (s)':>12} {'speedup':>9}")
+    for students in args.students:
+        df = as_uploaded(generate_semester(1, students, marker_rate=args.marker_rate))
+        subjects = df[[col for col in df.columns if "BIT" in col]]
+
+        pd.testing.assert_frame_equal(
+            subjects.map(parse_grace_condone),
+            subjects.apply(parse_grace_condone_column),
+        )
+
+        per_cell = best_of(lambda: subjects.map(parse_grace_condone), args.repeat)
+        column = best_of(lambda: subjects.apply(parse_grace_condone_column), args.repeat)
+        print(f"{students:>10} {per_cell:>14.4f} {column:>12.4f} {per_cell / column:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
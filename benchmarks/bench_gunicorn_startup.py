@@ -0,0 +1,176 @@
+"""
+Benchmark: gunicorn startup with and without preloading
+
+Starts the web application under gunicorn (gunicorn.conf.py) for a growing
+number of workers, with and without EDUINSIGHT_PRELOAD, and reports the time
+from launch to the first successful prediction, and the RSS and PSS of the
+master and of each worker after a round of predictions. PSS divides shared
+pages among the processes sharing them, so the total PSS is what the whole
+server really costs. Linux only (memory is read from /proc).
+
+Usage:
+    python -m benchmarks.bench_gunicorn_startup --workers 1 2 4 8 --output startup.json
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.bench_pipeline import environment
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A prediction request, which needs the models of the worker answering it
+PREDICT_BODY = json.dumps({"histories": [[9.1, 8.5, 8.9], [7.2]]}).encode()
+
+
+def free_port() -> int:
+    """Return a TCP port nobody listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory(pid: int) -> dict:
+    """Return the RSS and PSS of a process in bytes, from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key.lower()] = int(rest.split()[0]) * 1024
+    return values
+
+
+def children(pid: int) -> list:
+    """Return the child processes of a process: the workers of a gunicorn master."""
+    with open(f"/proc/{pid}/task/{pid}/children") as children_file:
+        return [int(child) for child in children_file.read().split()]
+
+
+def predict(port: int):
+    """Send one prediction request."""
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/api/predict",
+        data=PREDICT_BODY,
+        headers={"Content-Type": "application/json", "Connection": "close"},
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        response.read()
+
+
+def bench_server(
+    workers: int, preload: bool, directory: str, timeout: float, requests: int
+) -> dict:
+    """
+    Start gunicorn, time its first response and measure its memory.
+
+    Parameters:
+    - requests (int): Predictions sent per worker after the first response,
+    so that workers without preloading load their models too before the
+    memory is measured.
+
+    Returns:
+    - dict: The seconds to the first response and the memory of the master
+    and each worker.
+    """
+    port = free_port()
+    env = {
+        **os.environ,
+        "EDUINSIGHT_PRELOAD": "1" if preload else "0",
+        "EDUINSIGHT_DATA_CACHE_DIR": "",
+        "EDUINSIGHT_RESULTS_DIR": os.path.join(directory, "results"),
+        "EDUINSIGHT_ANALYTICS_DIR": os.path.join(directory, "analytics"),
+        "EDUINSIGHT_LOG_FILE": os.path.join(directory, "logs.log"),
+    }
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn",
+            "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+            "--chdir", ROOT,
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(workers),
+            "app:app",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"No response from gunicorn in {timeout}s")
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {server.returncode}")
+            try:
+                predict(port)
+                break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        first = time.perf_counter() - start
+
+        for _ in range(requests * workers):
+            predict(port)
+        worker_memory = [memory(pid) for pid in children(server.pid)]
+        return {
+            "workers": workers,
+            "preload": preload,
+            "first_response_seconds": first,
+            "master": memory(server.pid),
+            "worker_memory": worker_memory,
+            "total_pss": memory(server.pid)["pss"] + sum(entry["pss"] for entry in worker_memory),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=20, help="predictions sent per worker")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for a server")
+    parser.add_argument("--output", default=None, help="JSON file the results are written to")
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'workers':>7} {'preload':>7} {'first (s)':>10} "
+        f"{'master RSS':>11} {'worker RSS':>11} {'worker PSS':>11} {'total PSS':>10}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            for preload in (False, True):
+                entry = bench_server(workers, preload, directory, args.timeout, args.requests)
+                results.append(entry)
+                worker_rss = sum(m["rss"] for m in entry["worker_memory"]) / workers
+                worker_pss = sum(m["pss"] for m in entry["worker_memory"]) / workers
+                print(
+                    f"{workers:>7} {str(preload):>7} {entry['first_response_seconds']:>10.3f} "
+                    f"{entry['master']['rss'] / 2**20:>9.1f}MB "
+                    f"{worker_rss / 2**20:>9.1f}MB {worker_pss / 2**20:>9.1f}MB "
+                    f"{entry['total_pss'] / 2**20:>8.1f}MB"
+                )
+
+    if args.output:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": environment(),
+            "parameters": vars(args),
+            "results": results,
+        }
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Benchmark: serial vs parallel processing of semester uploads
+
+Times 'process_semesters' with the serial, thread and process executors for
+uploads of several large semester files.
+
+Usage:
+    python -m benchmarks.bench_parallel_semesters --semesters 4 6 8 --students 50000
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.bench_grace_condone import best_of
+from benchmarks.synthetic import write_cohort
+from src.Pipeline import EXECUTORS, process_semesters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--semesters", type=int, nargs="+", default=[4, 6, 8])
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}, students per semester: {args.students}")
+    print(f"{'semesters':>10} " + " ".join(f"{name + ' (s)':>12}" for name in EXECUTORS))
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_cohort(directory, args.students, max(args.semesters))
+        for semesters in args.semesters:
+            files = [(os.path.basename(path), path) for path in paths[:semesters]]
+            timings = [
+                best_of(
+                    lambda: process_semesters(files, executor, args.workers), args.repeat
+                )
+                for executor in EXECUTORS
+            ]
+            print(f"{semesters:>10} " + " ".join(f"{timing:>12.3f}" for timing in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmark: end-to-end class prediction pipeline
+
+Times every stage of a class prediction on synthetic cohorts, on the path
+the web application runs: 'clean_marks' and 'get_sgpa' on 'CleanedMarks' for
+each semester file, the chunked 'process_semester' that combines them,
+'get_combined_sgpa', the model predict, the gzip-compressed CSV of the
+result, and the whole class prediction (validation, 'Pipeline.run' and the
+CSV) as '/class-prediction' does it, without importing the application.
+Results are written as JSON and can be compared with an earlier run to
+catch regressions.
+
+Usage:
+    python -m benchmarks.bench_pipeline --students 1000 10000 100000 --output after.json
+    python -m benchmarks.bench_pipeline --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_grace_condone import best_of
+from benchmarks.synthetic import PRACTICAL_SUBJECTS, THEORY_SUBJECTS, write_cohort
+from src.DataCleaning import clean_marks
+from src.FeatureExtraction import get_combined_sgpa, get_sgpa
+from src.ModelRegistry import ModelRegistry
+from src.Pipeline import Pipeline, process_semester
+from src.ResultWriter import iter_csv, iter_gzip
+from src.Validation import validate_upload
+
+# Stages timed for every cohort, in pipeline order
+STAGES = (
+    "clean_marks",
+    "get_sgpa",
+    "process_semester",
+    "get_combined_sgpa",
+    "predict",
+    "write_csv",
+    "class_prediction",
+)
+
+
+def environment() -> dict:
+    """Describe the machine and library versions a run was made with."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def bench_cohort(registry, paths: list, repeat: int) -> dict:
+    """
+    Time each stage of the pipeline on the semester files of one cohort.
+
+    Parameters:
+    - registry (ModelRegistry): The registry providing the models.
+    - paths (list): The semester files, Sem1 first.
+    - repeat (int): Runs per stage; the fastest is kept.
+
+    Returns:
+    - dict: The best time of each stage in seconds, with the number of rows.
+    """
+    timings = {
+        "clean_marks": best_of(lambda: [clean_marks(path) for path in paths], repeat)
+    }
+    cleaned = [clean_marks(path) for path in paths]
+    timings["get_sgpa"] = best_of(lambda: [get_sgpa(sem) for sem in cleaned], repeat)
+    timings["process_semester"] = best_of(
+        lambda: [process_semester(path) for path in paths], repeat
+    )
+    sgpa = [process_semester(path) for path in paths]
+    timings["get_combined_sgpa"] = best_of(lambda: get_combined_sgpa(*sgpa), repeat)
+    combined = get_combined_sgpa(*sgpa)
+
+    model = registry.for_history(len(paths))
+    timings["predict"] = best_of(lambda: model.predict(combined.iloc[:, 1:]), repeat)
+    timings["write_csv"] = best_of(lambda: b"".join(iter_gzip(iter_csv(combined))), repeat)
+
+    # What '/class-prediction' does with the uploads, minus the HTTP layer
+    # and the analytics, which are built once per upload
+    pipeline = Pipeline(registry)
+
+    def class_prediction():
+        files = [(os.path.basename(path), open(path, "rb")) for path in paths]
+        try:
+            for _, file in files:
+                validate_upload(file)
+            prediction = pipeline.run(files)
+            b"".join(iter_gzip(iter_csv(prediction.result)))
+        finally:
+            for _, file in files:
+                file.close()
+
+    timings["class_prediction"] = best_of(class_prediction, repeat)
+    return {"rows": len(combined), "seconds": timings}
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """
+    Compare a run with a baseline run.
+
+    Returns:
+    - list: (students, stage, baseline seconds, seconds) of every stage that
+    is more than 'tolerance' slower than in the baseline.
+    """
+    previous = {entry["students"]: entry["seconds"] for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        for stage, seconds in entry["seconds"].items():
+            before = previous.get(entry["students"], {}).get(stage)
+            if before is not None and seconds > before * (1 + tolerance):
+                regressions.append((entry["students"], stage, before, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--students", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--semesters", type=int, default=4, help="files uploaded per cohort")
+    parser.add_argument("--theory-subjects", type=int, default=THEORY_SUBJECTS)
+    parser.add_argument("--practical-subjects", type=int, default=PRACTICAL_SUBJECTS)
+    parser.add_argument("--marker-rate", type=float, default=0.01)
+    parser.add_argument("--dropout-rate", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="JSON file the results are written to")
+    parser.add_argument("--compare", default=None, help="JSON results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        registry = ModelRegistry("models")
+
+        results = []
+        print(f"{'students':>10} {'rows':>8} " + " ".join(f"{stage:>18}" for stage in STAGES))
+        for students in args.students:
+            cohort = os.path.join(directory, str(students))
+            os.makedirs(cohort)
+            paths = write_cohort(
+                cohort,
+                students,
+                args.semesters,
+                marker_rate=args.marker_rate,
+                theory_subjects=args.theory_subjects,
+                practical_subjects=args.practical_subjects,
+                dropout_rate=args.dropout_rate,
+                shuffle_subjects=True,
+            )
+            entry = {"students": students, **bench_cohort(registry, paths, args.repeat)}
+            results.append(entry)
+            print(
+                f"{students:>10} {entry['rows']:>8} "
+                + " ".join(f"{entry['seconds'][stage]:>18.4f}" for stage in STAGES)
+            )
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "parameters": vars(args),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for students, stage, before, seconds in regressions:
+            print(f"REGRESSION {students} students, {stage}: {before:.4f}s -> {seconds:.4f}s")
+        if regressions:
+            sys.exit(1)
+        print(f"No stage is more than {args.tolerance:.0%} slower than {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: column loop vs matrix SGPA computation
+
+Compares the previous column-by-column 'get_sgpa' (kept below as
+'get_sgpa_loop') with the matrix implementation in 'src.FeatureExtraction',
+and checks that both produce the same frame.
+
+Usage:
+    python -m benchmarks.bench_sgpa --students 1000 100000 1000000
+"""
+import argparse
+import re
+
+import pandas as pd
+
+from benchmarks.bench_grace_condone import best_of
+from benchmarks.synthetic import as_uploaded, generate_semester
+from src.DataCleaning import ID_COLUMNS, clean_frame
+from src.FeatureExtraction import calculate_credits, calculate_practical_percentage, get_sgpa
+
+
+def get_sgpa_loop(sem_data: pd.DataFrame) -> pd.DataFrame:
+    """The column-by-column 'get_sgpa' used before the matrix implementation."""
+    subject_columns = [col for col in sem_data.columns if col.startswith(("INT", "EXT"))]
+    subject_columns = sorted(subject_columns)
+    credits_df = pd.DataFrame()
+    credits_df["StudentId"] = sem_data.StudentId
+    credits_df["StudentName"] = sem_data.StudentName
+
+    for subject_column in subject_columns:
+        subject_name = subject_column.split("_")[1]
+        total_marks = sem_data[subject_column].astype("int") + sem_data[
+            subject_column.replace("EXT", "INT")
+        ].astype("int")
+        if re.match(r"BIT(\d{1})P(\d{1})", subject_name):
+            total_marks = calculate_practical_percentage(total_marks)
+        subject_columns.remove(subject_column.replace("EXT", "INT"))
+        credits_df[subject_name] = calculate_credits(total_marks)
+
+    numeric_columns = credits_df.iloc[:, 2:].apply(pd.to_numeric)
+    credits_df["GPA"] = numeric_columns.sum(axis=1) / 10
+    return credits_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--students", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'students':>10} {'loop (s)':>10} {'matrix (s)':>11} {'speedup':>9}")
+    for students in args.students:
+        sheet = as_uploaded(generate_semester(1, students))
+        subject_columns = [col for col in sheet.columns if "BIT" in col]
+        cleaned, _ = clean_frame(sheet[ID_COLUMNS + subject_columns], subject_columns)
+
+        pd.testing.assert_frame_equal(get_sgpa_loop(cleaned), get_sgpa(cleaned), check_exact=True)
+
+        loop = best_of(lambda: get_sgpa_loop(cleaned), args.repeat)
+        matrix = best_of(lambda: get_sgpa(cleaned), args.repeat)
+        print(f"{students:>10} {loop:>10.4f} {matrix:>11.4f} {loop / matrix:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Synthetic Cohort Generator
+
+This module generates semester result sheets in the same layout as the
+university exports in 'data/Sem*.csv', for use by the benchmarks.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+THEORY_SUBJECTS = 5
+PRACTICAL_SUBJECTS = 5
+
+
+def subject_codes(
+    semester: int,
+    theory_subjects: int = THEORY_SUBJECTS,
+    practical_subjects: int = PRACTICAL_SUBJECTS,
+) -> list:
+    """
+    Return the subject codes of a semester, e.g. BIT101 ... BIT1P5.
+
+    Parameters:
+    - semester (int): The semester number.
+    - theory_subjects (int): Number of theory subjects.
+    - practical_subjects (int): Number of practical subjects.
+
+    Returns:
+    - list: Theory subject codes followed by practical subject codes.
+    """
+    theory = [f"BIT{semester}{i:02d}" for i in range(1, theory_subjects + 1)]
+    practical = [f"BIT{semester}P{i}" for i in range(1, practical_subjects + 1)]
+    return theory + practical
+
+
+def generate_semester(
+    semester: int,
+    num_students: int,
+    marker_rate: float = 0.01,
+    seed: int = 0,
+    theory_subjects: int = THEORY_SUBJECTS,
+    practical_subjects: int = PRACTICAL_SUBJECTS,
+    dropout_rate: float = 0.0,
+    shuffle_subjects: bool = False,
+) -> pd.DataFrame:
+    """
+    Generate a semester result sheet for a synthetic cohort.
+
+    Parameters:
+    - semester (int): The semester number used for the subject codes.
+    - num_students (int): Number of students in the cohort.
+    - marker_rate (float): Fraction of mark cells replaced with 'AB', 'CC',
+    grace ('11*5') or condone ('79@1') entries.
+    - seed (int): Seed for the random number generator.
+    - theory_subjects (int): Number of theory subjects.
+    - practical_subjects (int): Number of practical subjects.
+    - dropout_rate (float): Fraction of the cohort leaving before each
+    semester after the first. The same students leave whatever the semester.
+    - shuffle_subjects (bool): Shuffle the order of the subject column pairs,
+    as the university exports do.
+
+    Returns:
+    - pd.DataFrame: A DataFrame with the columns of the university export.
+
+    Explanation:
+    Students keep the same 'StudentId' and 'StudentName' in every semester,
+    so sheets generated for semesters 1..N of the same size can be combined
+    with 'get_combined_sgpa'. Theory subjects are marked out of 40 (internal)
+    and 60 (external) and practicals out of 25 and 25.
+    """
+    rng = np.random.default_rng(seed + semester)
+    ids = np.arange(1_000_000, 1_000_000 + num_students)
+    if dropout_rate:
+        # Drawn from a generator shared by every semester, so a student who
+        # left does not come back in a later semester
+        leaves = np.random.default_rng(seed).random(num_students)
+        ids = ids[leaves >= dropout_rate * (semester - 1)]
+        num_students = len(ids)
+
+    df = pd.DataFrame(
+        {
+            "CourseName": f"BSC (IT) {semester}",
+            "SectionName": "A",
+            "SessionName": "OCT-23",
+            "StudentId": ids,
+            "ExamRollNumber": [f"S{semester}/R/ {i}" for i in ids],
+            "StudentName": [f"STUDENT {i}" for i in ids],
+        }
+    )
+
+    codes = subject_codes(semester, theory_subjects, practical_subjects)
+    if shuffle_subjects:
+        codes = list(rng.permutation(codes))
+
+    total = np.zeros(num_students, dtype=np.int64)
+    for code in codes:
+        practical = "P" in code[3:]
+        int_max, ext_max = (25, 25) if practical else (40, 60)
+        int_marks = rng.integers(int_max // 3, int_max + 1, num_students)
+        ext_marks = rng.integers(ext_max // 4, ext_max + 1, num_students)
+        total += int_marks + ext_marks
+        df[f"INT_{code}"] = int_marks
+        df[f"EXT_{code}"] = _add_markers(ext_marks, marker_rate, rng)
+
+    df["Remark"] = "PASS"
+    df["Grade"] = "A"
+    df["TotalMarksObtained"] = total
+    df["TotalMarks"] = 50 * len(codes) + 50 * theory_subjects
+    df["CreditsEarned"] = 20
+    df["Percentage"] = np.round(total / df["TotalMarks"] * 100, 2)
+    df["SGPA"] = np.round(total / df["TotalMarks"] * 10, 1)
+    return df
+
+
+def _add_markers(marks: np.ndarray, marker_rate: float, rng) -> pd.Series:
+    """Replace a fraction of the marks with the special entries of the export."""
+    column = pd.Series(marks, dtype=object)
+    picked = np.flatnonzero(rng.random(len(marks)) < marker_rate)
+    if not len(picked):
+        return pd.Series(marks)
+
+    kinds = rng.integers(0, 4, len(picked))
+    for index, kind in zip(picked, kinds):
+        mark = max(int(marks[index]) - 3, 0)
+        column[index] = ("AB", "CC", f"{mark}*3", f"{mark}@3")[kind]
+    return column
+
+
+def as_uploaded(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Round-trip a generated sheet through CSV text, the way an upload is read.
+
+    Columns holding special entries then come back as text, exactly like the
+    'pd.read_csv' call in 'clean_data'.
+    """
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    buffer.seek(0)
+    return pd.read_csv(buffer)
+
+
+def write_cohort(directory, num_students: int, num_semesters: int, **kwargs) -> list:
+    """
+    Write 'Sem1.csv' ... 'SemN.csv' for a synthetic cohort into a directory.
+
+    Returns:
+    - list: The paths of the written files in semester order.
+    """
+    paths = []
+    for semester in range(1, num_semesters + 1):
+        path = f"{directory}/Sem{semester}.csv"
+        generate_semester(semester, num_students, **kwargs).to_csv(path, index=False)
+        paths.append(path)
+    return paths
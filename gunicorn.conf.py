@@ -0,0 +1,90 @@
+"""
+Gunicorn configuration of the web application.
+
+With preloading (the default) the application is imported, the models are
+loaded and the pipeline is warmed up once in the master process, then the
+objects are frozen out of the garbage collector before the workers are
+forked, so the workers share those pages copy-on-write and answer their
+first request without loading anything.
+
+The master and every worker append to the same log file, which only one
+process may rotate safely, so the application's own size-based rotation is
+turned off (EDUINSIGHT_LOG_MAX_BYTES=0): rotate the file with logrotate,
+and each process reopens it once it has been moved.
+
+Every worker writes its metrics to EDUINSIGHT_METRICS_DIR (by default a
+directory named after the master's pid in the temporary directory), and
+/metrics adds up those of all the workers, so a scrape does not depend on
+the worker that answers it.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app:app
+    EDUINSIGHT_PRELOAD=0 WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py app:app
+"""
+import gc
+import os
+import tempfile
+
+bind = os.environ.get("EDUINSIGHT_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+preload_app = os.environ.get("EDUINSIGHT_PRELOAD", "1") != "0"
+
+# Read by app.py when it is imported, in the master or in each worker
+os.environ.setdefault("EDUINSIGHT_LOG_MAX_BYTES", "0")
+metrics_dir = os.environ.setdefault(
+    "EDUINSIGHT_METRICS_DIR",
+    os.path.join(tempfile.gettempdir(), f"eduinsight-metrics-{os.getpid()}"),
+)
+
+
+def on_starting(server):
+    """Start the metrics of this server from zero."""
+    os.makedirs(metrics_dir, exist_ok=True)
+    _remove_metrics()
+
+
+def on_exit(server):
+    """Remove the metrics of the workers, and their directory once empty."""
+    _remove_metrics()
+    try:
+        os.rmdir(metrics_dir)
+    except OSError:
+        pass
+
+
+def _remove_metrics():
+    """Delete the metrics files of earlier workers, leaving anything else alone."""
+    for name in os.listdir(metrics_dir):
+        if name.endswith(".json"):
+            os.remove(os.path.join(metrics_dir, name))
+
+
+def child_exit(server, worker):
+    """Keep the counters of an exited worker, but not its gauges."""
+    from src.Instrumentation import mark_process_dead
+
+    mark_process_dead(metrics_dir, worker.pid)
+
+
+def when_ready(server):
+    """Load the models and warm up the pipeline in the master, before the first fork."""
+    if not preload_app:
+        return
+    import app
+
+    app.preload()
+    # Objects that exist now are never collected; keeping the collector away
+    # from them keeps their pages shared with the workers
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Restart the logging thread and the metrics of the preloaded application in the worker."""
+    if not preload_app:
+        return
+    import app
+    from src.Instrumentation import reset_metrics
+
+    app.log_listener = app.start_logging()
+    # The stages the master ran while preloading are not this worker's
+    reset_metrics()
@@ -0,0 +1,267 @@
+"""
+Analytics Module
+
+This module builds the cohort analytics of a class upload (per-subject
+credit histograms and pass/fail counts, SGPA quantiles and the students at
+risk of failing the predicted semester) from the frames the prediction
+pipeline already computes, and keeps them on disk as small JSON indexes
+keyed by the content of the upload.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.FeatureExtraction import CREDIT_LABELS
+
+# Version of the index layout written by 'build_cohort_index'
+ANALYTICS_VERSION = 1
+
+# Quantiles of the SGPA reported for every semester
+QUANTILES = (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+
+# A predicted SGPA below this fails the semester
+AT_RISK_SGPA = 4
+
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Largest total size of the stored indexes
+ANALYTICS_STORE_SIZE = 64 * 1024 * 1024
+
+# Seconds an index is kept after it was last written or read
+ANALYTICS_TTL = 7 * 24 * 3600
+
+
+def upload_digest(digests: list) -> str:
+    """
+    Identify an upload by the content of its semester files.
+
+    Parameters:
+    - digests (list): The SHA-256 of each semester file, in semester order,
+    as returned by 'SemesterCache.digest_source'.
+
+    Returns:
+    - str: The hex SHA-256 of the ordered digests. The same files uploaded
+    again in the same order get the same id.
+    """
+    return hashlib.sha256("\n".join(digests).encode()).hexdigest()
+
+
+def subject_summary(sgpa: pd.DataFrame) -> dict:
+    """
+    Summarize the credits of every subject of a semester.
+
+    Parameters:
+    - sgpa (pd.DataFrame): The 'get_sgpa' result of a semester file.
+
+    Returns:
+    - dict: For each subject, the number of students per credit ("0", "4",
+    ..., "10" and "invalid" for marks outside the credit bins) and the number
+    of students who passed (credit above 0) and failed.
+
+    Explanation:
+    The subject columns are categoricals over 'CREDIT_LABELS', so their codes
+    are counted with a single bincount each. Marks outside the bins count as
+    0 credits in the GPA, so they are counted as failed here too.
+
+    Example:
+    >>> subject_summary(get_sgpa(clean_data("data/Sem1.csv")))["BIT101"]
+    {'credits': {'0': 12, '4': 9, ..., '10': 41, 'invalid': 0},
+     'passed': 265, 'failed': 12}
+
+    """
+    subjects = {}
+    for name in sgpa.columns:
+        column = sgpa[name]
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            continue
+        # Code -1 (invalid) is moved to the last slot
+        codes = column.cat.codes.to_numpy()
+        counts = np.roll(np.bincount(codes + 1, minlength=len(CREDIT_LABELS) + 1), -1)
+        credits = {str(label): int(count) for label, count in zip(CREDIT_LABELS, counts)}
+        credits["invalid"] = int(counts[-1])
+        passed = int(counts[1:-1].sum())
+        subjects[name] = {"credits": credits, "passed": passed, "failed": len(column) - passed}
+    return subjects
+
+
+def sgpa_quantiles(values) -> dict:
+    """Return the QUANTILES of SGPA values keyed by quantile, e.g. {"0.5": 7.2}."""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {str(q): None for q in QUANTILES}
+    return {
+        str(q): round(float(value), 2) for q, value in zip(QUANTILES, np.quantile(values, QUANTILES))
+    }
+
+
+def build_cohort_index(sem_sgpa: list, result: pd.DataFrame, predicted: np.ndarray) -> dict:
+    """
+    Build the analytics of a class upload.
+
+    Parameters:
+    - sem_sgpa (list): The 'get_sgpa' result of each semester file, in
+    semester order.
+    - result (pd.DataFrame): Their 'get_combined_sgpa' result.
+    - predicted (np.ndarray): The SGPA predicted for each row of 'result',
+    before predictions below AT_RISK_SGPA are shown as 0.
+
+    Returns:
+    - dict: JSON-serializable analytics: for every semester its students,
+    SGPA quantiles and 'subject_summary', and for the predicted semester the
+    SGPA quantiles and the students at risk with their predicted SGPA,
+    lowest first.
+
+    Example:
+    >>> index = build_cohort_index(sem_sgpa, result, predicted)
+    >>> index["predicted"]["at_risk"][0]
+    {'StudentName': 'A STUDENT', 'predicted': 3.1}
+
+    """
+    predicted = np.asarray(predicted, dtype=np.float64)
+    at_risk = np.flatnonzero(predicted < AT_RISK_SGPA)
+    at_risk = at_risk[np.argsort(predicted[at_risk], kind="stable")]
+    names = result["StudentName"].to_numpy()
+
+    return {
+        "version": ANALYTICS_VERSION,
+        "students": len(result),
+        "semesters": [
+            {
+                "semester": semester,
+                "students": len(sgpa),
+                "sgpa_quantiles": sgpa_quantiles(sgpa["GPA"]),
+                "subjects": subject_summary(sgpa),
+            }
+            for semester, sgpa in enumerate(sem_sgpa, start=1)
+        ],
+        "predicted": {
+            "semester": len(sem_sgpa) + 1,
+            "sgpa_quantiles": sgpa_quantiles(predicted),
+            "at_risk_below": AT_RISK_SGPA,
+            "at_risk": [
+                {"StudentName": str(names[row]), "predicted": float(predicted[row])}
+                for row in at_risk
+            ],
+        },
+    }
+
+
+class AnalyticsStore:
+    """
+    Cohort analytics indexes stored as JSON files.
+
+    Parameters:
+    - directory (str): The directory holding one "<upload id>.json" file per
+    upload. It is created if missing.
+    - max_bytes (int): The largest total size of the stored indexes.
+    - ttl (float): Seconds after its last use before an index expires.
+
+    Explanation:
+    Indexes are written atomically, so every process sharing the directory
+    (e.g. every gunicorn worker on the host) can serve an index as soon as
+    it exists. An index records the version of the model that made its
+    predictions, and 'get' can ignore an index made by an older model.
+
+    As in 'SemesterCache', reading an index refreshes its modification time.
+    Every 'put' evicts the indexes unused for longer than 'ttl', then the
+    least recently used ones until the directory fits 'max_bytes'.
+
+    Example:
+    >>> store = AnalyticsStore("analytics")
+    >>> store.put(upload_id, index)
+    >>> store.get(upload_id)["students"]
+    277
+
+    """
+
+    def __init__(
+        self, directory: str, max_bytes: int = ANALYTICS_STORE_SIZE, ttl: float = ANALYTICS_TTL
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, upload_id: str, model_version=None) -> dict:
+        """
+        Return the index of an upload, or None if there is none.
+
+        Parameters:
+        - upload_id (str): The 'upload_digest' of the upload.
+        - model_version: If given, an index made by another model version is
+        treated as missing.
+        """
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            return None
+        path = self._path(upload_id)
+        try:
+            if os.stat(path).st_mtime < time.time() - self.ttl:
+                return None
+            with open(path) as index_file:
+                index = json.load(index_file)
+        except FileNotFoundError:
+            return None
+        if index.get("version") != ANALYTICS_VERSION:
+            return None
+        if model_version is not None and index.get("model_version") != _jsonable(model_version):
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return index
+
+    def put(self, upload_id: str, index: dict, model_version=None) -> dict:
+        """Atomically store the index of an upload, evict old ones and return it as stored."""
+        index = {
+            **index,
+            "upload_id": upload_id,
+            "model_version": _jsonable(model_version),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        temporary = f"{self._path(upload_id)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as index_file:
+            json.dump(index, index_file)
+        os.replace(temporary, self._path(upload_id))
+        self.evict()
+        return index
+
+    def evict(self):
+        """
+        Delete the expired indexes, then the least recently used ones until
+        the store fits 'max_bytes'.
+        """
+        deadline = time.time() - self.ttl
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((info.st_mtime, info.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, name in sorted(entries):
+            if mtime >= deadline and total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.json")
+
+
+def _jsonable(value):
+    """Return a version token as it reads back from JSON (tuples become lists)."""
+    return json.loads(json.dumps(value))
@@ -0,0 +1,136 @@
+"""
+Cleaned Marks Module
+
+This module defines the compact, typed form of a cleaned result sheet: one
+contiguous integer matrix of marks, a matching matrix of flags recording
+which cells were absent, copy cases or grace/condone entries, and the
+student ids and names.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Marks are small integers; int16 keeps negative and out-of-range entries
+MARKS_DTYPE = np.int16
+
+# Bits of the flags matrix
+ABSENT = 1
+COPY_CASE = 2
+GRACE = 4
+
+
+@dataclass(frozen=True)
+class CleanedMarks:
+    """
+    A cleaned result sheet.
+
+    Attributes:
+    - student_ids (np.ndarray): The int64 'StudentId' of each student.
+    - student_names (pd.Categorical): The 'StudentName' of each student.
+    - columns (tuple): The subject columns, in header order, e.g.
+    ("INT_BIT102", "EXT_BIT102", ...).
+    - marks (np.ndarray): C-contiguous int16 (students x columns) matrix of
+    marks, with grace/condone entries added up and 'AB'/'CC' set to 0.
+    - flags (np.ndarray): uint8 (students x columns) matrix combining the
+    ABSENT, COPY_CASE and GRACE bits of each cell.
+
+    Explanation:
+    A cleaned DataFrame keeps one int64 or object column per subject column
+    and the names as Python strings. This form takes 3 bytes per mark and
+    is what 'get_sgpa' consumes directly, so the marks are converted once
+    while cleaning and never again. 'SubjectSchema.get_schema(columns)'
+    gives the positions of the INT and EXT column of each subject in 'marks'.
+
+    Example:
+    >>> cleaned = clean_marks("data/Sem1.csv")
+    >>> cleaned.marks.dtype, cleaned.marks.shape
+    (dtype('int16'), (277, 20))
+    >>> cleaned.marker_counts().head(2)
+       StudentId                     StudentName  Absent  CopyCase
+    0    3736422      ADDAGATLA ADARSH VENKATESH       0         0
+    1    3736426  AMRITKAR  PIYUSH HARISHCHANDRA       0         0
+
+    """
+
+    student_ids: np.ndarray
+    student_names: pd.Categorical
+    columns: tuple
+    marks: np.ndarray
+    flags: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.student_ids)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the marks as a DataFrame in the layout of 'clean_data'."""
+        df = pd.DataFrame(
+            {
+                "StudentId": self.student_ids,
+                "StudentName": np.asarray(self.student_names, dtype=object),
+            }
+        )
+        marks = pd.DataFrame(self.marks.astype(np.int64), columns=list(self.columns))
+        return pd.concat([df, marks], axis=1)
+
+    def marker_counts(self) -> pd.DataFrame:
+        """Return the number of 'AB' (Absent) and 'CC' (CopyCase) entries of every student."""
+        return pd.DataFrame(
+            {
+                "StudentId": self.student_ids,
+                "StudentName": np.asarray(self.student_names, dtype=object),
+                "Absent": (self.flags & ABSENT).astype(bool).sum(axis=1),
+                "CopyCase": (self.flags & COPY_CASE).astype(bool).sum(axis=1),
+            }
+        )
+
+    def to_arrays(self) -> dict:
+        """Return the marks as plain NumPy arrays that can be saved without pickle."""
+        return {
+            "student_ids": self.student_ids,
+            "name_codes": self.student_names.codes,
+            "name_categories": np.asarray(self.student_names.categories, dtype=str),
+            "columns": np.array(self.columns, dtype=str),
+            "marks": self.marks,
+            "flags": self.flags,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "CleanedMarks":
+        """Rebuild the marks saved from 'to_arrays'."""
+        names = pd.Categorical.from_codes(
+            arrays["name_codes"],
+            categories=arrays["name_categories"].astype(object),
+            validate=False,
+        )
+        return cls(
+            student_ids=arrays["student_ids"],
+            student_names=names,
+            columns=tuple(arrays["columns"].tolist()),
+            marks=np.ascontiguousarray(arrays["marks"]),
+            flags=np.ascontiguousarray(arrays["flags"]),
+        )
+
+    @classmethod
+    def concat(cls, parts: list) -> "CleanedMarks":
+        """
+        Join the cleaned chunks of one file, in order.
+
+        Raises:
+        - ValueError: If there are no chunks or their subject columns differ.
+        """
+        if not parts:
+            raise ValueError("No cleaned marks to concatenate")
+        if len(parts) == 1:
+            return parts[0]
+        if any(part.columns != parts[0].columns for part in parts):
+            raise ValueError("Cleaned chunks have different subject columns")
+        return cls(
+            student_ids=np.concatenate([part.student_ids for part in parts]),
+            student_names=pd.api.types.union_categoricals(
+                [part.student_names for part in parts]
+            ),
+            columns=parts[0].columns,
+            marks=np.concatenate([part.marks for part in parts]),
+            flags=np.concatenate([part.flags for part in parts]),
+        )
@@ -5,8 +5,31 @@ This module provides functions for parsing grace and condone
 entries in a DataFrame and cleaning data.
 
 """
+from typing import Iterator
+
+import numpy as np
 import pandas as pd
 
+from src.CleanedMarks import ABSENT, COPY_CASE, GRACE, MARKS_DTYPE, CleanedMarks
+from src.SubjectSchema import get_schema
+
+# Plain marks ("45") or grace/condone entries ("11*5", "79@1"). Anything
+# else is left to 'parse_grace_condone' so the two paths always agree.
+MARKS_PATTERN = r"^\s*([+-]?\d+)\s*(?:[*@]\s*([+-]?\d+)\s*)?$"
+
+# Columns kept from the result sheet besides the subject columns
+ID_COLUMNS = ["StudentId", "StudentName"]
+ID_DTYPES = {"StudentId": "int64", "StudentName": "object"}
+
+# Default number of rows read at a time by 'clean_data_chunks'
+CHUNK_SIZE = 10_000
+
+# Special entries of the result sheet and the name of their count column
+MARKERS = {"AB": "Absent", "CC": "CopyCase"}
+
+# Flag bit of each special entry in 'CleanedMarks.flags'
+MARKER_FLAGS = {"AB": ABSENT, "CC": COPY_CASE}
+
 
 def parse_grace_condone(entry: str) -> int:
     """
@@ -50,16 +73,151 @@ def parse_grace_condone(entry: str) -> int:
     return entry
 
 
-def clean_data(file: str) -> pd.DataFrame:
+def parse_grace_condone_column(column: pd.Series) -> pd.Series:
+    """
+    Vectorized version of 'parse_grace_condone' for a whole column.
+
+    Parameters:
+    - column (pd.Series): A column of marks as read by 'pd.read_csv'.
+
+    Returns:
+    - pd.Series: The column with grace and condone entries added up and
+    numeric strings converted to integers. 'AB' and 'CC' entries are kept.
+
+    Explanation:
+    Numeric columns are returned untouched. In text columns the cells made of
+    digits only are converted to integers in one NumPy cast. The remaining
+    cells go through a single regular expression that extracts the marks and
+    the grace/condone part, which are then added with NumPy. Cells that still
+    do not match ('AB', 'CC', missing values or malformed entries) fall back
+    to 'parse_grace_condone', so the output is the same as
+    'column.map(parse_grace_condone)'.
+
+    Example:
+    >>> parse_grace_condone_column(pd.Series(["11*5", "79@1", "AB", "45"]))
+    0    16
+    1    80
+    2    AB
+    3    45
+    dtype: object
+
+    """
+    return _parse_marks_column(column)[0]
+
+
+def _parse_marks_column(column: pd.Series) -> tuple:
+    """
+    Implementation of 'parse_grace_condone_column'.
+
+    Returns:
+    - tuple: The parsed column and a boolean array marking the grace and
+    condone cells, or None for a numeric column.
+    """
+    if column.dtype != object:
+        return column, None
+
+    values = column.to_numpy(dtype=object, copy=True)
+    grace = np.zeros(len(values), dtype=bool)
+
+    digits = column.str.isdigit().to_numpy(dtype=bool, na_value=False)
+    values[digits] = values[digits].astype(np.int64)
+
+    remaining = ~digits
+    if remaining.any():
+        parts = column[remaining].str.extract(MARKS_PATTERN)
+        matched = parts[0].notna().to_numpy()
+        marks = parts[0].to_numpy()[matched].astype(np.int64)
+        extra = parts[1].fillna(0).to_numpy()[matched].astype(np.int64)
+
+        positions = np.flatnonzero(remaining)
+        values[positions[matched]] = marks + extra
+        grace[positions[matched]] = parts[1].notna().to_numpy()[matched]
+        remaining[positions[matched]] = False
+
+    if remaining.any():
+        grace[remaining] = [
+            isinstance(entry, str) and ("*" in entry or "@" in entry)
+            for entry in values[remaining]
+        ]
+        values[remaining] = [parse_grace_condone(entry) for entry in values[remaining]]
+
+    parsed = pd.Series(values, index=column.index, name=column.name).infer_objects()
+    return parsed, grace
+
+
+def mask_markers(df: pd.DataFrame, subject_columns: list) -> pd.DataFrame:
+    """
+    Replace 'AB' and 'CC' entries with 0 in the subject columns, in place.
+
+    Parameters:
+    - df (pd.DataFrame): The parsed result sheet.
+    - subject_columns (list): The columns holding the marks.
+
+    Returns:
+    - pd.DataFrame: The number of 'AB' (Absent) and 'CC' (CopyCase) entries
+    of every student, along with 'StudentId' and 'StudentName'.
+
+    Explanation:
+    Only text columns can hold the markers, so those are taken out as a single
+    object matrix. Each marker is found with one elementwise comparison over
+    the matrix, counted per row and set to 0, and the matrix is written back.
+
+    Example:
+    >>> mask_markers(df, ["BIT1", "BIT2"])
+       StudentId StudentName  Absent  CopyCase
+    0          1    Student1       1         0
+    1          2    Student2       0         1
+
+    """
+    counts = df[["StudentId", "StudentName"]].copy()
+    for name in MARKERS.values():
+        counts[name] = 0
+
+    text_columns = [col for col in subject_columns if df[col].dtype == object]
+    if not text_columns:
+        return counts
+
+    block = df[text_columns].to_numpy(dtype=object)
+    for marker, name in MARKERS.items():
+        found = block == marker
+        counts[name] = found.sum(axis=1)
+        block[found] = 0
+    df[text_columns] = block
+
+    return counts
+
+
+def clean_frame(df: pd.DataFrame, subject_columns: list) -> tuple:
+    """
+    Parse the marks of a result sheet and replace 'AB'/'CC' entries with 0.
+
+    Parameters:
+    - df (pd.DataFrame): The student and subject columns of a result sheet.
+    - subject_columns (list): The columns holding the marks.
+
+    Returns:
+    - tuple: The cleaned DataFrame and the marker counts from 'mask_markers'.
+    """
+    df = df.copy()
+    df[subject_columns] = df[subject_columns].apply(parse_grace_condone_column)
+    counts = mask_markers(df, subject_columns)
+    return df, counts
+
+
+def clean_data(file: str, return_marker_counts: bool = False) -> pd.DataFrame:
     """
     Clean data in a DataFrame by replacing 'AB' with 0 for absent
     students and 'CC' with 0 for copy case.
 
     Parameters:
     - file (str): The file path to the CSV file containing the data.
+    - return_marker_counts (bool): Also return the per-student 'AB'/'CC'
+    counts computed by 'mask_markers'.
 
     Returns:
     - pd.DataFrame: A cleaned DataFrame with 'AB' and 'CC' replaced with 0.
+    When 'return_marker_counts' is set, a tuple of the cleaned DataFrame and
+    the marker counts.
 
     Explanation:
     This function reads a CSV file into a DataFrame and replaces 'AB' with 0 for absent students
@@ -86,13 +244,154 @@ def clean_data(file: str) -> pd.DataFrame:
     """
     df = pd.read_csv(file)
 
-    subject_columns = [col for col in df.columns if "BIT" in col]
-    df = df[["StudentId", "StudentName"] + subject_columns]
-    df[subject_columns] = df[subject_columns].map(parse_grace_condone)
-
-    absent_students = df.apply(lambda row: "AB" in row.values, axis=1)
-    df.loc[absent_students] = df.loc[absent_students].replace("AB", 0)
+    subject_columns = list(get_schema(df.columns).subject_columns)
+    df, counts = clean_frame(df[ID_COLUMNS + subject_columns], subject_columns)
 
-    copy_case = df.apply(lambda row: "CC" in row.values, axis=1)
-    df.loc[copy_case] = df.loc[copy_case].replace("CC", 0)
+    if return_marker_counts:
+        return df, counts
     return df
+
+
+def clean_data_chunks(
+    file: str, chunksize: int = CHUNK_SIZE, return_marker_counts: bool = False
+) -> Iterator[pd.DataFrame]:
+    """
+    Streaming version of 'clean_data' that reads and cleans a CSV file in chunks.
+
+    Parameters:
+    - file (str): The file path or file object of the CSV file.
+    - chunksize (int): Number of rows read and cleaned at a time.
+    - return_marker_counts (bool): Yield the per-student 'AB'/'CC' counts
+    along with each cleaned chunk.
+
+    Returns:
+    - Iterator[pd.DataFrame]: The cleaned chunks, in file order. Each chunk is
+    what 'clean_data' returns for the same rows.
+
+    Explanation:
+    Only 'StudentId', 'StudentName' and the subject columns are read from the
+    file, so the other columns of the export are never parsed. The student
+    columns are read with explicit dtypes; the subject columns are left to the
+    C parser, which already produces integers for columns without grace,
+    condone or 'AB'/'CC' entries. Peak memory depends on 'chunksize' rather
+    than on the size of the file.
+
+    Example:
+    >>> for chunk in clean_data_chunks("data.csv", chunksize=2):
+    ...     print(chunk)
+         Name  Subject1  Subject2
+    0  Student1        80         0
+    1  Student2         0        75
+         Name  Subject1  Subject2
+    2  Student3        80        85
+    3  Student4        80        85
+
+    """
+    reader = pd.read_csv(
+        file,
+        usecols=lambda col: col in ID_COLUMNS or "BIT" in col,
+        dtype=ID_DTYPES,
+        chunksize=chunksize,
+    )
+    with reader:
+        for chunk in reader:
+            subject_columns = list(get_schema(chunk.columns).subject_columns)
+            df, counts = clean_frame(chunk[ID_COLUMNS + subject_columns], subject_columns)
+            yield (df, counts) if return_marker_counts else df
+
+
+def clean_marks_frame(df: pd.DataFrame, subject_columns: list) -> CleanedMarks:
+    """
+    Clean the marks of a result sheet into a compact 'CleanedMarks'.
+
+    Parameters:
+    - df (pd.DataFrame): The student and subject columns of a result sheet.
+    - subject_columns (list): The columns holding the marks.
+
+    Returns:
+    - CleanedMarks: The marks as one int16 matrix, with the 'AB', 'CC' and
+    grace/condone cells flagged.
+
+    Raises:
+    - ValueError: If a cell is not a mark, or a mark does not fit in int16.
+
+    Explanation:
+    Columns are parsed with 'parse_grace_condone_column' exactly as in
+    'clean_frame'. Numeric columns are copied into the matrix as they are;
+    in text columns the 'AB'/'CC' cells are flagged and set to 0, the grace
+    and condone cells found by the parser are flagged, and the column is
+    cast once.
+    """
+    marks = np.empty((len(df), len(subject_columns)), dtype=MARKS_DTYPE)
+    flags = np.zeros((len(df), len(subject_columns)), dtype=np.uint8)
+
+    for position, col in enumerate(subject_columns):
+        parsed, grace = _parse_marks_column(df[col])
+        if parsed.dtype == object:
+            values = parsed.to_numpy(dtype=object, copy=True)
+            for marker, flag in MARKER_FLAGS.items():
+                found = values == marker
+                flags[found, position] |= flag
+                values[found] = 0
+            values = values.astype(np.int64)
+        else:
+            values = parsed.to_numpy(dtype=np.int64)
+
+        if grace is not None:
+            flags[grace, position] |= GRACE
+
+        if len(values) and (
+            values.min() < np.iinfo(MARKS_DTYPE).min or values.max() > np.iinfo(MARKS_DTYPE).max
+        ):
+            raise ValueError(f"{col}: marks out of range")
+        marks[:, position] = values
+
+    return CleanedMarks(
+        student_ids=df["StudentId"].to_numpy(dtype=np.int64),
+        student_names=pd.Categorical(df["StudentName"]),
+        columns=tuple(subject_columns),
+        marks=marks,
+        flags=flags,
+    )
+
+
+def clean_marks(file: str) -> CleanedMarks:
+    """
+    Compact counterpart of 'clean_data': read a CSV file into 'CleanedMarks'.
+
+    Parameters:
+    - file (str): The file path or file object of the CSV file.
+
+    Returns:
+    - CleanedMarks: The cleaned marks. 'to_frame()' gives the marks in the
+    layout of 'clean_data' and 'marker_counts()' its marker counts.
+
+    Example:
+    >>> sgpa = get_sgpa(clean_marks("data/Sem1.csv"))
+
+    """
+    return CleanedMarks.concat(list(clean_marks_chunks(file)))
+
+
+def clean_marks_chunks(file: str, chunksize: int = CHUNK_SIZE) -> Iterator[CleanedMarks]:
+    """
+    Streaming version of 'clean_marks', reading the file as 'clean_data_chunks' does.
+
+    Parameters:
+    - file (str): The file path or file object of the CSV file.
+    - chunksize (int): Number of rows read and cleaned at a time.
+
+    Returns:
+    - Iterator[CleanedMarks]: The cleaned chunks, in file order. Join them
+    with 'CleanedMarks.concat'.
+    """
+    reader = pd.read_csv(
+        file,
+        usecols=lambda col: col in ID_COLUMNS or "BIT" in col,
+        dtype=ID_DTYPES,
+        chunksize=chunksize,
+    )
+    with reader:
+        for chunk in reader:
+            subject_columns = list(get_schema(chunk.columns).subject_columns)
+            yield clean_marks_frame(chunk, subject_columns)
@@ -1,9 +1,26 @@
 """
 Converting the cleaned data into features
 """
-import re
+from typing import Iterable, Iterator
+
+import numpy as np
 import pandas as pd
 
+from src.CleanedMarks import CleanedMarks
+from src.SubjectSchema import get_schema
+
+# Marks are mapped to credits with left-closed bins: [0, 40) -> 0, [40, 45) -> 4, ...
+CREDIT_BINS = [0, 40, 45, 50, 55, 60, 70, 80, 101]
+CREDIT_LABELS = [0, 4, 5, 6, 7, 8, 9, 10]
+
+# Lookup table from marks to the index of their credit in CREDIT_LABELS. The
+# last slot (-1) stands for every mark outside the bins; 'CREDIT_POINTS' maps
+# those codes back to credits, counting marks outside the bins as 0.
+CREDIT_CODES = np.append(
+    np.searchsorted(CREDIT_BINS, np.arange(CREDIT_BINS[-1]), side="right") - 1, -1
+).astype(np.int8)
+CREDIT_POINTS = np.array(CREDIT_LABELS + [0], dtype=np.int64)
+
 
 def calculate_credits(marks):
     """
@@ -40,12 +57,38 @@ def calculate_credits(marks):
     """
     return pd.cut(
         marks,
-        bins=[0, 40, 45, 50, 55, 60, 70, 80, 101],
-        labels=[0, 4, 5, 6, 7, 8, 9, 10],
+        bins=CREDIT_BINS,
+        labels=CREDIT_LABELS,
         right=False,
     )
 
 
+def calculate_credit_codes(marks: np.ndarray) -> np.ndarray:
+    """
+    Vectorized counterpart of 'calculate_credits' for a whole marks matrix.
+
+    Parameters:
+    - marks (np.ndarray): An integer array of marks of any shape.
+
+    Returns:
+    - np.ndarray: The index of the credit bin of every mark in 'CREDIT_LABELS',
+    or -1 for marks outside the bins (the NaN of 'calculate_credits').
+
+    Explanation:
+    Every mark is looked up in 'CREDIT_CODES' in a single indexing pass, so
+    the codes can be used both as categorical codes and as indices into
+    'CREDIT_LABELS'.
+
+    Example:
+    >>> calculate_credit_codes(np.array([35, 42, 58, 70, 90, 120]))
+    array([ 0,  1,  4,  6,  7, -1], dtype=int8)
+
+    """
+    # Viewed as unsigned, negative marks become huge and land in the last slot
+    marks = np.asarray(marks, dtype=np.int64).view(np.uint64)
+    return CREDIT_CODES[np.minimum(marks, len(CREDIT_CODES) - 1)]
+
+
 def calculate_practical_percentage(marks: int) -> int:
     """
     Calculate practical percentage based on provided marks.
@@ -76,13 +119,19 @@ def calculate_practical_percentage(marks: int) -> int:
     return marks // 0.5
 
 
-def get_combined_sgpa(*semesters: pd.DataFrame) -> pd.DataFrame:
+def get_combined_sgpa(
+    *semesters: pd.DataFrame, on: str = "StudentName", how: str = "inner"
+) -> pd.DataFrame:
     """
     Combine SGPA data from multiple semesters into a single DataFrame.
 
     Parameters:
     - *semesters (pd.DataFrame): Variable-length argument list of DataFrames,
     each representing SGPA data for a semester.
+    - on (str): The column identifying a student across semesters, either
+    "StudentName" or "StudentId".
+    - how (str): "inner" keeps the students present in every semester,
+    "outer" keeps every student and fills the missing semesters.
 
     Returns:
     - pd.DataFrame: A DataFrame containing the combined SGPA data with a common
@@ -90,9 +139,11 @@ def get_combined_sgpa(*semesters: pd.DataFrame) -> pd.DataFrame:
 
     Explanation:
     This function takes SGPA DataFrames from multiple semesters and combines
-    them into a single DataFrame. The combination is based on a common
-    identifier column "StudentName." The individual semester SGPA columns
-    are named as "Sem1", "Sem2", etc.
+    them into a single DataFrame. One hash index of the students is built on
+    the 'on' column, and the GPA of every semester is written into a
+    preallocated (students x semesters) matrix at the positions looked up in
+    that index. The individual semester SGPA columns are named as "Sem1",
+    "Sem2", etc. A student listed twice in a semester keeps the first entry.
 
     Example:
     >>> semester1_data = pd.DataFrame({"StudentName": ["Student1", "Student2"],
@@ -103,27 +154,50 @@ def get_combined_sgpa(*semesters: pd.DataFrame) -> pd.DataFrame:
     >>> print(combined_sgpa)
        StudentName  Sem1  Sem2
     0      Student1   0.0   4.0
-    1      Student2   4.0   3.8
+    1      Student2   4.0   0.0
 
     Note:
     - SGPA values below 4 are replaced with 0 representing the the student is failing
     in the subject.
-    - Missing SGPA values are filled with the median SGPA for the respective semester.
+    - With how="outer", missing SGPA values are filled with the median SGPA for
+    the respective semester.
+    - Result sheets do not always keep the same "StudentId" for a student
+    across semesters, which is why the join is on "StudentName" by default.
 
     """
-    df = pd.DataFrame()
-    df["StudentName"] = semesters[0]["StudentName"]
-
-    semester_names = [f"Sem{i+1}" for i in range(len(semesters))]
-
-    for semester, semester_name in zip(semesters, semester_names):
-        df = pd.merge(
-            df, semester[["StudentName", "GPA"]], on="StudentName", how="inner"
-        )
-        df = df.rename(columns={"GPA": semester_name})
-
-    df.iloc[:, 1:] = df.iloc[:, 1:].map(lambda x: 0 if x < 4 else x)
-    # df[semester_names] = df[semester_names].fillna(df[semester_names].median())
+    if how not in ("inner", "outer"):
+        raise ValueError(f"how must be 'inner' or 'outer', got {how!r}")
+
+    keys = [semester[on] for semester in semesters]
+    if how == "inner":
+        index = pd.Index(keys[0]).unique()
+    else:
+        index = pd.Index(pd.concat(keys, ignore_index=True)).unique()
+
+    sgpa = np.full((len(index), len(semesters)), np.nan)
+    for column, (semester, key) in enumerate(zip(semesters, keys)):
+        first = ~key.duplicated().to_numpy()
+        positions = index.get_indexer(key[first])
+        found = positions >= 0
+        sgpa[positions[found], column] = semester["GPA"].to_numpy()[first][found]
+
+    sgpa = np.where(sgpa < 4, 0, sgpa)
+    if how == "inner":
+        present = ~np.isnan(sgpa).any(axis=1)
+        index, sgpa = index[present], sgpa[present]
+    else:
+        sgpa = np.where(np.isnan(sgpa), np.nanmedian(sgpa, axis=0), sgpa)
+
+    if on == "StudentName":
+        names = index.to_numpy()
+    else:
+        students = pd.concat([semester[[on, "StudentName"]] for semester in semesters])
+        names = students.drop_duplicates(on).set_index(on)["StudentName"]
+        names = names.reindex(index).to_numpy()
+
+    df = pd.DataFrame({"StudentName": names})
+    for column in range(len(semesters)):
+        df[f"Sem{column + 1}"] = sgpa[:, column]
 
     return df
 
@@ -133,7 +207,9 @@ def get_sgpa(sem_data: pd.DataFrame) -> pd.DataFrame:
     Calculate SGPA based on semester data.
 
     Parameters:
-    - sem_data (pd.DataFrame): A DataFrame containing semester-wise subject and practical marks.
+    - sem_data (pd.DataFrame or CleanedMarks): A DataFrame containing
+    semester-wise subject and practical marks, or the 'CleanedMarks' of
+    'DataCleaning.clean_marks', which is used without any conversion.
 
     Returns:
     - pd.DataFrame: A DataFrame containing SGPA values for subjects, practicals, and an overall GPA.
@@ -141,8 +217,11 @@ def get_sgpa(sem_data: pd.DataFrame) -> pd.DataFrame:
     Explanation:
     This function takes semester-wise data containing subject and practical marks,
     calculates SGPA for each,
-    and computes an overall GPA. It utilizes helper functions
-    'calculate_practical_percentage' and 'calculate_credits'.
+    and computes an overall GPA. The INT and EXT marks of all subjects are added
+    as one integer matrix, the practical columns are scaled to a percentage
+    (see 'calculate_practical_percentage'), every mark is mapped to its credit
+    with 'calculate_credit_codes' and the GPA is one sum over the matrix. The
+    result is the same as applying 'calculate_credits' column by column.
 
     Example:
     >>> semester_data = pd.DataFrame({
@@ -167,42 +246,59 @@ def get_sgpa(sem_data: pd.DataFrame) -> pd.DataFrame:
           Student2
 
     """
-    subject_columns = [
-        col for col in sem_data.columns if col.startswith(("INT", "EXT"))
-    ]
-    subject_columns = sorted(subject_columns)
-    credits_df = pd.DataFrame()
-    credits_df["StudentId"] = sem_data.StudentId
-    credits_df["StudentName"] = sem_data.StudentName
-
-    for subject_column in subject_columns:
-        subject_name = subject_column.split("_")[1]
-        total_marks = (
-            sem_data[subject_column].astype('int') + sem_data[subject_column.replace("EXT", "INT")].astype('int')
+    if isinstance(sem_data, CleanedMarks):
+        # The marks are already one integer matrix, indexed by the schema of
+        # its columns
+        schema = get_schema(sem_data.columns)
+        total_marks = sem_data.marks[:, list(schema.ext_indices)].astype(np.int64)
+        total_marks += sem_data.marks[:, list(schema.int_indices)]
+        student_ids = sem_data.student_ids
+        student_names = np.asarray(sem_data.student_names, dtype=object)
+        index = pd.RangeIndex(len(sem_data))
+    else:
+        schema = get_schema(sem_data.columns)
+
+        # One (students x subjects) matrix of INT + EXT marks
+        total_marks = sem_data[list(schema.ext_columns)].to_numpy(dtype=np.int64) + sem_data[
+            list(schema.int_columns)
+        ].to_numpy(dtype=np.int64)
+        student_ids = sem_data.StudentId
+        student_names = sem_data.StudentName
+        index = sem_data.index
+
+    # The practicals (marked out of 50) are scaled to a percentage
+    total_marks[:, schema.practical_mask] *= 2
+
+    # Convert percentage marks to GPA based on criteria
+    codes = calculate_credit_codes(total_marks)
+    credits = CREDIT_POINTS[codes]
+
+    credits_df = {"StudentId": student_ids, "StudentName": student_names}
+    for position, subject_name in enumerate(schema.subject_names):
+        credits_df[subject_name] = pd.Categorical.from_codes(
+            codes[:, position], categories=CREDIT_LABELS, ordered=True, validate=False
         )
 
-        if re.match(r"BIT(\d{1})P(\d{1})", subject_name):
-            # Apply the 'calculate_practical_percentage' function to the total marks
-            total_marks = calculate_practical_percentage(total_marks)
-
-        subject_columns.remove(subject_column.replace("EXT", "INT"))
+    # Calculate GPA by dividing total credits by 10
+    credits_df["GPA"] = credits.sum(axis=1) / 10
 
-        # Convert percentage marks to GPA based on criteria
-        gpa = calculate_credits(total_marks)
+    return pd.DataFrame(credits_df, index=index)
 
-        # Add the calculated GPA to the credits DataFrame
-        credits_df[subject_name] = gpa
 
-    # Convert each column to numeric in the specified range
-    numeric_columns = credits_df.iloc[:, 2:].apply(pd.to_numeric)
+def get_sgpa_chunks(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    Calculate SGPA for a stream of cleaned chunks.
 
-    # Sum across columns for each row
-    total_credits = numeric_columns.sum(axis=1)
+    Parameters:
+    - chunks (Iterable[pd.DataFrame]): Cleaned chunks of a semester, such as
+    the ones yielded by 'DataCleaning.clean_data_chunks'.
 
-    # Calculate GPA by dividing total credits by 10
-    gpa = total_credits / 10
+    Returns:
+    - Iterator[pd.DataFrame]: The 'get_sgpa' result of each chunk, in order.
 
-    # Add the calculated GPA to the 'credits_df' DataFrame
-    credits_df["GPA"] = gpa
+    Example:
+    >>> sgpa = pd.concat(get_sgpa_chunks(clean_data_chunks("Sem1.csv")))
 
-    return credits_df
+    """
+    for chunk in chunks:
+        yield get_sgpa(chunk)
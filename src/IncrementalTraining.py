@@ -0,0 +1,417 @@
+"""
+Incremental Training Module
+
+This module retrains the semester models as new semester results arrive,
+without re-reading earlier semester files. It keeps the sufficient
+statistics of every model (XᵀX, Xᵀy, sums and counts) in a small JSON state
+file and solves the Ridge system in closed form from them.
+
+Usage:
+    python -m src.IncrementalTraining --init data --cohort 2021
+    python -m src.IncrementalTraining --cohort 2023 new/Sem1.csv new/Sem2.csv
+"""
+import argparse
+import json
+import os
+import pickle
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.FeatureExtraction import get_combined_sgpa
+from src.LinearModel import LinearModel
+from src.Pipeline import SEMESTER_FILE_PATTERN, discover_semester_files, process_semester
+from src.SemesterCache import digest_source
+
+# Version of the state file layout written by 'IncrementalTrainer.save'
+STATE_VERSION = 2
+
+# Models saved by 'TrainingModel.train_models', e.g. "sem4_model.pkl"
+TRAINED_MODEL_PATTERN = re.compile(r"^sem(\d+)_model\.pkl$")
+
+
+class RidgeStatistics:
+    """
+    Running sufficient statistics of a Ridge regression with an intercept.
+
+    Parameters:
+    - num_features (int): The number of features.
+
+    Explanation:
+    sklearn's Ridge(alpha) with an intercept centers X and y, solves
+    (XcᵀXc + alpha * I) coef = Xcᵀyc and sets intercept = mean(y) - mean(X) @ coef.
+    The centered products follow from the raw ones:
+    XcᵀXc = XᵀX - n * mean(X)ᵀ mean(X) and Xcᵀyc = Xᵀy - n * mean(X) * mean(y),
+    so keeping XᵀX, Xᵀy, the column sums and the row count is enough to
+    solve for any alpha, and new rows only need to be added to them.
+
+    Example:
+    >>> stats = RidgeStatistics(3)
+    >>> stats.update(X_2021, y_2021)
+    >>> stats.update(X_2022, y_2022)
+    >>> coef, intercept = stats.solve(alpha=50)
+
+    """
+
+    def __init__(self, num_features: int):
+        self.n = 0
+        self.sum_x = np.zeros(num_features)
+        self.sum_y = 0.0
+        self.xtx = np.zeros((num_features, num_features))
+        self.xty = np.zeros(num_features)
+
+    def update(self, X: np.ndarray, y: np.ndarray):
+        """Add rows to the statistics."""
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.n += len(y)
+        self.sum_x += X.sum(axis=0)
+        self.sum_y += float(y.sum())
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+
+    def solve(self, alpha: float) -> tuple:
+        """
+        Solve the Ridge system for the rows seen so far.
+
+        Returns:
+        - tuple: The coefficients and the intercept.
+
+        Raises:
+        - ValueError: If no rows were added yet.
+        """
+        if self.n == 0:
+            raise ValueError("Cannot solve a Ridge regression without any rows")
+        mean_x = self.sum_x / self.n
+        mean_y = self.sum_y / self.n
+        xtx = self.xtx - self.n * np.outer(mean_x, mean_x)
+        xty = self.xty - self.n * mean_x * mean_y
+        coef = np.linalg.solve(xtx + alpha * np.eye(len(mean_x)), xty)
+        return coef, mean_y - mean_x @ coef
+
+    def to_dict(self) -> dict:
+        """Return the statistics as JSON-serializable values."""
+        return {
+            "n": self.n,
+            "sum_x": self.sum_x.tolist(),
+            "sum_y": self.sum_y,
+            "xtx": self.xtx.tolist(),
+            "xty": self.xty.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "RidgeStatistics":
+        """Rebuild statistics written by 'to_dict'."""
+        stats = cls(len(values["sum_x"]))
+        stats.n = values["n"]
+        stats.sum_x = np.array(values["sum_x"], dtype=np.float64)
+        stats.sum_y = float(values["sum_y"])
+        stats.xtx = np.array(values["xtx"], dtype=np.float64).reshape(stats.xtx.shape)
+        stats.xty = np.array(values["xty"], dtype=np.float64)
+        return stats
+
+
+class IncrementalTrainer:
+    """
+    Incrementally trained semester models backed by a JSON state file.
+
+    Parameters:
+    - state_path (str): The state file. It is created by 'save' if missing.
+
+    Explanation:
+    Results arrive one semester file at a time for a cohort (a batch of
+    students, e.g. "2021"). For each cohort the state keeps the digests of
+    its files and the SGPA history of the students present in all of its
+    semesters so far, i.e. its 'get_combined_sgpa' result. When SemN of a
+    cohort arrives it is combined with that history alone, the new rows are
+    added to the statistics of sem<N>_model, and the history is replaced by
+    the new combination, so the rows of earlier semesters are not kept.
+    Training costs grow with the new file, not with the whole history, and
+    the models match a Ridge(alpha) refit on every ingested cohort.
+
+    Once a cohort has sat its last semester, 'close' drops its history and
+    keeps only its digests, so the state grows with the number of models,
+    not with the number of students.
+
+    Example:
+    >>> trainer = IncrementalTrainer("models/training_state.json")
+    >>> trainer.ingest("2022", 3, process_semester("data/Sem3.csv"))
+    3
+    >>> trainer.model(3, alpha=80).save("models/sem3_model.npz")
+    >>> trainer.save()
+
+    """
+
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+        self.cohorts = {}
+        self.statistics = {}
+        self.alphas = {}
+        if os.path.exists(state_path):
+            self._load()
+
+    def ingest(self, cohort: str, semester: int, sgpa: pd.DataFrame, digest: str = None) -> int:
+        """
+        Add a semester of a cohort and update the model it trains.
+
+        Parameters:
+        - cohort (str): The cohort the semester belongs to.
+        - semester (int): The semester, always the one after the last ingested
+        semester of the cohort.
+        - sgpa (pd.DataFrame): The 'get_sgpa' result of the semester file.
+        - digest (str): Optional SHA-256 of the file, used to reject a file
+        ingested before.
+
+        Returns:
+        - int: The semester of the updated model, or None for a Sem1 file.
+
+        Raises:
+        - ValueError: If the semester is not the next one of the cohort, the
+        cohort was closed, or the file was already ingested.
+        """
+        ingested = self.cohorts.get(
+            cohort, {"semesters": 0, "digests": [], "StudentName": [], "GPA": []}
+        )
+        if ingested.get("closed"):
+            raise ValueError(f"Cohort {cohort} was closed after Sem{ingested['semesters']}")
+        if semester != ingested["semesters"] + 1:
+            raise ValueError(
+                f"Cohort {cohort}: expected Sem{ingested['semesters'] + 1}, got Sem{semester}"
+            )
+        if digest is not None and any(
+            digest in other["digests"] for other in self.cohorts.values()
+        ):
+            raise ValueError(f"Cohort {cohort}: Sem{semester} file was already ingested")
+
+        history = (
+            pd.DataFrame({"StudentName": ingested["StudentName"], "GPA": gpa})
+            for gpa in ingested["GPA"]
+        )
+        combined = get_combined_sgpa(*history, sgpa)
+        if semester > 1:
+            features = [f"Sem{previous}" for previous in range(1, semester)]
+            if semester not in self.statistics:
+                self.statistics[semester] = RidgeStatistics(len(features))
+            self.statistics[semester].update(
+                combined[features].to_numpy(), combined[f"Sem{semester}"].to_numpy()
+            )
+
+        self.cohorts[cohort] = {
+            "semesters": semester,
+            "digests": ingested["digests"] + ([digest] if digest is not None else []),
+            "StudentName": combined["StudentName"].tolist(),
+            "GPA": [
+                combined[f"Sem{previous}"].astype(float).tolist()
+                for previous in range(1, semester + 1)
+            ],
+        }
+        return semester if semester > 1 else None
+
+    def bootstrap(self, data_dir: str, cohort: str) -> list:
+        """
+        Ingest every semester file of a directory as one cohort.
+
+        Parameters:
+        - data_dir (str): A directory of "Sem1.csv", "Sem2.csv", ... files,
+        e.g. the data the models were trained on by 'TrainingModel'.
+        - cohort (str): The cohort of the files.
+
+        Returns:
+        - list: The semesters of the updated models.
+        """
+        updated = []
+        for path in discover_semester_files(data_dir):
+            digest, _ = digest_source(path)
+            semester = int(SEMESTER_FILE_PATTERN.match(os.path.basename(path)).group(1))
+            if self.ingest(cohort, semester, process_semester(path), digest) is not None:
+                updated.append(semester)
+        return updated
+
+    def close(self, cohort: str):
+        """
+        Drop the SGPA history of a cohort that has no semester left to ingest.
+
+        Its digests are kept, so its files are still rejected if ingested again.
+
+        Raises:
+        - KeyError: If the cohort was never ingested.
+        """
+        ingested = self.cohorts[cohort]
+        self.cohorts[cohort] = {
+            "semesters": ingested["semesters"],
+            "digests": ingested["digests"],
+            "closed": True,
+        }
+
+    def model(self, semester: int, alpha: float = None) -> LinearModel:
+        """
+        Solve the model predicting a semester.
+
+        Parameters:
+        - semester (int): The predicted semester.
+        - alpha (float): The regularization. Defaults to the last alpha used
+        for this model, e.g. the one 'TrainingModel' selected, see
+        'trained_alphas'. A given alpha is remembered.
+
+        Raises:
+        - KeyError: If no cohort has reached the semester yet.
+        - ValueError: If no alpha is given and none was set for the model.
+        """
+        if alpha is not None:
+            self.alphas[semester] = alpha
+        if semester not in self.alphas:
+            raise ValueError(f"No alpha set for sem{semester}_model yet, one must be given")
+        coef, intercept = self.statistics[semester].solve(self.alphas[semester])
+        return LinearModel(coef, intercept, [f"Sem{previous}" for previous in range(1, semester)])
+
+    def save(self):
+        """Atomically write the state file."""
+        state = {
+            "version": STATE_VERSION,
+            "cohorts": self.cohorts,
+            "alphas": {str(semester): alpha for semester, alpha in sorted(self.alphas.items())},
+            "models": {
+                str(semester): stats.to_dict()
+                for semester, stats in sorted(self.statistics.items())
+            },
+        }
+        temporary = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as state_file:
+            json.dump(state, state_file)
+        os.replace(temporary, self.state_path)
+
+    def _load(self):
+        """Read the state file."""
+        with open(self.state_path) as state_file:
+            state = json.load(state_file)
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(
+                f"{self.state_path}: unsupported state version {state.get('version')}, "
+                f"expected {STATE_VERSION}"
+            )
+        self.cohorts = state["cohorts"]
+        self.alphas = {int(semester): alpha for semester, alpha in state["alphas"].items()}
+        for semester, values in state["models"].items():
+            self.statistics[int(semester)] = RidgeStatistics.from_dict(values)
+
+
+def trained_alphas(models_dir: str) -> dict:
+    """
+    Read the alpha of every model saved by 'TrainingModel.train_models'.
+
+    Parameters:
+    - models_dir (str): The models directory, e.g. "models".
+
+    Returns:
+    - dict: The cross-validated alpha of each 'sem<N>_model.pkl', keyed by N.
+    """
+    alphas = {}
+    for filename in sorted(os.listdir(models_dir)):
+        match = TRAINED_MODEL_PATTERN.match(filename)
+        if match:
+            with open(os.path.join(models_dir, filename), "rb") as model_file:
+                alphas[int(match.group(1))] = float(pickle.load(model_file).alpha)
+    return alphas
+
+
+def main(argv: list = None):
+    """Ingest new semester files from the command line and export the updated models."""
+    parser = argparse.ArgumentParser(description="Update the semester models with new results.")
+    parser.add_argument("files", nargs="*", help="SemN CSV files of the cohort, in semester order")
+    parser.add_argument("--cohort", required=True, help="the cohort the files belong to")
+    parser.add_argument(
+        "--init",
+        metavar="DATA_DIR",
+        default=None,
+        help="create the state from the cohort the models were trained on, e.g. data",
+    )
+    parser.add_argument("--state", default="models/training_state.json", help="state file")
+    parser.add_argument("--models-dir", default="models", help="where the models are exported")
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=None,
+        help="regularization of the updated models, required for a model without one",
+    )
+    parser.add_argument(
+        "--close", action="store_true", help="drop the cohort's history: it has no semester left"
+    )
+    args = parser.parse_args(argv)
+
+    # Check everything before reading any file
+    if args.init is not None:
+        if os.path.exists(args.state):
+            parser.error(f"{args.state} already exists")
+    elif not os.path.exists(args.state):
+        parser.error(
+            f"{args.state} does not exist, create it from the training data first "
+            "with --init data"
+        )
+    elif not args.files and not args.close:
+        parser.error("no files given")
+    files = []
+    for path in args.files:
+        match = SEMESTER_FILE_PATTERN.match(os.path.basename(path))
+        if not match:
+            parser.error(f"{path}: not a SemN CSV file")
+        files.append((path, int(match.group(1))))
+
+    # Ingest in memory: nothing is written unless every file and model succeeds
+    trainer = IncrementalTrainer(args.state)
+    updated = set()
+    if args.init is not None:
+        start = time.perf_counter()
+        trainer.alphas.update(trained_alphas(args.models_dir))
+        try:
+            trainer.bootstrap(args.init, args.cohort)
+        except (FileNotFoundError, ValueError) as e:
+            parser.error(f"{args.init}: {e}")
+        print(
+            f"{args.init}: created {args.state} from cohort {args.cohort} "
+            f"in {time.perf_counter() - start:.3f}s"
+        )
+    for path, semester in files:
+        start = time.perf_counter()
+        digest, _ = digest_source(path)
+        try:
+            updated.add(trainer.ingest(args.cohort, semester, process_semester(path), digest))
+        except ValueError as e:
+            parser.error(f"{path}: {e}")
+        print(
+            f"{path}: ingested Sem{semester} of cohort {args.cohort} "
+            f"in {time.perf_counter() - start:.3f}s"
+        )
+    updated.discard(None)
+
+    models = {}
+    for semester in sorted(updated):
+        try:
+            models[semester] = trainer.model(semester, args.alpha)
+        except ValueError as e:
+            parser.error(f"{e} with --alpha")
+    if args.close:
+        try:
+            trainer.close(args.cohort)
+        except KeyError:
+            parser.error(f"cohort {args.cohort} was never ingested")
+
+    # Write the models and the state together
+    temporaries = {}
+    for semester, model in models.items():
+        path = os.path.join(args.models_dir, f"sem{semester}_model.npz")
+        temporaries[path] = f"{path}.{os.getpid()}.tmp"
+        model.save(temporaries[path])
+    for path, temporary in temporaries.items():
+        os.replace(temporary, path)
+    trainer.save()
+    for semester in models:
+        print(
+            f"updated sem{semester}_model ({trainer.statistics[semester].n} rows, "
+            f"alpha {trainer.alphas[semester]:g})"
+        )
+
+
+if __name__ == "__main__":
+    main()
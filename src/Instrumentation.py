@@ -0,0 +1,466 @@
+"""
+Instrumentation Module
+
+This module times the stages of the prediction pipeline (parsing, SGPA
+calculation, joining, model loading and prediction), counts the rows they
+handle and optionally their peak memory, and renders these and the request
+metrics of the web application in the Prometheus text format. Processes
+serving the same application (gunicorn workers) can share a directory
+where each one writes its metrics, so any of them renders the total.
+"""
+import bisect
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# Upper bounds, in seconds, of the buckets of every duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Stage records of the current request, see 'start_request'
+_records = contextvars.ContextVar("stage_records", default=None)
+
+_enabled = True
+_trace_memory = False
+
+# Directory shared by the processes serving the application, see 'configure'
+_metrics_dir = None
+# Whether a metric changed since this process last wrote them, and the
+# extra values it wrote
+_dirty = False
+_flushed_extra = None
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus histogram with labels.
+
+    Parameters:
+    - name (str): The metric name.
+    - help (str): The help text.
+    - labelnames (tuple): The names of the labels of each observation.
+    - buckets (tuple): Sorted upper bounds of the buckets.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        """Record a value for the given label values."""
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[position] += 1
+            self._series[labels] = (counts, total + value)
+
+    def snapshot(self) -> list:
+        """Return the series as JSON-serializable [labels, counts, sum] entries."""
+        with self._lock:
+            return [
+                [list(labels), list(counts), total]
+                for labels, (counts, total) in self._series.items()
+            ]
+
+    def reset(self):
+        """Forget every observation."""
+        with self._lock:
+            self._series = {}
+
+    def render(self, snapshots: list = ()) -> list:
+        """
+        Return the lines of the metric in the Prometheus text format.
+
+        Parameters:
+        - snapshots (list): 'snapshot' results of the same metric in other
+        processes, added to the observations of this one.
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        merged = {}
+        for labels, counts, total in itertools.chain(self.snapshot(), *snapshots):
+            labels = tuple(labels)
+            if labels in merged:
+                previous, previous_total = merged[labels]
+                counts = [a + b for a, b in zip(previous, counts)]
+                total += previous_total
+            merged[labels] = (counts, total)
+        series = sorted((labels, counts, total) for labels, (counts, total) in merged.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le=bound)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """
+    Thread-safe Prometheus counter with labels.
+
+    Parameters:
+    - name (str): The metric name, ending in "_total".
+    - help (str): The help text.
+    - labelnames (tuple): The names of the labels of each increment.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, *labels):
+        """Add a value for the given label values."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def snapshot(self) -> list:
+        """Return the values as JSON-serializable [labels, value] entries."""
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def reset(self):
+        """Forget every increment."""
+        with self._lock:
+            self._values = {}
+
+    def render(self, snapshots: list = ()) -> list:
+        """
+        Return the lines of the metric in the Prometheus text format.
+
+        Parameters:
+        - snapshots (list): 'snapshot' results of the same metric in other
+        processes, added to the values of this one.
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        merged = {}
+        for labels, value in itertools.chain(self.snapshot(), *snapshots):
+            merged[tuple(labels)] = merged.get(tuple(labels), 0) + value
+        for labels, value in sorted(merged.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    "eduinsight_stage_duration_seconds",
+    "Time spent in each stage of the prediction pipeline.",
+    ("stage",),
+)
+STAGE_ROWS = Counter(
+    "eduinsight_stage_rows_total", "Rows handled by each pipeline stage.", ("stage",)
+)
+STAGE_PEAK_MEMORY = Histogram(
+    "eduinsight_stage_peak_memory_bytes",
+    "Peak memory allocated by each pipeline stage, when memory tracing is on.",
+    ("stage",),
+    buckets=tuple(2**power for power in range(16, 34, 2)),
+)
+REQUEST_DURATION = Histogram(
+    "eduinsight_request_duration_seconds",
+    "Time spent handling each request, until the response starts.",
+    ("endpoint", "method", "status"),
+)
+
+# Every metric rendered by 'render_metrics'
+METRICS = (REQUEST_DURATION, STAGE_DURATION, STAGE_ROWS, STAGE_PEAK_MEMORY)
+
+
+def configure(enabled: bool = True, trace_memory: bool = False, metrics_dir: str = None):
+    """
+    Turn the instrumentation on or off.
+
+    Parameters:
+    - enabled (bool): Record stage durations and row counts.
+    - trace_memory (bool): Also record the peak memory of each stage with
+    tracemalloc. This slows every allocation down, so it is meant for
+    diagnosing a slow or large upload rather than for normal serving. The
+    traced peak is global to the process, so stages running at the same
+    time in other threads (concurrent requests of a threaded worker) add to
+    each other's peak: trace memory with one request at a time.
+    - metrics_dir (str): A directory shared by every process serving the
+    application. Each process writes its metrics there with 'flush_metrics'
+    and 'render_metrics' adds up those of all of them, so the counters of a
+    server with several workers do not depend on the worker that answers.
+    None keeps the metrics of each process to itself.
+    """
+    global _enabled, _trace_memory, _metrics_dir
+    _enabled = enabled
+    _trace_memory = enabled and trace_memory
+    _metrics_dir = metrics_dir
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+    if _trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not _trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled() -> bool:
+    """Return whether stages are recorded."""
+    return _enabled
+
+
+class _Stage:
+    """Context manager recording one run of a pipeline stage."""
+
+    __slots__ = ("name", "rows", "_start", "_memory")
+
+    def __init__(self, name: str, rows: int):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._memory = _reset_peak() if _trace_memory else None
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        peak = _peak_since(self._memory) if self._memory is not None else None
+        record(self.name, seconds, self.rows, peak)
+        return False
+
+
+class _NullStage:
+    """Stand-in for '_Stage' while the instrumentation is disabled."""
+
+    __slots__ = ("rows",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str, rows: int = None):
+    """
+    Time a block of code as a pipeline stage.
+
+    Parameters:
+    - name (str): The stage, e.g. "get_combined_sgpa".
+    - rows (int): The rows handled, if known before the block. It can also be
+    set on the returned object inside the block.
+
+    Example:
+    >>> with stage("get_combined_sgpa") as timed:
+    ...     result = get_combined_sgpa(*sem_sgpa)
+    ...     timed.rows = len(result)
+
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name, rows)
+
+
+def timed_chunks(name: str, chunks):
+    """
+    Time the production of a stream of DataFrame chunks as one stage.
+
+    Parameters:
+    - name (str): The stage, e.g. "clean_data".
+    - chunks (iterable): The chunks, such as 'clean_data_chunks(...)'.
+
+    Returns:
+    - iterable: The same chunks. Only the time spent producing them counts,
+    not the time the consumer spends between chunks, and one record with the
+    total time and rows is made once the stream is exhausted.
+    """
+    if not _enabled:
+        return chunks
+    return _timed_chunks(name, iter(chunks))
+
+
+def _timed_chunks(name: str, chunks):
+    """Generator behind 'timed_chunks'."""
+    seconds, rows, peak = 0.0, 0, None
+    while True:
+        memory = _reset_peak() if _trace_memory else None
+        start = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            break
+        finally:
+            seconds += time.perf_counter() - start
+            if memory is not None:
+                peak = max(peak or 0, _peak_since(memory))
+        rows += len(chunk)
+        yield chunk
+    record(name, seconds, rows, peak)
+
+
+def _reset_peak() -> int:
+    """Reset the traced peak and return the memory currently traced."""
+    tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _peak_since(memory: int) -> int:
+    """Return how far the traced memory peaked above 'memory'."""
+    return max(tracemalloc.get_traced_memory()[1] - memory, 0)
+
+
+def record(name: str, seconds: float, rows: int = None, peak: int = None):
+    """Record a run of a stage in the metrics and in the current request."""
+    global _dirty
+    _dirty = True
+    STAGE_DURATION.observe(seconds, name)
+    if rows is not None:
+        STAGE_ROWS.inc(rows, name)
+    if peak is not None:
+        STAGE_PEAK_MEMORY.observe(peak, name)
+
+    records = _records.get()
+    if records is not None:
+        records.append({"stage": name, "seconds": seconds, "rows": rows, "peak_memory": peak})
+
+
+def start_request() -> list:
+    """
+    Start collecting the stage records of the current request.
+
+    Returns:
+    - list: The records, filled in as stages run in this context. Work
+    handed to a thread pool is included when submitted through
+    'contextvars.copy_context().run'. Work in another process is included
+    only once its records are sent back and passed to 'record', as
+    'process_semesters' does.
+    """
+    records = []
+    _records.set(records)
+    return records
+
+
+def observe_request(endpoint: str, method: str, status: int, seconds: float):
+    """Record a handled request in the request histogram."""
+    global _dirty
+    if _enabled:
+        _dirty = True
+        REQUEST_DURATION.observe(seconds, endpoint, method, str(status))
+
+
+def reset_metrics():
+    """Forget the metrics of this process, e.g. those a forked worker inherited."""
+    global _dirty, _flushed_extra
+    for metric in METRICS:
+        metric.reset()
+    _dirty, _flushed_extra = False, None
+
+
+def flush_metrics(extra: dict = None):
+    """
+    Write the metrics of this process to the shared 'metrics_dir'.
+
+    Parameters:
+    - extra (dict): The extra metrics of this process, as passed to
+    'render_metrics'.
+
+    Explanation:
+    Nothing is written without a 'metrics_dir' or when no metric changed
+    since the last call, so it can be called after every request. The file,
+    "<pid>.json", is replaced atomically and is kept after the process
+    exits, so the counters of a replaced worker are still counted.
+    """
+    global _dirty, _flushed_extra
+    if _metrics_dir is None or (not _dirty and extra == _flushed_extra):
+        return
+    _dirty, _flushed_extra = False, extra
+    snapshot = {
+        "metrics": {metric.name: metric.snapshot() for metric in METRICS},
+        "extra": extra or {},
+    }
+    path = os.path.join(_metrics_dir, f"{os.getpid()}.json")
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(temporary, path)
+
+
+def mark_process_dead(metrics_dir: str, pid: int):
+    """
+    Drop the gauges of an exited process from a metrics directory.
+
+    Its counters and histograms are kept, so totals never go down, but a
+    gauge (such as a cache size) of a process that is gone no longer holds.
+    """
+    path = os.path.join(metrics_dir, f"{pid}.json")
+    try:
+        with open(path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (FileNotFoundError, ValueError):
+        return
+    snapshot["extra"] = {
+        name: value for name, value in snapshot["extra"].items() if value[0] != "gauge"
+    }
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(temporary, path)
+
+
+def render_metrics(extra: dict = None) -> str:
+    """
+    Render every metric in the Prometheus text format.
+
+    Parameters:
+    - extra (dict): Additional (type, help, value) gauges or counters keyed by
+    metric name, such as the counters of the prediction cache.
+
+    Returns:
+    - str: The metrics page. With a 'metrics_dir', every value is the sum
+    over this process and the ones that wrote their metrics there.
+    """
+    others = _other_snapshots()
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render([other["metrics"].get(metric.name, []) for other in others]))
+    for name, (kind, help, value) in (extra or {}).items():
+        value += sum(other["extra"][name][2] for other in others if name in other["extra"])
+        lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"])
+    return "\n".join(lines) + "\n"
+
+
+def _other_snapshots() -> list:
+    """Return the metrics written to 'metrics_dir' by the other processes."""
+    if _metrics_dir is None:
+        return []
+    own = f"{os.getpid()}.json"
+    snapshots = []
+    for name in os.listdir(_metrics_dir):
+        if not name.endswith(".json") or name == own:
+            continue
+        try:
+            with open(os.path.join(_metrics_dir, name)) as snapshot_file:
+                snapshots.append(json.load(snapshot_file))
+        except (FileNotFoundError, ValueError):
+            continue
+    return snapshots
+
+
+def _labels(names: tuple, values: tuple, le=None) -> str:
+    """Format label values, e.g. {stage="clean_data",le="0.5"}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,208 @@
+"""
+Job Queue Module
+
+This module runs long pipeline jobs on a local worker pool and keeps their
+status and results on disk, so a request can submit a job and return
+immediately while the client polls for the result.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+STATUS_FILENAME = "status.json"
+RESULT_FILENAME = "result.csv"
+
+# Job states, in the order a job goes through them
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its maximum depth."""
+
+
+class JobNotFoundError(LookupError):
+    """Raised for an unknown or expired job id."""
+
+
+class JobQueue:
+    """
+    Local job queue backed by a worker pool and a results directory.
+
+    Parameters:
+    - results_dir (str): The directory holding one sub-directory per job.
+    - max_workers (int): Number of jobs run at the same time.
+    - max_queued (int): Largest number of jobs queued or running in this
+    process. Further submissions raise QueueFullError.
+    - ttl (float): Seconds after it finished before a job and its result
+    are deleted.
+
+    Explanation:
+    Each job gets a directory named after its id holding 'status.json' and,
+    once done, 'result.csv'. Since the status lives on disk, any process
+    sharing the results directory (e.g. every gunicorn worker on the host)
+    can answer status and download requests, without an external broker.
+    Expired jobs are removed whenever a new job is created. A job that is
+    still queued or running is never removed, however long it takes.
+
+    Example:
+    >>> jobs = JobQueue("results", max_workers=2)
+    >>> job_id = jobs.create()
+    >>> jobs.start(job_id, write_result)  # write_result(result_path)
+    >>> jobs.status(job_id)["status"]
+    'running'
+
+    """
+
+    def __init__(
+        self,
+        results_dir: str = "results",
+        max_workers: int = 2,
+        max_queued: int = 16,
+        ttl: float = 3600,
+    ):
+        self.results_dir = results_dir
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+        os.makedirs(results_dir, exist_ok=True)
+
+    def create(self) -> str:
+        """
+        Reserve a place in the queue and create the directory of a new job.
+
+        Returns:
+        - str: The id of the job. Inputs can be written with 'path' before the
+        job is started with 'start'.
+
+        Raises:
+        - QueueFullError: If 'max_queued' jobs are already queued or running.
+        """
+        with self._lock:
+            if self._pending >= self.max_queued:
+                raise QueueFullError(
+                    f"Too many jobs in progress ({self.max_queued}), try again later"
+                )
+            self._pending += 1
+
+        self.evict_expired()
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._directory(job_id))
+        self._write_status(job_id, QUEUED)
+        return job_id
+
+    def start(self, job_id: str, func, *args):
+        """
+        Run func(result_path, *args) for a created job on the worker pool.
+
+        Parameters:
+        - job_id (str): The id returned by 'create'.
+        - func (callable): Writes the result of the job to the path it receives.
+        """
+        self._executor.submit(self._run, job_id, func, args)
+
+    def fail(self, job_id: str, error: str):
+        """
+        Mark a created job as failed without running it, releasing its place
+        in the queue. Used when its inputs could not be prepared.
+        """
+        self._write_status(job_id, FAILED, error=error)
+        with self._lock:
+            self._pending -= 1
+
+    def path(self, job_id: str, filename: str) -> str:
+        """Return the path of a file in the directory of a job."""
+        return os.path.join(self._directory(job_id), filename)
+
+    def status(self, job_id: str) -> dict:
+        """
+        Return the status of a job.
+
+        Returns:
+        - dict: The job id, its state ("queued", "running", "done" or
+        "failed"), creation and update times, and the error of a failed job.
+
+        Raises:
+        - JobNotFoundError: If the job does not exist or has expired.
+        """
+        try:
+            with open(self.path(job_id, STATUS_FILENAME)) as status_file:
+                return json.load(status_file)
+        except FileNotFoundError:
+            raise JobNotFoundError(f"Unknown job {job_id}") from None
+
+    def result_path(self, job_id: str) -> str:
+        """
+        Return the result file of a finished job, or None if it is not done yet.
+
+        Raises:
+        - JobNotFoundError: If the job does not exist or has expired.
+        """
+        if self.status(job_id)["status"] != DONE:
+            return None
+        return self.path(job_id, RESULT_FILENAME)
+
+    def evict_expired(self):
+        """Delete the finished jobs whose status has not changed for longer than the TTL."""
+        deadline = time.time() - self.ttl
+        for job_id in os.listdir(self.results_dir):
+            if not JOB_ID_PATTERN.match(job_id):
+                continue
+            try:
+                if os.path.getmtime(self.path(job_id, STATUS_FILENAME)) >= deadline:
+                    continue
+                # A queued or running job still has a worker writing to its directory
+                if self.status(job_id)["status"] not in (DONE, FAILED):
+                    continue
+            except (FileNotFoundError, JobNotFoundError, ValueError):
+                continue
+            shutil.rmtree(self._directory(job_id), ignore_errors=True)
+
+    def _run(self, job_id: str, func, args: tuple):
+        """Run a job on a worker thread and record its outcome."""
+        try:
+            self._write_status(job_id, RUNNING)
+            func(self.path(job_id, RESULT_FILENAME), *args)
+            status, error = DONE, None
+        except Exception as e:
+            status, error = FAILED, str(e)
+
+        # Free the slot first, so a client seeing the final status can submit again
+        with self._lock:
+            self._pending -= 1
+        self._write_status(job_id, status, error=error)
+
+    def _directory(self, job_id: str) -> str:
+        """Return the directory of a job, rejecting anything that is not a job id."""
+        if not JOB_ID_PATTERN.match(job_id):
+            raise JobNotFoundError(f"Unknown job {job_id}")
+        return os.path.join(self.results_dir, job_id)
+
+    def _write_status(self, job_id: str, status: str, error: str = None):
+        """Atomically replace the status file of a job."""
+        path = self.path(job_id, STATUS_FILENAME)
+        now = time.time()
+        try:
+            with open(path) as status_file:
+                created = json.load(status_file)["created"]
+        except FileNotFoundError:
+            created = now
+
+        record = {"id": job_id, "status": status, "created": created, "updated": now}
+        if error is not None:
+            record["error"] = error
+
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as status_file:
+            json.dump(record, status_file)
+        os.replace(temporary, path)
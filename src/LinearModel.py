@@ -0,0 +1,108 @@
+"""
+Linear Model Module
+
+This module stores the coefficients of a trained linear model (such as the
+Ridge models of 'TrainingModel.py') in a small versioned '.npz' file and
+makes predictions from them with NumPy only, without importing sklearn.
+"""
+import numpy as np
+import pandas as pd
+
+# Version of the '.npz' layout written by 'LinearModel.save'
+FORMAT_VERSION = 1
+
+
+class LinearModel:
+    """
+    A linear model reduced to its coefficients: predict(X) = X @ coef + intercept.
+
+    Parameters:
+    - coef (array-like): One coefficient per feature.
+    - intercept (float): The intercept of the model.
+    - feature_names (list): Names of the features, in the order of 'coef'.
+
+    Example:
+    >>> model = LinearModel.from_estimator(ridge)
+    >>> model.save("models/sem4_model.npz")
+    >>> LinearModel.load("models/sem4_model.npz").predict([[8.7, 8.6, 9.2]])
+    array([8.8])
+
+    """
+
+    def __init__(self, coef, intercept: float, feature_names=None):
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+    @classmethod
+    def from_estimator(cls, estimator) -> "LinearModel":
+        """
+        Build a LinearModel from a fitted sklearn linear estimator.
+
+        Parameters:
+        - estimator: A fitted estimator with 'coef_' and 'intercept_', such as Ridge.
+
+        Returns:
+        - LinearModel: A model making the same predictions as the estimator.
+        """
+        return cls(
+            estimator.coef_,
+            estimator.intercept_,
+            getattr(estimator, "feature_names_in_", None),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LinearModel":
+        """
+        Load a model written by 'save'.
+
+        Parameters:
+        - path (str): The path of the '.npz' file.
+
+        Returns:
+        - LinearModel: The loaded model.
+
+        Raises:
+        - ValueError: If the file was written with an unknown format version.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["format_version"])
+            if version != FORMAT_VERSION:
+                raise ValueError(
+                    f"{path}: unsupported model format version {version}, "
+                    f"expected {FORMAT_VERSION}"
+                )
+            feature_names = data["feature_names"].tolist() or None
+            return cls(data["coef"], data["intercept"], feature_names)
+
+    def save(self, path: str):
+        """
+        Write the model to a '.npz' file.
+
+        Parameters:
+        - path (str): The path of the '.npz' file.
+        """
+        with open(path, "wb") as model_file:
+            np.savez(
+                model_file,
+                format_version=np.array(FORMAT_VERSION),
+                coef=self.coef,
+                intercept=np.array(self.intercept),
+                feature_names=np.array(self.feature_names or [], dtype=str),
+            )
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Predict the target for every row of X.
+
+        Parameters:
+        - X (array-like or pd.DataFrame): The features, one row per student.
+        DataFrame columns are selected by 'feature_names'.
+
+        Returns:
+        - np.ndarray: One prediction per row.
+        """
+        if isinstance(X, pd.DataFrame) and self.feature_names is not None:
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=np.float64)
+        return X @ self.coef + self.intercept
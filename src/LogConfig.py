@@ -0,0 +1,171 @@
+"""
+Log Configuration Module
+
+This module sets up the logging of the web application: records are put on
+an in-memory queue by the request threads and written by a background
+listener thread as JSON lines to a size-rotated file, so requests never wait
+on disk I/O. When several processes share the file (gunicorn's master and
+workers) it is instead reopened after an external tool such as logrotate
+rotates it. High-volume page-view records are sampled.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+
+# Default size of the log file before it is rotated, and rotated files kept
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Default fraction of page-view records that are kept
+PAGE_VIEW_SAMPLE_RATE = 0.1
+
+# Pass as 'extra' to mark a record as a page view, e.g.
+# app.logger.info("Home page: Accessed Successfully", extra=PAGE_VIEW)
+PAGE_VIEW = {"page_view": True}
+
+# Attributes every LogRecord has; anything else was passed through 'extra'
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line.
+
+    Explanation:
+    Each line holds the UTC time, the level, the logger name and the message,
+    followed by every field passed to the logging call through 'extra', so
+    log lines can be filtered and aggregated without parsing free text.
+
+    Example:
+    >>> app.logger.info("Batch Prediction: Predicted %d histories", 3,
+    ...                 extra={"histories": 3})
+    {"time": "2024-01-01T10:00:00.000000+00:00", "level": "INFO",
+     "logger": "app", "message": "Batch Prediction: Predicted 3 histories",
+     "histories": 3}
+
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class PageViewSampler(logging.Filter):
+    """
+    Keep only a fraction of the page-view records.
+
+    Parameters:
+    - rate (float): The fraction of records marked with PAGE_VIEW that are
+    kept. Kept records get a "sample_rate" field, so counts can be scaled
+    back up. Other records always pass.
+    """
+
+    def __init__(self, rate: float = PAGE_VIEW_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "page_view", False):
+            return True
+        if random.random() >= self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
+
+
+class LogListener(QueueListener):
+    """
+    A QueueListener that tracks whether it is running, so it can be stopped
+    both by its owner and at exit: stopping a stopped listener does nothing.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.running = False
+
+    def start(self):
+        super().start()
+        self.running = True
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            super().stop()
+
+
+def setup_logging(
+    path: str = "logs.log",
+    max_bytes: int = LOG_MAX_BYTES,
+    backup_count: int = LOG_BACKUP_COUNT,
+    page_view_sample_rate: float = PAGE_VIEW_SAMPLE_RATE,
+    level: int = logging.INFO,
+) -> LogListener:
+    """
+    Route every log record through a queue to a rotating JSON file and the console.
+
+    Parameters:
+    - path (str): The log file.
+    - max_bytes (int): The size at which the log file is rotated, or 0 to
+    leave the rotation to an external tool.
+    - backup_count (int): The number of rotated files kept.
+    - page_view_sample_rate (float): The fraction of page-view records kept.
+    - level (int): The lowest level logged.
+
+    Returns:
+    - LogListener: The started listener writing the records. It is stopped,
+    flushing the queue, when the interpreter exits if it is still running.
+
+    Explanation:
+    The root logger gets a single QueueHandler, so logging from a request
+    only formats the message and puts it on the queue. Sampling happens
+    before that, so dropped page views cost almost nothing. The listener
+    thread writes the records to the file, as JSON, and to the console in the
+    previous "time - level - message" format.
+
+    A RotatingFileHandler is only safe in a single process: each process
+    would rotate the file on its own and the others would keep writing to
+    the renamed file. With 'max_bytes' 0 the file is opened by a
+    WatchedFileHandler instead, which every process can append to and which
+    reopens the file once logrotate (or anything else) has moved it.
+    """
+    if max_bytes:
+        file_handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+    else:
+        file_handler = WatchedFileHandler(path, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    )
+
+    records = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(PageViewSampler(page_view_sample_rate))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = LogListener(records, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
@@ -0,0 +1,189 @@
+"""
+Model Registry Module
+
+This module finds the trained SGPA models in the models directory, loads
+each of them on first use and reloads a model when its file changes.
+Models exported to '.npz' by 'TrainingModel.export_model' are preferred over
+the sklearn pickles, so serving predictions does not need to import sklearn.
+"""
+import os
+import pickle
+import re
+import threading
+
+from src.Instrumentation import stage
+from src.LinearModel import LinearModel
+
+# Models are saved as 'sem<N>_model.npz' or 'sem<N>_model.pkl' and predict the
+# SGPA of semester N
+MODEL_PATTERN = re.compile(r"^sem(\d+)_model\.(npz|pkl)$")
+
+
+class ModelNotFoundError(LookupError):
+    """Raised when no model is available for the requested semester."""
+
+
+class ModelRegistry:
+    """
+    Lazily loaded, hot-reloadable collection of the semester models.
+
+    Parameters:
+    - directory (str): The directory holding the 'sem<N>_model.npz' or
+    'sem<N>_model.pkl' files.
+
+    Explanation:
+    The directory is scanned for model files when a semester is requested
+    that has not been seen yet, so a model for a new semester only needs to
+    be dropped into the directory. A model is loaded the first time it is
+    requested and kept in memory together with the modification time of its
+    file. Every lookup compares that time with the file on disk and loads
+    the file again when it changed, so retrained models are picked up by
+    running workers without a restart.
+
+    Example:
+    >>> registry = ModelRegistry("models")
+    >>> registry.semesters()
+    [2, 3, 4, 5]
+    >>> model = registry.for_history(3)  # Sem1-Sem3 known, predicts Sem4
+
+    """
+
+    def __init__(self, directory: str = "models"):
+        self.directory = directory
+        self._paths = {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def discover(self) -> dict:
+        """
+        Scan the directory for model files.
+
+        Returns:
+        - dict: The path of the model file of every semester found, the '.npz'
+        export when a semester has both files.
+        """
+        paths = {}
+        for filename in sorted(os.listdir(self.directory)):
+            match = MODEL_PATTERN.match(filename)
+            if match:
+                semester = int(match.group(1))
+                if semester not in paths or match.group(2) == "npz":
+                    paths[semester] = os.path.join(self.directory, filename)
+        self._paths = paths
+        return paths
+
+    def semesters(self) -> list:
+        """Return the semesters that have a model, in ascending order."""
+        return sorted(self.discover())
+
+    def version(self, semester: int) -> tuple:
+        """
+        Return a token that changes whenever the model file of a semester changes.
+
+        Parameters:
+        - semester (int): The semester predicted by the model.
+
+        Returns:
+        - tuple: The semester and the modification time of its model file.
+        """
+        try:
+            return semester, os.stat(self._path(semester)).st_mtime_ns
+        except FileNotFoundError:
+            # The file was removed or renamed since the last scan
+            self._paths.pop(semester, None)
+            return semester, os.stat(self._path(semester)).st_mtime_ns
+
+    def preload(self) -> list:
+        """
+        Load every model in the directory now instead of on first use.
+
+        Returns:
+        - list: The semesters whose models were loaded.
+
+        Explanation:
+        Called in the gunicorn master before the workers are forked, so the
+        models are loaded once and every worker starts with them in memory.
+        """
+        semesters = self.semesters()
+        for semester in semesters:
+            self.get(semester)
+        return semesters
+
+    def get(self, semester: int) -> LinearModel:
+        """
+        Return the model predicting the SGPA of a semester.
+
+        Parameters:
+        - semester (int): The semester predicted by the model.
+
+        Returns:
+        - LinearModel: The model, loaded again if its file changed since the last call.
+
+        Raises:
+        - ModelNotFoundError: If there is no model file for the semester.
+        """
+        return self.get_with_version(semester)[1]
+
+    def get_with_version(self, semester: int) -> tuple:
+        """
+        Return the model predicting the SGPA of a semester along with its version.
+
+        Parameters:
+        - semester (int): The semester predicted by the model.
+
+        Returns:
+        - tuple: The version token (see 'version') of the returned model and
+        the model itself.
+        """
+        version = self.version(semester)
+        cached = self._models.get(semester)
+        if cached is not None and cached[0] == version:
+            return cached
+
+        with self._lock:
+            cached = self._models.get(semester)
+            if cached is None or cached[0] != version:
+                with stage("load_model"):
+                    cached = (version, load_model(self._path(semester)))
+                self._models[semester] = cached
+        return cached
+
+    def for_history(self, num_semesters: int):
+        """
+        Return the model predicting the semester after 'num_semesters' known ones.
+
+        Parameters:
+        - num_semesters (int): Number of semesters with a known SGPA.
+
+        Returns:
+        - The model predicting semester 'num_semesters + 1'.
+        """
+        return self.get(num_semesters + 1)
+
+    def _path(self, semester: int) -> str:
+        """Return the model file of a semester, scanning the directory on a miss."""
+        if semester not in self._paths:
+            self.discover()
+        if semester not in self._paths:
+            raise ModelNotFoundError(
+                f"No model available to predict Sem{semester}. "
+                f"Available: {', '.join(f'Sem{s}' for s in sorted(self._paths))}"
+            )
+        return self._paths[semester]
+
+
+def load_model(path: str) -> LinearModel:
+    """
+    Load a model file written by 'TrainingModel.py'.
+
+    Parameters:
+    - path (str): A '.npz' export or a pickled sklearn linear model.
+
+    Returns:
+    - LinearModel: The model. Pickled estimators are converted with
+    'LinearModel.from_estimator'.
+    """
+    if path.endswith(".npz"):
+        return LinearModel.load(path)
+    with open(path, "rb") as model_file:
+        return LinearModel.from_estimator(pickle.load(model_file))
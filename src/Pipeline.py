@@ -0,0 +1,453 @@
+"""
+Pipeline Module
+
+This module runs the prediction pipeline: cleaning and SGPA calculation of
+each semester file, optionally in parallel and cached, combining the
+semesters and predicting the next one. The 'Pipeline' class is shared by
+the web application, the training script and the notebook, and the module
+scores whole directories of cohorts from the command line.
+
+Usage:
+    python -m src.Pipeline data/2021 data/2022 --output-dir predictions
+"""
+import argparse
+import contextvars
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.CleanedMarks import CleanedMarks
+from src.DataCleaning import clean_marks_chunks
+from src.FeatureExtraction import get_combined_sgpa, get_sgpa
+from src.Instrumentation import record, stage, start_request, timed_chunks
+from src.ModelRegistry import ModelNotFoundError, ModelRegistry
+from src.SemesterCache import SemesterCache, digest_source
+
+# Ways of running 'process_semesters'
+EXECUTORS = ("serial", "thread", "process")
+
+# Semester exports, e.g. "Sem1.csv" or "Sem1 October-21.csv"
+SEMESTER_FILE_PATTERN = re.compile(r"^Sem(\d+)(?!\d).*\.csv$")
+
+
+class SemesterProcessingError(Exception):
+    """
+    Raised when a semester file cannot be cleaned or its SGPA calculated.
+
+    Attributes:
+    - semester (int): The position of the file in the upload, starting at 1.
+    - filename (str): The name of the file.
+    - error (Exception): The original exception.
+    """
+
+    def __init__(self, semester: int, filename: str, error: Exception):
+        super().__init__(f"Sem{semester} ({filename}): {error}")
+        self.semester = semester
+        self.filename = filename
+        self.error = error
+
+
+def process_semester(source, cache=None, digest: str = None) -> pd.DataFrame:
+    """
+    Clean a semester file and calculate its SGPA.
+
+    Parameters:
+    - source (str, bytes or file object): The path, content or open file of
+    the semester CSV.
+    - cache (SemesterCache): Optional cache of earlier results, keyed by the
+    content of the file.
+    - digest (str): The 'digest_source' of the file if the caller already
+    has it, so the file is not hashed again for the cache.
+
+    Returns:
+    - pd.DataFrame: The 'get_sgpa' result for the whole file.
+
+    Explanation:
+    The file is read in chunks into compact 'CleanedMarks' and the SGPA of
+    each chunk is calculated as soon as it is cleaned. With a cache, a file
+    seen before is not parsed at all: its SGPA, or else its cleaned marks,
+    are loaded. On a miss the chunks are joined so the cleaned marks of the
+    whole file can be stored.
+    """
+    if cache is None:
+        sgpa = []
+        for cleaned in timed_chunks("clean_data", clean_marks_chunks(_readable(source))):
+            with stage("get_sgpa", len(cleaned)):
+                sgpa.append(get_sgpa(cleaned))
+        return pd.concat(sgpa, ignore_index=True)
+
+    if digest is None:
+        digest, source = digest_source(source)
+    sgpa = cache.get(digest, "sgpa")
+    if sgpa is not None:
+        return sgpa
+
+    cleaned = cache.get(digest, "marks")
+    if cleaned is None:
+        cleaned = CleanedMarks.concat(
+            list(timed_chunks("clean_data", clean_marks_chunks(_readable(source))))
+        )
+        cache.put(digest, "marks", cleaned)
+    with stage("get_sgpa", len(cleaned)):
+        sgpa = get_sgpa(cleaned)
+    cache.put(digest, "sgpa", sgpa)
+    return sgpa
+
+
+def process_semesters(
+    files: list, executor: str = "thread", max_workers: int = None, cache=None, digests=None
+) -> list:
+    """
+    Clean several semester files and calculate their SGPA concurrently.
+
+    Parameters:
+    - files (list): (filename, source) pairs in semester order, where source
+    is anything accepted by 'process_semester'.
+    - executor (str): "serial", "thread" or "process".
+    - max_workers (int): Size of the thread or process pool. Defaults to the
+    number of CPUs, and is never larger than the number of files.
+    - cache (SemesterCache): Optional cache passed to 'process_semester'.
+    - digests (list): Optional 'digest_source' of each file, passed to
+    'process_semester'.
+
+    Returns:
+    - list: The SGPA DataFrame of each file, in the order of 'files'.
+
+    Raises:
+    - SemesterProcessingError: For the first file, in semester order, that
+    failed. The error names the semester and the file.
+    - ValueError: If 'executor' is unknown.
+
+    Explanation:
+    The semester files do not depend on each other until they are combined
+    with 'get_combined_sgpa', so each file is processed as a separate task.
+    A process pool cannot receive open files, so file objects are read into
+    bytes before they are submitted.
+
+    Example:
+    >>> sem1, sem2 = process_semesters([("Sem1.csv", "data/Sem1.csv"),
+    ...                                 ("Sem2.csv", "data/Sem2.csv")])
+
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"executor must be one of {EXECUTORS}, got {executor!r}")
+    if digests is None:
+        digests = [None] * len(files)
+
+    if executor == "serial" or len(files) <= 1:
+        return [
+            _run(semester, filename, process_semester, source, cache, digest)
+            for semester, ((filename, source), digest) in enumerate(zip(files, digests), start=1)
+        ]
+
+    workers = min(max_workers or os.cpu_count() or 1, len(files))
+    if executor == "process":
+        files = [
+            (filename, source.read() if hasattr(source, "read") else source)
+            for filename, source in files
+        ]
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+    with pool:
+        if executor == "process":
+            # A context cannot be sent to another process, so each worker
+            # returns the stages it recorded and they are recorded again here
+            futures = [
+                pool.submit(_process_semester_recorded, source, cache, digest)
+                for (_, source), digest in zip(files, digests)
+            ]
+            return [
+                _replay(*_run(semester, filename, future.result))
+                for semester, ((filename, _), future) in enumerate(zip(files, futures), start=1)
+            ]
+
+        # Threads run in a copy of the caller's context, so their stages are
+        # recorded with the request that submitted them
+        futures = [
+            pool.submit(contextvars.copy_context().run, process_semester, source, cache, digest)
+            for (_, source), digest in zip(files, digests)
+        ]
+        return [
+            _run(semester, filename, future.result)
+            for semester, ((filename, _), future) in enumerate(zip(files, futures), start=1)
+        ]
+
+
+def _process_semester_recorded(source, cache, digest) -> tuple:
+    """Run 'process_semester' in a worker process and return its stage records too."""
+    records = start_request()
+    return process_semester(source, cache, digest), records
+
+
+def _replay(sgpa: pd.DataFrame, records: list) -> pd.DataFrame:
+    """Record the stages a worker process recorded, and return its result."""
+    for entry in records:
+        record(entry["stage"], entry["seconds"], entry["rows"], entry["peak_memory"])
+    return sgpa
+
+
+def discover_semester_files(data_dir: str) -> list:
+    """
+    Find the semester exports in a directory, in semester order.
+
+    Parameters:
+    - data_dir (str): The directory holding "Sem1.csv", "Sem2 March-22.csv", ...
+
+    Returns:
+    - list: The paths of the files, Sem1 first.
+
+    Raises:
+    - FileNotFoundError: If no semester file exists, or a semester before the
+    last one is missing.
+    """
+    files = {}
+    for filename in os.listdir(data_dir):
+        match = SEMESTER_FILE_PATTERN.match(filename)
+        if match:
+            files[int(match.group(1))] = os.path.join(data_dir, filename)
+
+    if not files:
+        raise FileNotFoundError(f"No semester files found in {data_dir}")
+    missing = [semester for semester in range(1, max(files) + 1) if semester not in files]
+    if missing:
+        raise FileNotFoundError(
+            f"Missing semester files in {data_dir}: "
+            + ", ".join(f"Sem{semester}" for semester in missing)
+        )
+    return [files[semester] for semester in sorted(files)]
+
+
+def discover_cohorts(directory: str) -> list:
+    """
+    Find the cohorts to score in a directory.
+
+    Parameters:
+    - directory (str): Either a cohort, holding "Sem1.csv", "Sem2.csv", ...,
+    or a directory of cohorts, one sub-directory each.
+
+    Returns:
+    - list: The cohort directories, sorted by name.
+
+    Raises:
+    - FileNotFoundError: If neither the directory nor any of its
+    sub-directories holds a semester file.
+    """
+    def has_semesters(path):
+        return any(SEMESTER_FILE_PATTERN.match(filename) for filename in os.listdir(path))
+
+    if has_semesters(directory):
+        return [directory]
+    cohorts = [
+        entry.path
+        for entry in sorted(os.scandir(directory), key=lambda entry: entry.name)
+        if entry.is_dir() and has_semesters(entry.path)
+    ]
+    if not cohorts:
+        raise FileNotFoundError(f"No semester files found in {directory} or its sub-directories")
+    return cohorts
+
+
+@dataclass(frozen=True)
+class ClassPrediction:
+    """
+    The outcome of 'Pipeline.run' for the semester files of one cohort.
+
+    Attributes:
+    - sem_sgpa (list): The 'get_sgpa' result of each semester file.
+    - result (pd.DataFrame): The combined SGPA of every student and the
+    predicted SGPA of the next semester in "Sem<N>_Predicted", where
+    predictions below 4 are shown as 0.
+    - predicted (np.ndarray): The predictions, rounded to one decimal but
+    otherwise unchanged.
+    - model_version (tuple): The version of the model that made them, see
+    'ModelRegistry.version'.
+    """
+
+    sem_sgpa: list
+    result: pd.DataFrame
+    predicted: np.ndarray
+    model_version: tuple
+
+
+class Pipeline:
+    """
+    The class prediction pipeline: clean -> SGPA -> combine -> predict.
+
+    Parameters:
+    - models (ModelRegistry): The registry providing the semester models.
+    Only needed to predict.
+    - executor (str): How the semester files are processed: "serial",
+    "thread" or "process", see 'process_semesters'.
+    - max_workers (int): Size of the thread or process pool.
+    - cache (SemesterCache): Optional cache of cleaned marks and SGPA.
+
+    Explanation:
+    Each stage is a method, so callers that only need part of the flow (the
+    training script combines the semesters but does not predict) use the
+    same code as the web application. Every stage is recorded by the
+    instrumentation.
+
+    Example:
+    >>> pipeline = Pipeline(ModelRegistry("models"))
+    >>> prediction = pipeline.run_directory("data")
+    >>> prediction.result.columns[-1]
+    'Sem6_Predicted'
+    >>> sem1, sem2 = Pipeline().load("data")[:2]
+
+    """
+
+    def __init__(
+        self,
+        models: ModelRegistry = None,
+        executor: str = "thread",
+        max_workers: int = None,
+        cache: SemesterCache = None,
+    ):
+        if executor not in EXECUTORS:
+            raise ValueError(f"executor must be one of {EXECUTORS}, got {executor!r}")
+        self.models = models
+        self.executor = executor
+        self.max_workers = max_workers
+        self.cache = cache
+
+    def semesters(self, files: list, digests: list = None) -> list:
+        """
+        Return the SGPA of each of the (filename, source) pairs of 'files'.
+
+        'digests' optionally holds the 'digest_source' of each file, see
+        'process_semesters'.
+        """
+        return process_semesters(files, self.executor, self.max_workers, self.cache, digests)
+
+    def load(self, data_dir: str) -> list:
+        """Return the SGPA of each semester file of a directory, Sem1 first."""
+        paths = discover_semester_files(data_dir)
+        return self.semesters([(os.path.basename(path), path) for path in paths])
+
+    def combine(self, *sem_sgpa: pd.DataFrame) -> pd.DataFrame:
+        """Combine the SGPA of the semesters with 'get_combined_sgpa'."""
+        with stage("get_combined_sgpa") as timed:
+            result = get_combined_sgpa(*sem_sgpa)
+            timed.rows = len(result)
+        return result
+
+    def predict(self, result: pd.DataFrame) -> tuple:
+        """
+        Predict the semester after the ones combined in 'result'.
+
+        Returns:
+        - tuple: The version of the model used and the predictions, rounded
+        to one decimal.
+
+        Raises:
+        - ModelNotFoundError: If there is no model for the number of semesters.
+        """
+        if self.models is None:
+            raise ModelNotFoundError("The pipeline has no models to predict with")
+        version, model = self.models.get_with_version(result.shape[1])
+        with stage("predict", len(result)):
+            predicted = np.round(model.predict(result.iloc[:, 1:]), decimals=1)
+        return version, predicted
+
+    def run(self, files: list, digests: list = None) -> ClassPrediction:
+        """
+        Run the whole pipeline on the semester files of one cohort.
+
+        Parameters:
+        - files (list): (filename, source) pairs in semester order.
+        - digests (list): Optional 'digest_source' of each file, see
+        'process_semesters'.
+
+        Raises:
+        - SemesterProcessingError: If a file cannot be processed.
+        - ModelNotFoundError: If there is no model for the number of files.
+        """
+        sem_sgpa = self.semesters(files, digests)
+        result = self.combine(*sem_sgpa)
+        version, predicted = self.predict(result)
+        result[f"Sem{len(sem_sgpa) + 1}_Predicted"] = [0 if x < 4 else x for x in predicted]
+        return ClassPrediction(sem_sgpa, result, predicted, version)
+
+    def run_directory(self, data_dir: str) -> ClassPrediction:
+        """Run the whole pipeline on the semester files of a directory."""
+        paths = discover_semester_files(data_dir)
+        return self.run([(os.path.basename(path), path) for path in paths])
+
+
+def _readable(source):
+    """Wrap bytes in a file object, leaving paths and file objects as they are."""
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    return source
+
+
+def _run(semester: int, filename: str, func, *args):
+    """Call func(*args), tying any exception to its semester file."""
+    try:
+        return func(*args)
+    except Exception as e:
+        raise SemesterProcessingError(semester, filename, e) from e
+
+
+def main(argv: list = None):
+    """Write the predictions of every cohort directory given on the command line."""
+    parser = argparse.ArgumentParser(description="Predict the next semester SGPA of whole cohorts.")
+    parser.add_argument(
+        "directories", nargs="+", help="cohort directories of SemN CSV files, or their parents"
+    )
+    parser.add_argument("--output-dir", default="predictions", help="where predictions are written")
+    parser.add_argument("--models-dir", default="models", help="directory of the semester models")
+    parser.add_argument("--executor", choices=EXECUTORS, default="thread")
+    parser.add_argument("--workers", type=int, default=None, help="size of the worker pool")
+    parser.add_argument("--cache-dir", default=None, help="cache of cleaned semester data")
+    args = parser.parse_args(argv)
+
+    cohorts = {}
+    for directory in args.directories:
+        try:
+            for cohort in discover_cohorts(directory):
+                name = os.path.basename(os.path.normpath(cohort))
+                if name in cohorts and cohorts[name] != cohort:
+                    parser.error(f"{cohort}: another cohort is also named {name}")
+                cohorts[name] = cohort
+        except (FileNotFoundError, NotADirectoryError) as e:
+            parser.error(str(e))
+
+    pipeline = Pipeline(
+        ModelRegistry(args.models_dir),
+        executor=args.executor,
+        max_workers=args.workers,
+        cache=SemesterCache(args.cache_dir) if args.cache_dir else None,
+    )
+    os.makedirs(args.output_dir, exist_ok=True)
+    failed = 0
+    for name, cohort in cohorts.items():
+        start = time.perf_counter()
+        try:
+            prediction = pipeline.run_directory(cohort)
+        except (FileNotFoundError, SemesterProcessingError, ModelNotFoundError) as e:
+            print(f"{cohort}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+
+        path = os.path.join(args.output_dir, f"{name}.csv")
+        prediction.result.to_csv(path, index=False)
+        print(
+            f"{cohort}: predicted {prediction.result.columns[-1]} of "
+            f"{len(prediction.result)} students in {time.perf_counter() - start:.2f}s -> {path}"
+        )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
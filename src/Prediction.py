@@ -0,0 +1,234 @@
+"""
+Prediction Module
+
+This module validates SGPA histories submitted to the web application and
+predicts the next semester SGPA for many of them at once, or for a whole
+grid of possible values of the semesters not known yet.
+"""
+import math
+
+import numpy as np
+
+from src.Instrumentation import stage
+
+# SGPA values are on a 10 point scale
+MIN_SGPA = 0.0
+MAX_SGPA = 10.0
+
+# Largest number of histories accepted in one batch
+MAX_BATCH_SIZE = 10_000
+
+# Default step between the SGPA values tried for an unknown semester
+WHAT_IF_STEP = 0.5
+
+# Largest number of points in one what-if grid
+MAX_WHAT_IF_POINTS = 10_000
+
+
+def parse_sgpa_history(values) -> list:
+    """
+    Validate an SGPA history and convert it to floats.
+
+    Parameters:
+    - values (list): The SGPA of Sem1, Sem2, ... as numbers or numeric strings.
+
+    Returns:
+    - list: The SGPA values as floats.
+
+    Raises:
+    - ValueError: If the history is empty or a value is not a number between
+    MIN_SGPA and MAX_SGPA. The message names the offending semester.
+
+    Example:
+    >>> parse_sgpa_history(["9.1", 8.5])
+    [9.1, 8.5]
+    >>> parse_sgpa_history(["9.1", "abc"])
+    ValueError: Sem2: 'abc' is not a number
+
+    """
+    if not isinstance(values, (list, tuple)) or not values:
+        raise ValueError("An SGPA history must be a non-empty list")
+
+    history = []
+    for position, value in enumerate(values, start=1):
+        try:
+            if isinstance(value, bool):
+                raise TypeError
+            sgpa = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Sem{position}: {value!r} is not a number") from None
+        if math.isnan(sgpa) or not MIN_SGPA <= sgpa <= MAX_SGPA:
+            raise ValueError(
+                f"Sem{position}: {value!r} is not between {MIN_SGPA:g} and {MAX_SGPA:g}"
+            )
+        history.append(sgpa)
+    return history
+
+
+def predict_histories(registry, histories: list, cache=None) -> np.ndarray:
+    """
+    Predict the next semester SGPA for SGPA histories of mixed length.
+
+    Parameters:
+    - registry (ModelRegistry): The registry providing the semester models.
+    - histories (list): SGPA histories, each a list of the SGPA of Sem1, Sem2, ...
+    - cache (PredictionCache): Optional cache of earlier predictions.
+
+    Returns:
+    - np.ndarray: The predicted SGPA of each history, rounded to one decimal,
+    in the order of 'histories'.
+
+    Raises:
+    - ValueError: If the batch or one of the histories is invalid. The
+    message names the position of the history in the batch.
+    - ModelNotFoundError: If no model exists for one of the history lengths.
+
+    Explanation:
+    The histories are grouped by length. Each group is stacked into one NumPy
+    array and predicted with a single call to the model for that length. With
+    a cache, histories already predicted by the same version of the model are
+    taken from the cache and only the others are passed to the model.
+
+    Example:
+    >>> predict_histories(registry, [[9.1, 8.5], [7.2], [8.0, 8.1]])
+    array([8.4, 5.8, 7.9])
+
+    """
+    if not isinstance(histories, list) or not histories:
+        raise ValueError("Expected a non-empty list of SGPA histories")
+    if len(histories) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} histories can be predicted at once")
+
+    groups = {}
+    for position, values in enumerate(histories):
+        try:
+            history = parse_sgpa_history(values)
+        except ValueError as e:
+            raise ValueError(f"History {position}: {e}") from None
+        groups.setdefault(len(history), ([], []))
+        groups[len(history)][0].append(position)
+        groups[len(history)][1].append(history)
+
+    predictions = np.empty(len(histories))
+    for num_semesters, (positions, group) in groups.items():
+        version, model = registry.get_with_version(num_semesters + 1)
+        if cache is None:
+            with stage("predict", len(group)):
+                predictions[positions] = model.predict(np.array(group))
+            continue
+
+        keys = [(version, tuple(history)) for history in group]
+        values = {key: None for key in keys}
+        for key in values:
+            values[key] = cache.get(key)
+        missing = [key for key, value in values.items() if value is None]
+        if missing:
+            with stage("predict", len(missing)):
+                computed = model.predict(np.array([key[1] for key in missing]))
+            for key, value in zip(missing, computed):
+                values[key] = float(value)
+                cache.put(key, values[key])
+        predictions[positions] = [values[key] for key in keys]
+
+    return np.round(predictions, decimals=1)
+
+
+def what_if_values(start: float, stop: float, step: float) -> np.ndarray:
+    """
+    Return the SGPA values from 'start' to 'stop' (inclusive) in steps of 'step'.
+
+    Raises:
+    - ValueError: If the range is outside MIN_SGPA..MAX_SGPA, empty, or the
+    step is not positive.
+
+    Example:
+    >>> what_if_values(4, 6, 0.5)
+    array([4. , 4.5, 5. , 5.5, 6. ])
+
+    """
+    for name, value in (("min", start), ("max", stop), ("step", step)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or math.isnan(value):
+            raise ValueError(f"{name}: {value!r} is not a number")
+    if not MIN_SGPA <= start <= stop <= MAX_SGPA:
+        raise ValueError(
+            f"Expected {MIN_SGPA:g} <= min <= max <= {MAX_SGPA:g}, got min={start:g}, max={stop:g}"
+        )
+    if step <= 0:
+        raise ValueError(f"step must be positive, got {step:g}")
+
+    # Counted in whole steps so that floating point error never drops 'stop'
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    return np.round(start + step * np.arange(count, dtype=np.float64), decimals=6)
+
+
+def predict_what_if(
+    registry,
+    history: list,
+    unknown: int = 1,
+    start: float = MIN_SGPA,
+    stop: float = MAX_SGPA,
+    step: float = WHAT_IF_STEP,
+) -> dict:
+    """
+    Predict the next semester SGPA over a grid of possible unknown semesters.
+
+    Parameters:
+    - registry (ModelRegistry): The registry providing the semester models.
+    - history (list): The known SGPA of Sem1, Sem2, ... May be empty.
+    - unknown (int): The number of semesters after the known ones whose SGPA
+    is not known yet.
+    - start, stop, step (float): The SGPA values tried for every unknown
+    semester, see 'what_if_values'.
+
+    Returns:
+    - dict: The unknown semesters ("Sem3", ...), the values tried, the
+    predicted semester and the predictions rounded to one decimal, nested
+    with one level per unknown semester: predictions[i][j] is the prediction
+    when the first unknown semester is values[i] and the second values[j].
+
+    Raises:
+    - ValueError: If the history, range or grid size is invalid.
+    - ModelNotFoundError: If there is no model for the full history length.
+
+    Explanation:
+    Every combination of values is one row of a single NumPy array, the known
+    history followed by the values of the unknown semesters, built from a
+    meshgrid without any Python loop. The whole grid is predicted with one
+    call to the model for the full history length.
+
+    Example:
+    >>> predict_what_if(registry, [9.1, 8.5], unknown=1, start=6, stop=8, step=1)
+    {'semesters': ['Sem3'], 'values': [6.0, 7.0, 8.0], 'predicted': 'Sem4',
+     'predictions': [7.4, 7.8, 8.2]}
+
+    """
+    known = parse_sgpa_history(history) if history else []
+    if isinstance(unknown, bool) or not isinstance(unknown, int) or unknown < 1:
+        raise ValueError(f"unknown must be a positive number of semesters, got {unknown!r}")
+    values = what_if_values(start, stop, step)
+
+    # Looked up first: it bounds 'unknown' by the semesters that have a
+    # model, before the grid size is computed from it
+    num_semesters = len(known) + unknown
+    model = registry.get(num_semesters + 1)
+    if len(values) ** unknown > MAX_WHAT_IF_POINTS:
+        raise ValueError(
+            f"The grid has {len(values)}^{unknown} points, "
+            f"at most {MAX_WHAT_IF_POINTS} can be predicted at once"
+        )
+
+    grid = np.meshgrid(*([values] * unknown), indexing="ij")
+    X = np.empty((len(values) ** unknown, num_semesters))
+    X[:, : len(known)] = known
+    for position, axis in enumerate(grid):
+        X[:, len(known) + position] = axis.ravel()
+
+    with stage("predict", len(X)):
+        predictions = np.round(model.predict(X), decimals=1)
+
+    return {
+        "semesters": [f"Sem{semester}" for semester in range(len(known) + 1, num_semesters + 1)],
+        "values": values.tolist(),
+        "predicted": f"Sem{num_semesters + 1}",
+        "predictions": predictions.reshape((len(values),) * unknown).tolist(),
+    }
@@ -0,0 +1,91 @@
+"""
+Prediction Cache Module
+
+This module provides a bounded, thread-safe LRU cache for predictions, keyed
+by the model version and the SGPA history that was predicted.
+"""
+import threading
+from collections import OrderedDict
+
+# Default number of predictions kept by 'PredictionCache'
+PREDICTION_CACHE_SIZE = 4096
+
+
+class PredictionCache:
+    """
+    Least-recently-used cache of predictions with hit and miss counters.
+
+    Parameters:
+    - maxsize (int): The largest number of predictions kept.
+
+    Explanation:
+    SGPA values are entered with one decimal, so the same histories are
+    predicted again and again. Keys are (model version, SGPA tuple) as built
+    by 'Prediction.predict_histories', where the model version comes from
+    'ModelRegistry.get_with_version'. When a model file changes its version
+    changes too, so predictions of the old model are never returned again and
+    age out of the cache.
+
+    Example:
+    >>> cache = PredictionCache(maxsize=2)
+    >>> cache.put(((4, 1700000000), (8.7, 8.6, 9.2)), 8.8)
+    >>> cache.get(((4, 1700000000), (8.7, 8.6, 9.2)))
+    8.8
+    >>> cache.stats()
+    {'hits': 1, 'misses': 0, 'size': 1, 'maxsize': 2}
+
+    """
+
+    def __init__(self, maxsize: int = PREDICTION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached prediction for a key, or None on a miss.
+
+        Parameters:
+        - key (tuple): The (model version, SGPA tuple) key.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: float):
+        """
+        Store a prediction, evicting the least recently used one when full.
+
+        Parameters:
+        - key (tuple): The (model version, SGPA tuple) key.
+        - value (float): The prediction.
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove every prediction and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the current size of the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
@@ -0,0 +1,246 @@
+"""
+Semester Cache Module
+
+This module keeps the cleaned marks and SGPA of semester files on disk as
+columnar NPZ files keyed by the SHA-256 of the file content, so the same
+export uploaded or trained on again is not parsed again.
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.CleanedMarks import CleanedMarks
+
+# Default on-disk budget of 'SemesterCache'
+DATA_CACHE_SIZE = 256 * 1024 * 1024
+
+# Bumped whenever cleaning or SGPA calculation changes its output, so files
+# written by older code are never read
+CACHE_FORMAT_VERSION = 2
+
+# Cached pipeline stages: 'clean_marks' and 'get_sgpa' outputs
+STAGES = ("marks", "sgpa")
+
+# Block size used when hashing files on disk
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def digest_source(source) -> tuple:
+    """
+    Hash the content of a semester file.
+
+    Parameters:
+    - source (str, bytes or file object): The path, content or open file of
+    the semester CSV.
+
+    Returns:
+    - tuple: The hex SHA-256 of the content and a source that can still be
+    read.
+
+    Explanation:
+    Paths and seekable file objects (such as uploads) are hashed in blocks
+    of HASH_BLOCK_SIZE, and a file object is moved back to where it was, so
+    it is returned as it is and never held in memory whole. A file object
+    that cannot seek can only be read once, so it is replaced by its bytes.
+    """
+    if hasattr(source, "read"):
+        if not source.seekable():
+            source = source.read()
+        else:
+            position = source.tell()
+            digest = _hash_blocks(source)
+            source.seek(position)
+            return digest, source
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest(), source
+
+    with open(source, "rb") as file:
+        return _hash_blocks(file), source
+
+
+def _hash_blocks(file) -> str:
+    """Return the hex SHA-256 of the rest of an open binary file."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def frame_to_arrays(df: pd.DataFrame) -> dict:
+    """
+    Convert a DataFrame to plain NumPy arrays that can be saved without pickle.
+
+    Parameters:
+    - df (pd.DataFrame): A DataFrame with a default RangeIndex whose columns
+    are numeric, strings or categoricals of numbers or strings.
+
+    Returns:
+    - dict: Arrays keyed by name, as written by np.savez.
+
+    Raises:
+    - TypeError: If a column or the index cannot be stored losslessly.
+
+    Explanation:
+    Each column is stored as one array, "c<i>". Strings are stored as fixed
+    width unicode arrays, and categoricals as their codes "c<i>" with the
+    categories in "c<i>_categories". The column names and the kind of each
+    column are stored in "columns" and "kinds".
+    """
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        raise TypeError("Only DataFrames with a default index can be cached")
+
+    arrays = {"columns": np.array([str(column) for column in df.columns])}
+    if list(arrays["columns"]) != list(df.columns):
+        raise TypeError("Only DataFrames with string column names can be cached")
+
+    kinds = []
+    for position, column in enumerate(df.columns):
+        series = df[column]
+        key = f"c{position}"
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            arrays[key] = series.cat.codes.to_numpy()
+            arrays[f"{key}_categories"] = _plain_array(series.cat.categories)
+            kinds.append("ordered" if series.cat.ordered else "category")
+        else:
+            arrays[key] = _plain_array(series)
+            kinds.append("str" if series.dtype == object else "array")
+    arrays["kinds"] = np.array(kinds)
+    return arrays
+
+
+def arrays_to_frame(arrays) -> pd.DataFrame:
+    """Rebuild the DataFrame stored by 'frame_to_arrays'."""
+    data = {}
+    for position, (column, kind) in enumerate(zip(arrays["columns"], arrays["kinds"])):
+        values = arrays[f"c{position}"]
+        if kind in ("category", "ordered"):
+            categories = arrays[f"c{position}_categories"]
+            if categories.dtype.kind == "U":
+                categories = categories.astype(object)
+            values = pd.Categorical.from_codes(
+                values, categories=categories, ordered=kind == "ordered", validate=False
+            )
+        elif kind == "str":
+            values = values.astype(object)
+        data[str(column)] = values
+    return pd.DataFrame(data)
+
+
+def _plain_array(values) -> np.ndarray:
+    """Return 'values' as a NumPy array that np.load can read without pickle."""
+    array = np.asarray(values)
+    if array.dtype != object:
+        return array
+    if not all(isinstance(value, str) for value in array):
+        raise TypeError("Only numeric and string columns can be cached")
+    return array.astype(str)
+
+
+class SemesterCache:
+    """
+    Size-bounded, content-addressed disk cache of cleaned semester data.
+
+    Parameters:
+    - directory (str): The directory holding the cached files.
+    - max_bytes (int): The largest total size of the cached files.
+
+    Explanation:
+    Entries are named "<sha256>.<stage>.v<CACHE_FORMAT_VERSION>.npz" and
+    written atomically, so several processes can share the directory. Reading
+    an entry refreshes its modification time, and once the directory exceeds
+    'max_bytes' the entries used least recently are deleted first.
+
+    Example:
+    >>> cache = SemesterCache("cache")
+    >>> digest, source = digest_source("data/Sem1.csv")
+    >>> cache.get(digest, "sgpa") is None
+    True
+    >>> cache.put(digest, "sgpa", get_sgpa(clean_marks(source)))
+    >>> cache.get(digest, "sgpa").columns[:3].tolist()
+    ['StudentId', 'StudentName', 'BIT101']
+
+    """
+
+    def __init__(self, directory: str = "cache", max_bytes: int = DATA_CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, digest: str, stage: str) -> pd.DataFrame:
+        """
+        Return the cached output of a stage for a file, or None on a miss.
+
+        Parameters:
+        - digest (str): The SHA-256 of the file, from 'digest_source'.
+        - stage (str): "marks" for 'CleanedMarks', or "sgpa" for the SGPA DataFrame.
+        """
+        path = self._path(digest, stage)
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                if stage == "marks":
+                    df = CleanedMarks.from_arrays(arrays)
+                else:
+                    df = arrays_to_frame(arrays)
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return df
+
+    def put(self, digest: str, stage: str, data):
+        """
+        Store the output of a stage for a file and evict old entries.
+
+        Parameters:
+        - data (CleanedMarks or pd.DataFrame): The output of the stage.
+        DataFrames that cannot be stored losslessly are not cached.
+        """
+        if isinstance(data, CleanedMarks):
+            arrays = data.to_arrays()
+        else:
+            try:
+                arrays = frame_to_arrays(data)
+            except TypeError:
+                return
+
+        path = self._path(digest, stage)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(temporary, path)
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits 'max_bytes'."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npz"):
+                continue
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((info.st_mtime, info.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _path(self, digest: str, stage: str) -> str:
+        """Return the path of an entry."""
+        if stage not in STAGES:
+            raise ValueError(f"stage must be one of {STAGES}, got {stage!r}")
+        return os.path.join(
+            self.directory, f"{digest}.{stage}.v{CACHE_FORMAT_VERSION}.npz"
+        )
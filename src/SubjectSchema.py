@@ -0,0 +1,102 @@
+"""
+Subject Schema Module
+
+This module describes the subject layout of a result sheet (which columns
+hold marks, how INT and EXT columns pair up and which subjects are
+practicals) and caches it per distinct CSV header.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+
+PRACTICAL_PATTERN = r"BIT(\d{1})P(\d{1})"
+
+# Number of distinct headers kept by 'get_schema'
+SCHEMA_CACHE_SIZE = 128
+
+
+@dataclass(frozen=True, eq=False)
+class SubjectSchema:
+    """
+    Subject layout of a result sheet.
+
+    Attributes:
+    - columns (tuple): The full header the schema was parsed from.
+    - subject_columns (tuple): Columns holding marks ("BIT" in the name), in
+    header order.
+    - subject_indices (tuple): Positions of 'subject_columns' in the header.
+    - subject_names (tuple): Subject codes, sorted, one per INT/EXT pair.
+    - ext_columns (tuple): The EXT column of each subject.
+    - int_columns (tuple): The matching INT column of each subject.
+    - ext_indices (tuple): Positions of 'ext_columns' in the header.
+    - int_indices (tuple): Positions of 'int_columns' in the header, None for
+    an INT column missing from the header.
+    - practical_mask (np.ndarray): True for the subjects that are practicals.
+    """
+
+    columns: tuple
+    subject_columns: tuple
+    subject_indices: tuple
+    subject_names: tuple
+    ext_columns: tuple
+    int_columns: tuple
+    ext_indices: tuple
+    int_indices: tuple
+    practical_mask: np.ndarray
+
+
+def get_schema(columns: Iterable[str]) -> SubjectSchema:
+    """
+    Return the subject schema of a header, parsing it only once per header.
+
+    Parameters:
+    - columns (Iterable[str]): The column names of a result sheet.
+
+    Returns:
+    - SubjectSchema: The subject layout of the header.
+
+    Explanation:
+    Every result sheet of a semester has the same header, so the schema is
+    kept in an LRU cache keyed by the header. Repeated calls for the same
+    header cost one hash of the column names and a dictionary lookup.
+
+    Example:
+    >>> schema = get_schema(["StudentId", "StudentName", "INT_BIT101",
+    ...                      "EXT_BIT101", "INT_BIT1P1", "EXT_BIT1P1"])
+    >>> schema.subject_names
+    ('BIT101', 'BIT1P1')
+    >>> schema.practical_mask
+    array([False,  True])
+
+    """
+    return _parse_schema(tuple(columns))
+
+
+@lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def _parse_schema(columns: tuple) -> SubjectSchema:
+    """Parse the subject layout of a header; cached by 'get_schema'."""
+    positions = {col: index for index, col in enumerate(columns)}
+
+    subject_columns = tuple(col for col in columns if "BIT" in col)
+    ext_columns = tuple(sorted(col for col in columns if col.startswith("EXT")))
+    int_columns = tuple(col.replace("EXT", "INT") for col in ext_columns)
+    subject_names = tuple(col.split("_")[1] for col in ext_columns)
+    practical_mask = np.array(
+        [bool(re.match(PRACTICAL_PATTERN, name)) for name in subject_names], dtype=bool
+    )
+    practical_mask.flags.writeable = False
+
+    return SubjectSchema(
+        columns=columns,
+        subject_columns=subject_columns,
+        subject_indices=tuple(positions[col] for col in subject_columns),
+        subject_names=subject_names,
+        ext_columns=ext_columns,
+        int_columns=int_columns,
+        ext_indices=tuple(positions[col] for col in ext_columns),
+        int_indices=tuple(positions.get(col) for col in int_columns),
+        practical_mask=practical_mask,
+    )
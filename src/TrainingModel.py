@@ -1,59 +1,105 @@
 """
 Model Training Script
 
-This script trains a Ridge Regression model to predict Semester 4 
-(Sem4) SGPA based on the SGPA data from previous semesters.
-It also creates a pickle file of the trained model when run exclusively.
+This script trains the Ridge Regression models predicting the SGPA of each
+semester (sem2_model to semN_model) from the SGPA of the previous semesters.
+When run exclusively it saves a pickle file of every model, along with a
+'.npz' export of its coefficients that the web application can load without
+sklearn.
+
+Usage:
+    python -m src.TrainingModel --data-dir data --models-dir models
 """
+import argparse
+import os
+import pickle
+import time
+
 import cloudpickle
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import Ridge
+from sklearn.linear_model import Ridge, RidgeCV
 from sklearn.model_selection import train_test_split, GridSearchCV
 
-from DataCleaning import clean_data
-from FeatureExtraction import get_combined_sgpa, get_sgpa
+from src.FeatureExtraction import get_combined_sgpa
+from src.LinearModel import LinearModel
+from src.Pipeline import Pipeline
+from src.SemesterCache import SemesterCache
+
+# Candidate alphas, as searched by the original 5-fold grid search
+ALPHAS = np.logspace(-6, 6, 1000)
+
+# Ways of choosing alpha in 'train_model'
+SEARCHES = ("loo", "grid")
+
+# Grids of the coarse-to-fine "grid" search: one point per half decade, then
+# FINE_STEPS points within one coarse step of the best coarse alpha
+COARSE_ALPHAS = np.logspace(-6, 6, 25)
+FINE_STEPS = 41
 
 
-def load_data() -> pd.DataFrame:
+def load_semesters(data_dir: str = "data", cache: SemesterCache = None) -> list:
     """
-    Load the necessary data required to train the model and return the
-    DataFrame of the combined data with SGPA.
+    Clean every semester file of a directory and calculate its SGPA.
+
+    Parameters:
+    - data_dir (str): The directory holding the semester files.
+    - cache (SemesterCache): Optional cache of cleaned semester data, so
+    files already seen by an earlier run are not parsed again.
 
     Returns:
-    - pd.DataFrame: A DataFrame containing combined SGPA data from multiple semesters.
+    - list: The 'get_sgpa' DataFrame of each semester, Sem1 first.
     """
-    sem1 = "../data/Sem1 October-21.csv"
-    sem2 = "../data/Sem2 March-22.csv"
-    sem3 = "../data/Sem3 October-22.csv"
-    sem4 = "../data/Sem4 March-23.csv"
+    return Pipeline(cache=cache).load(data_dir)
 
-    sem1_cleaned = clean_data(sem1)
-    sem2_cleaned = clean_data(sem2)
-    sem3_cleaned = clean_data(sem3)
-    sem4_cleaned = clean_data(sem4)
 
-    sem1_sgpa = get_sgpa(sem1_cleaned)
-    sem2_sgpa = get_sgpa(sem2_cleaned)
-    sem3_sgpa = get_sgpa(sem3_cleaned)
-    sem4_sgpa = get_sgpa(sem4_cleaned)
+def load_data(data_dir: str = "data", cache: SemesterCache = None) -> pd.DataFrame:
+    """
+    Load the necessary data required to train the model and return the
+    DataFrame of the combined data with SGPA.
 
-    result = get_combined_sgpa(sem1_sgpa, sem2_sgpa, sem3_sgpa, sem4_sgpa)
-    return result
+    Parameters:
+    - data_dir (str): The directory holding the semester files.
+    - cache (SemesterCache): Optional cache of cleaned semester data.
+
+    Returns:
+    - pd.DataFrame: A DataFrame containing combined SGPA data from multiple semesters.
+    """
+    pipeline = Pipeline(cache=cache)
+    return pipeline.combine(*pipeline.load(data_dir))
 
 
-def sem4_model(result: pd.DataFrame):
+def train_model(
+    result: pd.DataFrame, semester: int, search: str = "loo", n_jobs: int = -1
+) -> tuple:
     """
-    Train the required model using Ridge Regression with hyperparameter tuning.
+    Train the Ridge Regression model predicting one semester from the previous ones.
 
     Parameters:
-    - result (pd.DataFrame): A DataFrame containing combined SGPA data from multiple semesters.
+    - result (pd.DataFrame): Combined SGPA data containing Sem1 to Sem<semester>.
+    - semester (int): The semester predicted by the model.
+    - search (str): How alpha is chosen, "loo" or "grid".
+    - n_jobs (int): Number of cores used by the "grid" search, -1 for all.
 
     Returns:
-    - Ridge: The trained Ridge Regression model.
+    - tuple: The Ridge model trained on the training split with the selected
+    alpha, and a dict with the selected alpha, the RMSE on the test split,
+    the number of training rows and the search time in seconds.
+
+    Explanation:
+    The data is split as before (20% test, random_state=40) and alpha is
+    chosen from ALPHAS, the same range the original 5-fold grid search used.
+    "loo" fits RidgeCV once, which scores every alpha with efficient
+    leave-one-out cross-validation from a single decomposition of the
+    training data. "grid" runs a 5-fold GridSearchCV over COARSE_ALPHAS and
+    then over a finer grid around the best of them, with the folds fitted in
+    parallel on 'n_jobs' cores.
     """
-    features = ["Sem1", "Sem2", "Sem3"]
-    target = "Sem4"
+    if search not in SEARCHES:
+        raise ValueError(f"search must be one of {SEARCHES}, got {search!r}")
+
+    features = [f"Sem{previous}" for previous in range(1, semester)]
+    target = f"Sem{semester}"
 
     X = result[features]
     y = result[target]
@@ -63,49 +109,145 @@ def sem4_model(result: pd.DataFrame):
         X, y, test_size=0.2, random_state=40
     )
 
-    ridge_model = Ridge()
+    start = time.perf_counter()
+    if search == "loo":
+        best_alpha = RidgeCV(alphas=ALPHAS).fit(X_train, y_train).alpha_
+    else:
+        best_alpha = _grid_search(X_train, y_train, COARSE_ALPHAS, n_jobs)
+        step = np.log10(COARSE_ALPHAS[1] / COARSE_ALPHAS[0])
+        fine_alphas = np.logspace(
+            np.log10(best_alpha) - step, np.log10(best_alpha) + step, FINE_STEPS
+        )
+        best_alpha = _grid_search(X_train, y_train, fine_alphas, n_jobs)
+    search_time = time.perf_counter() - start
 
-    param_grid = {"alpha": np.logspace(-6, 6, 1000)}
+    # Train the Ridge Regression model with the best hyperparameters
+    best_ridge_model = Ridge(alpha=best_alpha)
+    best_ridge_model.fit(X_train, y_train)
+
+    rmse = float(np.sqrt(np.mean((best_ridge_model.predict(X_test) - y_test) ** 2)))
+    report = {
+        "alpha": float(best_alpha),
+        "rmse": rmse,
+        "rows": len(X_train),
+        "seconds": search_time,
+    }
+    return best_ridge_model, report
 
+
+def _grid_search(X, y, alphas: np.ndarray, n_jobs: int) -> float:
+    """Return the alpha with the lowest 5-fold cross-validated MSE."""
     grid_search = GridSearchCV(
-        ridge_model, param_grid, cv=5, scoring="neg_mean_squared_error"
+        Ridge(), {"alpha": alphas}, cv=5, scoring="neg_mean_squared_error", n_jobs=n_jobs
     )
-    grid_search.fit(X_train, y_train)
+    grid_search.fit(X, y)
+    return grid_search.best_params_["alpha"]
 
-    # Get the best hyperparameters
-    best_alpha = grid_search.best_params_["alpha"]
 
-    # Train the Ridge Regression model with the best hyperparameters
-    best_ridge_model = Ridge(alpha=best_alpha)
-    best_ridge_model.fit(X_train, y_train)
+def sem4_model(result: pd.DataFrame):
+    """
+    Train the required model using Ridge Regression with hyperparameter tuning.
 
-    return best_ridge_model
+    Parameters:
+    - result (pd.DataFrame): A DataFrame containing combined SGPA data from multiple semesters.
 
+    Returns:
+    - Ridge: The trained Ridge Regression model.
+    """
+    return train_model(result, 4)[0]
 
-if __name__ == "__main__":
-    # Use the model to predict SGPA for new data
-    new_data = {
-        "Sem1": [8.7, 9.1, 8.9, 9.9, 8.4, 8.7, 8.9],
-        "Sem2": [8.6, 8.5, 9.1, 9.4, 6.9, 9.0, 9.3],
-        "Sem3": [9.2, 9.1, 9.5, 9.8, 7.6, 8.9, 8.6],
-    }
 
-    new_df = pd.DataFrame(new_data)
+def train_models(
+    semesters: list, search: str = "loo", n_jobs: int = -1, models_dir: str = None
+) -> dict:
+    """
+    Train the model of every semester after the first.
 
-    data = load_data()
+    Parameters:
+    - semesters (list): The 'get_sgpa' DataFrame of each semester, Sem1 first.
+    - search (str): How alpha is chosen, see 'train_model'.
+    - n_jobs (int): Number of cores used by the "grid" search.
+    - models_dir (str): If given, each model is saved there as
+    'sem<N>_model.pkl' and exported to 'sem<N>_model.npz'.
 
-    ridge = sem4_model(data)
+    Returns:
+    - dict: The (model, report) of 'train_model' keyed by semester.
 
-    # Make predictions for the new data
-    new_predictions = list(np.round(ridge.predict(new_df), decimals=1))
-    new_df["Sem4_Predicted"] = new_predictions
+    Explanation:
+    The model of semester N is trained on the students present in Sem1 to
+    SemN only, so students missing from a later semester still count for
+    the earlier models.
+    """
+    trained = {}
+    for semester in range(2, len(semesters) + 1):
+        result = get_combined_sgpa(*semesters[:semester])
+        model, report = train_model(result, semester, search, n_jobs)
+        trained[semester] = (model, report)
 
-    # Display the predictions
-    print("\nPredictions for new data:")
-    print(new_predictions)
+        if models_dir is not None:
+            path = os.path.join(models_dir, f"sem{semester}_model")
+            with open(path + ".pkl", "wb") as f:
+                cloudpickle.dump(model, f)
+            export_model(model, path + ".npz")
+    return trained
 
-    print(new_df)
 
-    # Save the function to a pickle file
-    with open("../models/sem4_model.pkl", "wb") as f:
-        cloudpickle.dump(ridge, f)
+def export_model(model, path: str):
+    """
+    Export the coefficients of a trained linear model to a '.npz' file.
+
+    Parameters:
+    - model (Ridge): The trained model.
+    - path (str): The path of the '.npz' file, e.g. "../models/sem4_model.npz".
+
+    Explanation:
+    A Ridge prediction is a dot product plus an intercept, so only 'coef_',
+    'intercept_' and the feature names are written. 'LinearModel.load' reads
+    the file back and predicts with NumPy alone.
+    """
+    LinearModel.from_estimator(model).save(path)
+
+
+def export_models(directory: str):
+    """
+    Export every pickled 'sem<N>_model.pkl' in a directory next to the pickle.
+
+    Parameters:
+    - directory (str): The models directory, e.g. "../models".
+    """
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith("_model.pkl"):
+            with open(os.path.join(directory, filename), "rb") as model_file:
+                model = pickle.load(model_file)
+            export_model(model, os.path.join(directory, filename[:-4] + ".npz"))
+
+
+def main(argv: list = None):
+    """Train every semester model from the command line and report each search."""
+    parser = argparse.ArgumentParser(description="Train the semester SGPA models.")
+    parser.add_argument("--data-dir", default="data", help="directory of the SemN CSV files")
+    parser.add_argument("--models-dir", default="models", help="where the models are saved")
+    parser.add_argument("--search", choices=SEARCHES, default="loo", help="how alpha is chosen")
+    parser.add_argument("--jobs", type=int, default=-1, help="cores used by the grid search")
+    parser.add_argument("--cache-dir", default=None, help="cache of cleaned semester data")
+    args = parser.parse_args(argv)
+
+    cache = SemesterCache(args.cache_dir) if args.cache_dir else None
+    start = time.perf_counter()
+    semesters = load_semesters(args.data_dir, cache)
+    print(f"Loaded {len(semesters)} semesters in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    trained = train_models(semesters, args.search, args.jobs, args.models_dir)
+
+    print(f"{'model':<12} {'rows':>6} {'alpha':>12} {'test RMSE':>10} {'search (s)':>11}")
+    for semester, (_, report) in trained.items():
+        print(
+            f"{f'sem{semester}_model':<12} {report['rows']:>6} {report['alpha']:>12.6g} "
+            f"{report['rmse']:>10.3f} {report['seconds']:>11.3f}"
+        )
+    print(f"Trained {len(trained)} models in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Validation Module
+
+This module checks an uploaded result sheet before it is parsed: the header
+and a bounded sample of rows are read and checked against the layout and
+value grammar 'DataCleaning' expects, so a malformed file is rejected in
+milliseconds with an error naming the column and row at fault.
+"""
+import csv
+import io
+import itertools
+import math
+import re
+
+from src.DataCleaning import ID_COLUMNS, MARKERS, MARKS_PATTERN
+
+# Number of data rows checked after the header
+VALIDATION_SAMPLE_ROWS = 100
+
+# Subject columns, e.g. "INT_BIT101" or "EXT_BIT1P1"
+SUBJECT_COLUMN_PATTERN = re.compile(r"^(INT|EXT)_(BIT\w+)$")
+
+MARKS_REGEX = re.compile(MARKS_PATTERN)
+STUDENT_ID_REGEX = re.compile(r"^\s*[+-]?\d+\s*$")
+
+
+class UploadValidationError(ValueError):
+    """
+    Raised when an uploaded result sheet does not have the expected layout.
+
+    Attributes:
+    - column (str): The column at fault, or None.
+    - row (int): The data row at fault, 1 being the first row after the
+    header, or None for an error in the header.
+    """
+
+    def __init__(self, message: str, column: str = None, row: int = None):
+        if row is not None and column is not None:
+            message = f"Row {row}, column {column}: {message}"
+        elif row is not None:
+            message = f"Row {row}: {message}"
+        elif column is not None:
+            message = f"Column {column}: {message}"
+        super().__init__(message)
+        self.column = column
+        self.row = row
+
+    def to_dict(self) -> dict:
+        """Return the error as JSON-serializable values."""
+        return {"error": str(self), "column": self.column, "row": self.row}
+
+
+def validate_upload(source, sample_rows: int = VALIDATION_SAMPLE_ROWS) -> list:
+    """
+    Check the header and the first rows of a result sheet.
+
+    Parameters:
+    - source (str, bytes or file object): The path, content or open binary
+    file of the CSV. An open file is moved back to where it was, so it can
+    still be parsed in full.
+    - sample_rows (int): Number of data rows checked.
+
+    Returns:
+    - list: The header.
+
+    Raises:
+    - UploadValidationError: For the first problem found: a missing or
+    duplicate column, a subject column that is not "INT_<code>" or
+    "EXT_<code>", an INT column without its EXT column or the other way
+    around, a row with the wrong number of fields, a StudentId that is not a
+    number, an empty StudentName or a mark that 'DataCleaning' cannot parse.
+
+    Explanation:
+    Only the header line and 'sample_rows' lines are read, so the cost does
+    not depend on the size of the file. A file that passes can still fail
+    further down, but the common mistakes (a wrong export, a renamed column,
+    a stray marker) are caught before any of the full parsing is done.
+
+    A mark is an integer, a grace or condone entry ("11*5", "79@1"), 'AB' or
+    'CC', or a decimal number such as "45.0". pandas reads a column holding
+    only numbers as floats, which 'DataCleaning' accepts, but a column with
+    a marker or grace entry as text, where only integers parse; so decimal
+    marks are rejected in a column that also holds such entries.
+
+    Example:
+    >>> validate_upload(b"StudentId,StudentName,INT_BIT101,EXT_BIT101\\n1,A,20,4x\\n")
+    UploadValidationError: Row 1, column EXT_BIT101: '4x' is not a mark,
+    'AB' or 'CC'
+
+    """
+    if isinstance(source, bytes):
+        return _validate_lines(io.BytesIO(source), sample_rows)
+    if not hasattr(source, "read"):
+        with open(source, "rb") as file:
+            return _validate_lines(file, sample_rows)
+
+    position = source.tell()
+    try:
+        return _validate_lines(source, sample_rows)
+    finally:
+        source.seek(position)
+
+
+def _validate_lines(file, sample_rows: int) -> list:
+    """Validate the header and sample of an open binary file."""
+    try:
+        lines = [
+            line.decode("utf-8-sig" if number == 0 else "utf-8")
+            for number, line in enumerate(itertools.islice(file, sample_rows + 1))
+        ]
+    except UnicodeDecodeError:
+        raise UploadValidationError("The file is not a UTF-8 CSV file") from None
+
+    rows = csv.reader(lines)
+    header = next(rows, None)
+    if not header:
+        raise UploadValidationError("The file is empty")
+    subject_positions = validate_header(header)
+
+    id_position = header.index("StudentId")
+    name_position = header.index("StudentName")
+    # Row of the first decimal mark and of the first text entry of each column
+    decimal_rows, text_rows = {}, {}
+    for row_number, row in enumerate(rows, start=1):
+        if not row:
+            continue
+        if len(row) != len(header):
+            raise UploadValidationError(
+                f"has {len(row)} fields, the header has {len(header)}", row=row_number
+            )
+        if not STUDENT_ID_REGEX.match(row[id_position]):
+            raise UploadValidationError(
+                f"{row[id_position]!r} is not a number", "StudentId", row_number
+            )
+        if not row[name_position].strip():
+            raise UploadValidationError("is empty", "StudentName", row_number)
+        for position in subject_positions:
+            value = row[position]
+            if value in MARKERS or "*" in value or "@" in value:
+                text_rows.setdefault(position, row_number)
+            if value not in MARKERS and not MARKS_REGEX.match(value):
+                if not _is_decimal(value):
+                    raise UploadValidationError(
+                        f"{value!r} is not a mark, {' or '.join(map(repr, MARKERS))}",
+                        header[position],
+                        row_number,
+                    )
+                decimal_rows.setdefault(position, row_number)
+            if position in decimal_rows and position in text_rows:
+                raise UploadValidationError(
+                    f"a decimal mark (row {decimal_rows[position]}) cannot be mixed with "
+                    f"'AB', 'CC' or grace marks (row {text_rows[position]}) in one column",
+                    header[position],
+                    row_number,
+                )
+    return header
+
+
+def _is_decimal(value: str) -> bool:
+    """Return whether a cell is a finite number pandas reads as a float, e.g. "45.0"."""
+    try:
+        return math.isfinite(float(value))
+    except ValueError:
+        return False
+
+
+def validate_header(header: list) -> list:
+    """
+    Check the columns of a result sheet.
+
+    Returns:
+    - list: The positions of the subject columns in the header.
+
+    Raises:
+    - UploadValidationError: See 'validate_upload'.
+    """
+    seen = set()
+    for column in header:
+        if column in seen:
+            raise UploadValidationError("appears more than once", column)
+        seen.add(column)
+    for column in ID_COLUMNS:
+        if column not in seen:
+            raise UploadValidationError("is missing", column)
+
+    subjects = {}
+    subject_positions = []
+    for position, column in enumerate(header):
+        # Columns holding marks, as selected by 'SubjectSchema.get_schema'
+        if "BIT" not in column:
+            continue
+        match = SUBJECT_COLUMN_PATTERN.match(column)
+        if not match:
+            raise UploadValidationError(
+                "is not a subject column of the form INT_<code> or EXT_<code>", column
+            )
+        subjects.setdefault(match.group(2), set()).add(match.group(1))
+        subject_positions.append(position)
+
+    if not subjects:
+        raise UploadValidationError("No INT_/EXT_ subject columns found")
+    for code, kinds in subjects.items():
+        for kind, other in (("INT", "EXT"), ("EXT", "INT")):
+            if kind in kinds and other not in kinds:
+                raise UploadValidationError(
+                    f"is missing, {kind}_{code} has no matching {other} column",
+                    f"{other}_{code}",
+                )
+    return subject_positions
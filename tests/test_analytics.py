@@ -0,0 +1,61 @@
+# tests/test_analytics.py
+import os
+
+import numpy as np
+import pandas as pd
+from src.Analytics import AnalyticsStore, build_cohort_index, subject_summary, upload_digest
+from src.FeatureExtraction import get_combined_sgpa, get_sgpa
+
+def semester(marks):
+    return get_sgpa(pd.DataFrame({
+        'StudentId': [1, 2, 3],
+        'StudentName': ['Student1', 'Student2', 'Student3'],
+        'INT_BIT101': [20, 10, 30],
+        'EXT_BIT101': [50, 20, marks],
+    }))
+
+def test_subject_summary():
+    summary = subject_summary(semester(90))['BIT101']
+    assert summary['credits'] == {'0': 1, '4': 0, '5': 0, '6': 0, '7': 0, '8': 0, '9': 1, '10': 0,
+                                  'invalid': 1}
+    assert summary['passed'] == 1
+    assert summary['failed'] == 2
+
+def test_build_cohort_index():
+    sem_sgpa = [semester(90), semester(40)]
+    result = get_combined_sgpa(*sem_sgpa)
+    index = build_cohort_index(sem_sgpa, result, np.array([5.0, 3.5, 1.2]))
+    assert index['students'] == 3
+    assert [sem['semester'] for sem in index['semesters']] == [1, 2]
+    assert index['semesters'][1]['subjects']['BIT101']['credits']['9'] == 2
+    assert index['predicted']['semester'] == 3
+    assert index['predicted']['at_risk'] == [{'StudentName': 'Student3', 'predicted': 1.2},
+                                             {'StudentName': 'Student2', 'predicted': 3.5}]
+
+def test_analytics_store(tmp_path):
+    store = AnalyticsStore(str(tmp_path))
+    upload_id = upload_digest(['a' * 64, 'b' * 64])
+    assert store.get(upload_id) is None
+    assert store.get('../secrets') is None
+
+    store.put(upload_id, {'version': 1, 'students': 3}, model_version=(4, 123))
+    assert store.get(upload_id)['students'] == 3
+    assert store.get(upload_id, (4, 123))['model_version'] == [4, 123]
+    assert store.get(upload_id, (4, 456)) is None
+    assert upload_digest(['b' * 64, 'a' * 64]) != upload_id
+
+def test_analytics_store_evicts(tmp_path):
+    store = AnalyticsStore(str(tmp_path), ttl=60)
+    old, recent = upload_digest(['a' * 64]), upload_digest(['b' * 64])
+    store.put(old, {'version': 1})
+    os.utime(tmp_path / f'{old}.json', (0, 0))
+    assert store.get(old) is None
+    store.put(recent, {'version': 1})
+    assert os.listdir(tmp_path) == [f'{recent}.json']
+
+    # Over 'max_bytes' the least recently used index goes first
+    store = AnalyticsStore(str(tmp_path), max_bytes=os.path.getsize(tmp_path / f'{recent}.json'),
+                           ttl=float('inf'))
+    os.utime(tmp_path / f'{recent}.json', (1, 1))
+    store.put(old, {'version': 1})
+    assert os.listdir(tmp_path) == [f'{old}.json']
@@ -0,0 +1,159 @@
+# tests/test_app.py
+import gzip
+import importlib
+import io
+import logging
+import os
+import time
+import pytest
+from src.Prediction import MAX_BATCH_SIZE
+
+SEMESTERS = 3
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('app')
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    with pytest.MonkeyPatch.context() as env:
+        # app reads its configuration at import time, so point it at tmp dirs before loading it
+        env.setenv('EDUINSIGHT_DATA_CACHE_DIR', str(directory / 'cache'))
+        env.setenv('EDUINSIGHT_RESULTS_DIR', str(directory / 'results'))
+        env.setenv('EDUINSIGHT_ANALYTICS_DIR', str(directory / 'analytics'))
+        env.setenv('EDUINSIGHT_LOG_FILE', str(directory / 'logs.log'))
+        env.delenv('EDUINSIGHT_METRICS_DIR', raising=False)
+        module = importlib.import_module('app')
+        module = importlib.reload(module)
+        try:
+            yield module
+        finally:
+            module.log_listener.stop()
+            root.handlers[:] = handlers
+            root.setLevel(level)
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+def uploads(count=SEMESTERS):
+    return {f'sem{i}': (open(f'data/Sem{i}.csv', 'rb'), f'Sem{i}.csv') for i in range(1, count + 1)}
+
+def test_app_uses_configured_directories(app_module):
+    for key in ['RESULTS_DIR', 'ANALYTICS_DIR']:
+        assert os.path.basename(app_module.app.config[key]) == key.split('_')[0].lower()
+        assert os.path.dirname(app_module.app.config[key]) != os.getcwd()
+
+def test_api_predict(client, app_module):
+    response = client.post('/api/predict', json={'histories': [[9.1, 8.5], [7.2]]})
+    assert response.status_code == 200
+    predictions = response.get_json()['predictions']
+    assert len(predictions) == 2
+    assert client.post('/api/predict', json=[[9.1, 8.5], [7.2]]).get_json()['predictions'] == predictions
+
+    for payload in [{'histories': [[9.1, 'x']]}, {'histories': []}, [[8.0] * 9],
+                    [[9.0]] * (MAX_BATCH_SIZE + 1)]:
+        response = client.post('/api/predict', json=payload)
+        assert response.status_code == 400 and 'error' in response.get_json()
+
+    app_module.app.config['MAX_CONTENT_LENGTH'] = 100
+    try:
+        assert client.post('/api/predict', json=[[9.0]] * 100).status_code == 413
+    finally:
+        app_module.app.config['MAX_CONTENT_LENGTH'] = None
+
+def test_api_what_if(client):
+    response = client.post('/api/what-if', json={'history': [9.1], 'unknown': 1, 'min': 6,
+                                                 'max': 8, 'step': 1})
+    assert response.status_code == 200
+    surface = response.get_json()
+    assert surface['values'] == [6.0, 7.0, 8.0] and surface['predicted'] == 'Sem3'
+    assert len(surface['predictions']) == 3
+
+    for payload in [[9.1], {'history': [9.1], 'step': 0}, {'history': [9.1], 'unknown': 10**9},
+                    {'history': ['x']}]:
+        response = client.post('/api/what-if', json=payload)
+        assert response.status_code == 400 and 'error' in response.get_json()
+
+def test_class_prediction_and_analytics(client, app_module):
+    response = client.post('/class-prediction', data=uploads(), content_type='multipart/form-data')
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    assert 'Content-Encoding' not in response.headers
+    body = response.get_data()
+    assert body.splitlines()[0].decode().endswith(f'Sem{SEMESTERS + 1}_Predicted')
+
+    # Streamed compressed when the client accepts gzip
+    compressed = client.post('/class-prediction', data=uploads(), content_type='multipart/form-data',
+                             headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.is_streamed
+    assert gzip.decompress(compressed.get_data()) == body
+
+    index = client.get(response.headers['X-Analytics-Url'])
+    assert index.status_code == 200
+    assert index.get_json()['students'] == len(body.splitlines()) - 1
+    assert [semester['semester'] for semester in index.get_json()['semesters']] == [1, 2, 3]
+    assert client.get('/api/analytics/' + 'f' * 64).status_code == 404
+    assert client.get('/api/analytics/not-an-id').status_code == 404
+
+def test_class_prediction_rejects_invalid_uploads(client, app_module):
+    response = client.post('/class-prediction', data={'sem1': (open('data/Sem1.csv', 'rb'), 'Sem1.txt')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400 and 'CSV' in response.get_json()['error']
+
+    bad = b'StudentId,StudentName,INT_BIT101,EXT_BIT101\n1,A,20,4x\n'
+    files = {**uploads(1), 'sem2': (io.BytesIO(bad), 'Sem2.csv')}
+    response = client.post('/class-prediction', data=files, content_type='multipart/form-data')
+    assert response.status_code == 400
+    error = response.get_json()
+    assert (error['semester'], error['column'], error['row']) == (2, 'EXT_BIT101', 1)
+
+    app_module.app.config['MAX_CONTENT_LENGTH'] = 1000
+    try:
+        response = client.post('/class-prediction', data=uploads(),
+                               content_type='multipart/form-data')
+        assert response.status_code == 413
+    finally:
+        app_module.app.config['MAX_CONTENT_LENGTH'] = None
+
+def test_class_prediction_jobs(client, app_module):
+    expected = client.post('/class-prediction', data=uploads(),
+                           content_type='multipart/form-data').get_data()
+
+    response = client.post('/class-prediction/jobs', data=uploads(),
+                           content_type='multipart/form-data')
+    assert response.status_code == 202
+    job = response.get_json()
+    for _ in range(250):
+        status = client.get(job['status_url']).get_json()
+        if status['status'] in ('done', 'failed'):
+            break
+        time.sleep(0.02)
+    assert status['status'] == 'done'
+    result = client.get(job['download_url'])
+    assert result.status_code == 200 and result.get_data() == expected
+    result.close()
+    assert client.get(job['analytics_url']).status_code == 200
+
+    # A job that has not run yet has no result
+    job_id = app_module.jobs.create()
+    try:
+        assert client.get(f'/class-prediction/jobs/{job_id}/result').status_code == 409
+    finally:
+        app_module.jobs.fail(job_id, 'not run')
+
+    for url in ['/class-prediction/jobs/' + '0' * 32, '/class-prediction/jobs/../x',
+                '/class-prediction/jobs/' + '0' * 32 + '/result']:
+        assert client.get(url).status_code == 404
+    response = client.post('/class-prediction/jobs', data={'sem1': (open('data/Sem1.csv', 'rb'), 'a.txt')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+
+def test_metrics(client):
+    client.post('/api/predict', json=[[9.1, 8.5]])
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    page = response.get_data(as_text=True)
+    assert 'eduinsight_request_duration_seconds_count{endpoint="api_predict",method="POST",' \
+           'status="200"}' in page
+    assert 'eduinsight_prediction_cache_misses_total' in page
+    assert 'endpoint="metrics"' not in page
@@ -2,7 +2,11 @@
 from tempfile import NamedTemporaryFile
 import os
 import pandas as pd
-from src.DataCleaning import parse_grace_condone, clean_data
+import numpy as np
+from src.CleanedMarks import ABSENT, COPY_CASE, GRACE
+from src.DataCleaning import (
+    parse_grace_condone, parse_grace_condone_column, clean_data, clean_data_chunks, clean_marks
+)
 
 def test_parse_grace_condone():
     assert parse_grace_condone("11*5") == 16
@@ -10,6 +14,13 @@ def test_parse_grace_condone():
     assert parse_grace_condone(15) == 15
     assert parse_grace_condone("15") == 15
 
+def test_parse_grace_condone_column():
+    column = pd.Series(["11*5", "20@3", "AB", "CC", "15", " 7 ", float("nan")])
+    parsed = parse_grace_condone_column(column)
+    pd.testing.assert_series_equal(parsed, column.map(parse_grace_condone))
+    assert parsed.tolist()[:5] == [16, 23, "AB", "CC", 15]
+    assert parse_grace_condone_column(pd.Series(["1", "2*1"])).dtype == "int64"
+
 def test_clean_data():
     data = pd.DataFrame({
         'StudentId': [1, 2],
@@ -26,4 +37,58 @@ def test_clean_data():
     cleaned_data = clean_data(temp_csv.name)
     assert cleaned_data.iloc[0, 3] == 0
     assert cleaned_data.iloc[1, 2] == 0
-    os.remove(temp_csv.name)
\ No newline at end of file
+    os.remove(temp_csv.name)
+
+def test_clean_data_marker_counts():
+    data = pd.DataFrame({
+        'StudentId': [1, 2, 3],
+        'StudentName': ['Student1', 'Student2', 'Student3'],
+        'INT_BIT101': ['AB', 'CC', 20],
+        'EXT_BIT101': ['AB', '30*2', 40],
+    })
+    with NamedTemporaryFile(mode='w', delete=False, suffix='.csv', newline='') as temp_csv:
+        data.to_csv(temp_csv, index=False)
+    cleaned_data, counts = clean_data(temp_csv.name, return_marker_counts=True)
+    assert cleaned_data['INT_BIT101'].tolist() == [0, 0, 20]
+    assert cleaned_data['EXT_BIT101'].tolist() == [0, 32, 40]
+    assert counts['Absent'].tolist() == [2, 0, 0]
+    assert counts['CopyCase'].tolist() == [0, 1, 0]
+    os.remove(temp_csv.name)
+
+
+def test_clean_data_chunks():
+    data = pd.DataFrame({
+        'CourseName': ['BSC'] * 5,
+        'StudentId': [1, 2, 3, 4, 5],
+        'StudentName': ['Student1', 'Student2', 'Student3', 'Student4', 'Student5'],
+        'INT_BIT101': [20, 'AB', 30, 25, 10],
+        'EXT_BIT101': ['40*2', 50, 'CC', 45, 35],
+        'Remark': ['PASS'] * 5,
+    })
+    with NamedTemporaryFile(mode='w', delete=False, suffix='.csv', newline='') as temp_csv:
+        data.to_csv(temp_csv, index=False)
+    chunks = list(clean_data_chunks(temp_csv.name, chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert list(chunks[0].columns) == ['StudentId', 'StudentName', 'INT_BIT101', 'EXT_BIT101']
+    pd.testing.assert_frame_equal(pd.concat(chunks), clean_data(temp_csv.name))
+    os.remove(temp_csv.name)
+
+
+def test_clean_marks():
+    data = pd.DataFrame({
+        'StudentId': [1, 2, 3],
+        'StudentName': ['Student1', 'Student2', 'Student3'],
+        'INT_BIT101': ['AB', 'CC', 20],
+        'EXT_BIT101': ['AB', '30*2', '39@1'],
+        'INT_BIT1P1': [10, 12, 14],
+        'EXT_BIT1P1': [11, 13, 15],
+    })
+    with NamedTemporaryFile(mode='w', delete=False, suffix='.csv', newline='') as temp_csv:
+        data.to_csv(temp_csv, index=False)
+    cleaned = clean_marks(temp_csv.name)
+    assert cleaned.marks.dtype == np.int16 and cleaned.marks.flags['C_CONTIGUOUS']
+    np.testing.assert_array_equal(cleaned.flags[:, :2], [[ABSENT, ABSENT], [COPY_CASE, GRACE], [0, GRACE]])
+    pd.testing.assert_frame_equal(cleaned.to_frame(), clean_data(temp_csv.name), check_dtype=False)
+    _, counts = clean_data(temp_csv.name, return_marker_counts=True)
+    pd.testing.assert_frame_equal(cleaned.marker_counts(), counts, check_dtype=False)
+    os.remove(temp_csv.name)
@@ -0,0 +1,52 @@
+# tests/test_feature_extraction.py
+import numpy as np
+import pandas as pd
+from src.DataCleaning import clean_data, clean_marks
+from src.FeatureExtraction import (
+    CREDIT_LABELS, calculate_credit_codes, calculate_credits, get_combined_sgpa, get_sgpa
+)
+
+def test_calculate_credit_codes():
+    marks = np.arange(-5, 210)
+    expected = calculate_credits(marks)
+    codes = calculate_credit_codes(marks)
+    np.testing.assert_array_equal(codes, expected.codes)
+
+def test_get_sgpa():
+    data = pd.DataFrame({
+        'StudentId': [1, 2],
+        'StudentName': ['Student1', 'Student2'],
+        'INT_BIT101': [30, 10],
+        'EXT_BIT101': [45, 20],
+        'INT_BIT1P1': [20, 10],
+        'EXT_BIT1P1': [21, 5],
+    })
+    sgpa = get_sgpa(data)
+    assert list(sgpa.columns) == ['StudentId', 'StudentName', 'BIT101', 'BIT1P1', 'GPA']
+    # 75 -> 9 credits, practical 41/50 -> 82% -> 10 credits
+    assert sgpa['BIT101'].tolist() == [9, 0]
+    assert sgpa['BIT1P1'].tolist() == [10, 0]
+    assert sgpa['GPA'].tolist() == [1.9, 0.0]
+    assert list(sgpa['BIT101'].cat.categories) == CREDIT_LABELS
+
+def test_get_sgpa_of_cleaned_marks():
+    for semester in range(1, 6):
+        path = f'data/Sem{semester}.csv'
+        pd.testing.assert_frame_equal(get_sgpa(clean_marks(path)), get_sgpa(clean_data(path)))
+
+def test_get_combined_sgpa():
+    sem1 = pd.DataFrame({'StudentId': [1, 2, 3], 'StudentName': ['A', 'B', 'B'],
+                         'GPA': [8.0, 3.5, 7.0]})
+    sem2 = pd.DataFrame({'StudentId': [3, 2, 4], 'StudentName': ['B', 'B', 'D'],
+                         'GPA': [6.0, 9.0, 5.0]})
+    by_name = get_combined_sgpa(sem1, sem2)
+    assert by_name.to_dict('list') == {'StudentName': ['B'], 'Sem1': [0.0], 'Sem2': [6.0]}
+
+    by_id = get_combined_sgpa(sem1, sem2, on='StudentId')
+    assert by_id.to_dict('list') == {'StudentName': ['B', 'B'], 'Sem1': [0.0, 7.0],
+                                     'Sem2': [9.0, 6.0]}
+
+    outer = get_combined_sgpa(sem1, sem2, on='StudentId', how='outer')
+    assert outer['StudentName'].tolist() == ['A', 'B', 'B', 'D']
+    assert outer['Sem1'].tolist() == [8.0, 0.0, 7.0, 7.0]
+    assert outer['Sem2'].tolist() == [6.0, 9.0, 6.0, 5.0]
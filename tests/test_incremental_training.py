@@ -0,0 +1,89 @@
+# tests/test_incremental_training.py
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import Ridge
+from src.FeatureExtraction import get_combined_sgpa
+from src.IncrementalTraining import IncrementalTrainer, main
+from src.Pipeline import process_semester
+
+def test_incremental_training_matches_full_refit(tmp_path):
+    semesters = [process_semester(f'data/Sem{i}.csv') for i in range(1, 5)]
+    cohorts = {'a': [sem.iloc[::2].reset_index(drop=True) for sem in semesters],
+               'b': [sem.iloc[1::2].reset_index(drop=True) for sem in semesters]}
+    state = str(tmp_path / 'state.json')
+
+    for cohort, cohort_semesters in cohorts.items():
+        for semester, sgpa in enumerate(cohort_semesters, 1):
+            trainer = IncrementalTrainer(state)
+            assert trainer.ingest(cohort, semester, sgpa) == (semester if semester > 1 else None)
+            trainer.save()
+
+    trainer = IncrementalTrainer(state)
+    with pytest.raises(ValueError, match='expected Sem5'):
+        trainer.ingest('a', 3, semesters[2])
+    # Only the latest combined history of a cohort is kept
+    assert len(trainer.cohorts['a']['GPA']) == 4
+    assert len(trainer.cohorts['a']['StudentName']) == len(get_combined_sgpa(*cohorts['a']))
+    with pytest.raises(ValueError, match='No alpha'):
+        trainer.model(2)
+
+    for semester in [2, 3, 4]:
+        combined = pd.concat([get_combined_sgpa(*sems[:semester]) for sems in cohorts.values()])
+        features = [f'Sem{i}' for i in range(1, semester)]
+        ridge = Ridge(alpha=50).fit(combined[features], combined[f'Sem{semester}'])
+        model = trainer.model(semester, alpha=50)
+        np.testing.assert_allclose(model.coef, ridge.coef_, atol=1e-10)
+        assert model.intercept == pytest.approx(ridge.intercept_, abs=1e-10)
+        assert trainer.statistics[semester].n == len(combined)
+
+
+def test_main_bootstraps_and_updates_atomically(tmp_path):
+    models = tmp_path / 'models'
+    models.mkdir()
+    shutil.copy('models/sem3_model.pkl', models)
+    new = tmp_path / 'new'
+    new.mkdir()
+    for semester in (1, 2, 3):
+        with open(f'data/Sem{semester}.csv') as source:
+            lines = source.readlines()
+        (new / f'Sem{semester}.csv').write_text(''.join(lines[:1] + lines[1::2]))
+    state = str(tmp_path / 'state.json')
+    common = ['--state', state, '--models-dir', str(models)]
+    files = [str(new / f'Sem{semester}.csv') for semester in (1, 2, 3)]
+
+    # Updates are refused until the state holds the training data
+    with pytest.raises(SystemExit):
+        main(['--cohort', '2023', *common, *files])
+    main(['--init', 'data', '--cohort', '2021', *common])
+    trainer = IncrementalTrainer(state)
+    assert trainer.alphas == {3: pytest.approx(84.70868266557402)}
+    assert trainer.statistics[3].n == len(get_combined_sgpa(
+        *(process_semester(f'data/Sem{i}.csv') for i in (1, 2, 3))))
+    with pytest.raises(SystemExit):
+        main(['--init', 'data', '--cohort', '2021', *common])
+
+    # sem2_model has no alpha yet: nothing is written
+    with open(state, 'rb') as state_file:
+        before = state_file.read()
+    with pytest.raises(SystemExit):
+        main(['--cohort', '2023', *common, *files])
+    with open(state, 'rb') as state_file:
+        assert state_file.read() == before
+    assert sorted(os.listdir(models)) == ['sem3_model.pkl']
+
+    main(['--cohort', '2023', '--alpha', '70', *common, *files[:2]])
+    main(['--cohort', '2023', *common, files[2]])
+    trainer = IncrementalTrainer(state)
+    # --alpha is remembered for sem2_model, sem3_model keeps the trained alpha
+    assert trainer.alphas == {2: 70, 3: pytest.approx(84.70868266557402)}
+    assert sorted(os.listdir(models)) == ['sem2_model.npz', 'sem3_model.npz', 'sem3_model.pkl']
+    with pytest.raises(SystemExit):
+        main(['--cohort', '2024', *common, files[0]])
+
+    main(['--cohort', '2023', '--close', *common])
+    assert IncrementalTrainer(state).cohorts['2023'] == {
+        'semesters': 3, 'digests': trainer.cohorts['2023']['digests'], 'closed': True}
@@ -0,0 +1,63 @@
+# tests/test_instrumentation.py
+import os
+
+import pandas as pd
+from src import Instrumentation
+from src.Instrumentation import (configure, flush_metrics, mark_process_dead, observe_request,
+                                 render_metrics, reset_metrics, stage, start_request, timed_chunks)
+
+def test_stage_records():
+    records = start_request()
+    with stage('join') as timed:
+        timed.rows = 3
+    chunks = [pd.DataFrame({'a': range(2)}), pd.DataFrame({'a': range(5)})]
+    assert list(timed_chunks('parse', chunks)) == chunks
+    assert [(r['stage'], r['rows']) for r in records] == [('join', 3), ('parse', 7)]
+
+    configure(trace_memory=True)
+    try:
+        with stage('allocate'):
+            data = bytearray(4 * 2**20)
+    finally:
+        configure()
+    assert records[-1]['peak_memory'] > len(data) // 2
+
+    page = render_metrics({'cache_size': ('gauge', 'Entries.', 4)})
+    assert 'eduinsight_stage_rows_total{stage="parse"}' in page
+    assert 'eduinsight_stage_duration_seconds_bucket{stage="join",le="+Inf"}' in page
+    assert page.endswith('# TYPE cache_size gauge\ncache_size 4\n')
+
+def test_disabled_stages_are_not_recorded():
+    records = start_request()
+    configure(enabled=False)
+    try:
+        chunks = iter([pd.DataFrame({'a': [1]})])
+        assert timed_chunks('parse', chunks) is chunks
+        with stage('join', 1):
+            pass
+    finally:
+        configure()
+    assert records == [] and Instrumentation.is_enabled()
+
+def test_metrics_are_summed_across_processes(tmp_path):
+    extra = {'cache_hits_total': ('counter', 'Hits.', 2), 'cache_size': ('gauge', 'Entries.', 4)}
+    configure(metrics_dir=str(tmp_path))
+    try:
+        reset_metrics()
+        observe_request('api_predict', 'POST', 200, 0.01)
+        flush_metrics(extra)
+        # Pretend the file was written by another worker, then exited
+        os.rename(tmp_path / f'{os.getpid()}.json', tmp_path / '1.json')
+        reset_metrics()
+        observe_request('api_predict', 'POST', 200, 0.01)
+        page = render_metrics(extra)
+        assert 'eduinsight_request_duration_seconds_count{endpoint="api_predict",method="POST",' \
+               'status="200"} 2' in page
+        assert 'cache_hits_total 4' in page and 'cache_size 8' in page
+
+        mark_process_dead(str(tmp_path), 1)
+        page = render_metrics(extra)
+        assert 'cache_hits_total 4' in page and 'cache_size 4' in page
+    finally:
+        configure()
+        reset_metrics()
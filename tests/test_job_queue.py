@@ -0,0 +1,76 @@
+# tests/test_job_queue.py
+import os
+import threading
+import time
+import pytest
+from src.JobQueue import JobNotFoundError, JobQueue, QueueFullError
+
+def wait(jobs, job_id):
+    for _ in range(100):
+        status = jobs.status(job_id)
+        if status['status'] in ('done', 'failed'):
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} did not finish')
+
+def write_result(result_path, text):
+    with open(result_path, 'w') as result_file:
+        result_file.write(text)
+
+def test_job_queue(tmp_path):
+    jobs = JobQueue(str(tmp_path), max_workers=1, max_queued=1)
+    job_id = jobs.create()
+    assert jobs.status(job_id)['status'] == 'queued'
+    assert jobs.result_path(job_id) is None
+    with pytest.raises(QueueFullError):
+        jobs.create()
+
+    jobs.start(job_id, write_result, 'a,b\n')
+    assert wait(jobs, job_id)['status'] == 'done'
+    with open(jobs.result_path(job_id)) as result_file:
+        assert result_file.read() == 'a,b\n'
+
+    failed = jobs.create()
+    jobs.start(failed, write_result)
+    assert 'argument' in wait(jobs, failed)['error']
+    assert jobs.result_path(failed) is None
+
+    for job in ['0' * 32, '../etc']:
+        with pytest.raises(JobNotFoundError):
+            jobs.status(job)
+
+def test_job_queue_evicts_expired(tmp_path):
+    jobs = JobQueue(str(tmp_path), ttl=60)
+    job_id = jobs.create()
+    jobs.fail(job_id, 'no input')
+    old = time.time() - 120
+    os.utime(jobs.path(job_id, 'status.json'), (old, old))
+    jobs.evict_expired()
+    with pytest.raises(JobNotFoundError):
+        jobs.status(job_id)
+
+def test_job_queue_keeps_running_jobs(tmp_path):
+    jobs = JobQueue(str(tmp_path), max_workers=1, ttl=60)
+    release = threading.Event()
+
+    def slow_result(result_path):
+        release.wait(5)
+        write_result(result_path, 'a,b\n')
+
+    job_id = jobs.create()
+    jobs.start(job_id, slow_result)
+    while jobs.status(job_id)['status'] != 'running':
+        time.sleep(0.01)
+    old = time.time() - 120
+    os.utime(jobs.path(job_id, 'status.json'), (old, old))
+    jobs.evict_expired()
+    assert jobs.status(job_id)['status'] == 'running'
+
+    release.set()
+    assert wait(jobs, job_id)['status'] == 'done'
+    with open(jobs.result_path(job_id)) as result_file:
+        assert result_file.read() == 'a,b\n'
+    os.utime(jobs.path(job_id, 'status.json'), (old, old))
+    jobs.evict_expired()
+    with pytest.raises(JobNotFoundError):
+        jobs.status(job_id)
@@ -0,0 +1,58 @@
+# tests/test_log_config.py
+import json
+import logging
+from logging.handlers import WatchedFileHandler
+from src.LogConfig import PAGE_VIEW, JsonFormatter, PageViewSampler, setup_logging
+
+def make_record(message, *args, **extra):
+    record = logging.makeLogRecord({'name': 'app', 'levelname': 'INFO', 'msg': message, 'args': args})
+    record.__dict__.update(extra)
+    return record
+
+def test_json_formatter():
+    line = JsonFormatter().format(make_record('Predicted %d histories', 3, histories=3))
+    entry = json.loads(line)
+    assert entry['message'] == 'Predicted 3 histories'
+    assert entry['histories'] == 3 and entry['level'] == 'INFO' and entry['logger'] == 'app'
+
+def test_page_view_sampler():
+    assert PageViewSampler(0).filter(make_record('Predicted'))
+    assert not PageViewSampler(0).filter(make_record('Home page', **PAGE_VIEW))
+    kept = make_record('Home page', **PAGE_VIEW)
+    assert PageViewSampler(1).filter(kept) and kept.sample_rate == 1
+
+def test_setup_logging(tmp_path):
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    path = tmp_path / 'app.log'
+    listener = setup_logging(str(path), page_view_sample_rate=0)
+    try:
+        logging.getLogger('app').info('Home page', extra=PAGE_VIEW)
+        logging.getLogger('app').info('Received %d files', 2)
+    finally:
+        listener.stop()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line['message'] for line in lines] == ['Received 2 files']
+    # Stopped again at exit, which does nothing
+    assert not listener.running
+    listener.stop()
+
+def test_setup_logging_for_external_rotation(tmp_path):
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    path = tmp_path / 'app.log'
+    listener = setup_logging(str(path), max_bytes=0)
+    try:
+        assert isinstance(listener.handlers[0], WatchedFileHandler)
+        logging.getLogger('app').info('Before rotation')
+        listener.stop()
+        path.rename(tmp_path / 'app.log.1')
+        listener.start()
+        logging.getLogger('app').info('After rotation')
+    finally:
+        listener.stop()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+    assert json.loads(path.read_text())['message'] == 'After rotation'
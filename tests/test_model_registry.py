@@ -0,0 +1,51 @@
+# tests/test_model_registry.py
+import os
+import pickle
+from tempfile import TemporaryDirectory
+import numpy as np
+import pandas as pd
+import pytest
+from src.LinearModel import LinearModel
+from src.ModelRegistry import ModelNotFoundError, ModelRegistry
+
+def write_model(directory, semester, intercept, mtime):
+    path = os.path.join(directory, f'sem{semester}_model.npz')
+    LinearModel(np.ones(semester - 1), intercept).save(path)
+    os.utime(path, ns=(mtime, mtime))
+
+def test_model_registry_loads_and_reloads():
+    with TemporaryDirectory() as directory:
+        write_model(directory, 2, 0.5, 1_000_000_000)
+        write_model(directory, 6, 1.5, 1_000_000_000)
+        registry = ModelRegistry(directory)
+        assert registry.semesters() == [2, 6]
+        assert registry.for_history(1).intercept == 0.5
+        assert registry.get(2) is registry.get(2)
+        assert registry.for_history(5).intercept == 1.5
+
+        write_model(directory, 2, 2.5, 2_000_000_000)
+        assert registry.for_history(1).intercept == 2.5
+
+        with pytest.raises(ModelNotFoundError):
+            registry.for_history(3)
+        write_model(directory, 4, 3.5, 1_000_000_000)
+        assert registry.for_history(3).intercept == 3.5
+
+def test_model_registry_preload():
+    with TemporaryDirectory() as directory:
+        write_model(directory, 2, 0.5, 1_000_000_000)
+        write_model(directory, 3, 1.5, 1_000_000_000)
+        registry = ModelRegistry(directory)
+        assert registry.preload() == [2, 3]
+        assert sorted(registry._models) == [2, 3]
+
+def test_linear_model_matches_ridge():
+    with open('models/sem4_model.pkl', 'rb') as model_file:
+        ridge = pickle.load(model_file)
+    X = pd.DataFrame({'Sem3': [9.2, 7.6], 'Sem1': [8.7, 8.4], 'Sem2': [8.6, 6.9]})
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sem4_model.npz')
+        LinearModel.from_estimator(ridge).save(path)
+        model = LinearModel.load(path)
+    assert model.feature_names == ['Sem1', 'Sem2', 'Sem3']
+    np.testing.assert_allclose(model.predict(X), ridge.predict(X[['Sem1', 'Sem2', 'Sem3']]))
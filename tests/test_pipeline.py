@@ -0,0 +1,96 @@
+# tests/test_pipeline.py
+import io
+import os
+import sys
+import pandas as pd
+import pytest
+from benchmarks import bench_parallel_semesters
+from src.DataCleaning import clean_data
+from src.FeatureExtraction import get_combined_sgpa, get_sgpa
+from src.Instrumentation import start_request
+from src.ModelRegistry import ModelRegistry
+from src.Pipeline import (Pipeline, SemesterProcessingError, discover_cohorts, discover_semester_files,
+                          main, process_semester, process_semesters)
+from src.SemesterCache import SemesterCache, digest_source
+
+FILES = [('Sem1.csv', 'data/Sem1.csv'), ('Sem2.csv', 'data/Sem2.csv'), ('Sem3.csv', 'data/Sem3.csv')]
+
+@pytest.mark.parametrize('executor', ['serial', 'thread', 'process'])
+def test_process_semesters(executor):
+    records = start_request()
+    results = process_semesters(FILES, executor=executor)
+    for (_, path), result in zip(FILES, results):
+        pd.testing.assert_frame_equal(result, get_sgpa(clean_data(path)))
+    # Stages run in a worker thread or process are recorded with the caller's request
+    assert sorted(entry['stage'] for entry in records) == ['clean_data'] * 3 + ['get_sgpa'] * 3
+
+def test_bench_parallel_semesters_runs_every_executor(monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['bench_parallel_semesters', '--semesters', '2',
+                                      '--students', '50', '--workers', '2', '--repeat', '1'])
+    bench_parallel_semesters.main()
+    header, row = capsys.readouterr().out.splitlines()[-2:]
+    assert 'process (s)' in header
+    assert len(row.split()) == 4
+
+def test_process_semesters_reports_failing_file():
+    bad = b'StudentId,StudentName,INT_BIT101,EXT_BIT101\n1,Student1,20,4x\n'
+    with pytest.raises(SemesterProcessingError) as error:
+        process_semesters(FILES[:1] + [('bad.csv', bad)] + FILES[2:], executor='thread')
+    assert error.value.semester == 2
+    assert error.value.filename == 'bad.csv'
+    assert str(error.value).startswith('Sem2 (bad.csv): ')
+
+def test_process_semester_with_cache(tmp_path):
+    cache = SemesterCache(str(tmp_path))
+    with open('data/Sem2.csv', 'rb') as file:
+        content = file.read()
+    expected = process_semester(content)
+    pd.testing.assert_frame_equal(process_semester(io.BytesIO(content), cache), expected)
+    assert len(os.listdir(tmp_path)) == 2
+
+    digest, _ = digest_source('data/Sem2.csv')
+    pd.testing.assert_frame_equal(cache.get(digest, 'marks').to_frame(), clean_data('data/Sem2.csv'),
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(process_semester('data/Sem2.csv', cache), expected)
+
+    # Uploads are hashed without being read into memory, and a known digest is not recomputed
+    file = io.BytesIO(content)
+    assert digest_source(file) == (digest, file) and file.tell() == 0
+    assert process_semester(file, cache, digest='0' * 64).equals(expected)
+    assert len(os.listdir(tmp_path)) == 4
+
+    SemesterCache(str(tmp_path), max_bytes=1).evict()
+    assert os.listdir(tmp_path) == []
+
+def test_discover_semester_files(tmp_path):
+    for name in ['Sem2 March-22.csv', 'Sem1 October-21.csv', 'Sem10.txt', 'notes.csv']:
+        (tmp_path / name).write_text('')
+    assert [path.split('/')[-1] for path in discover_semester_files(str(tmp_path))] == \
+        ['Sem1 October-21.csv', 'Sem2 March-22.csv']
+    (tmp_path / 'Sem4.csv').write_text('')
+    with pytest.raises(FileNotFoundError, match='Sem3'):
+        discover_semester_files(str(tmp_path))
+
+def test_pipeline_run():
+    registry = ModelRegistry('models')
+    prediction = Pipeline(registry, executor='serial').run(FILES)
+    sem_sgpa = [get_sgpa(clean_data(path)) for _, path in FILES]
+    expected = get_combined_sgpa(*sem_sgpa)
+    pd.testing.assert_frame_equal(prediction.result.iloc[:, :4], expected)
+    predicted = registry.get(4).predict(expected.iloc[:, 1:]).round(1)
+    assert list(prediction.result['Sem4_Predicted']) == [0 if x < 4 else x for x in predicted]
+    assert prediction.model_version == registry.version(4)
+
+def test_pipeline_cli(tmp_path, capsys):
+    for cohort, semesters in [('2021', 3), ('2022', 2)]:
+        os.makedirs(tmp_path / 'cohorts' / cohort)
+        for semester in range(1, semesters + 1):
+            with open(f'data/Sem{semester}.csv', 'rb') as source:
+                (tmp_path / 'cohorts' / cohort / f'Sem{semester}.csv').write_bytes(source.read())
+    assert discover_cohorts(str(tmp_path / 'cohorts')) == [str(tmp_path / 'cohorts' / '2021'),
+                                                          str(tmp_path / 'cohorts' / '2022')]
+
+    main([str(tmp_path / 'cohorts'), '--output-dir', str(tmp_path / 'out')])
+    assert sorted(os.listdir(tmp_path / 'out')) == ['2021.csv', '2022.csv']
+    assert pd.read_csv(tmp_path / 'out' / '2022.csv').columns[-1] == 'Sem3_Predicted'
+    assert 'predicted Sem4_Predicted' in capsys.readouterr().out
@@ -0,0 +1,60 @@
+# tests/test_prediction.py
+import numpy as np
+import pytest
+from src.ModelRegistry import ModelNotFoundError, ModelRegistry
+from src.Prediction import parse_sgpa_history, predict_histories, predict_what_if
+from src.PredictionCache import PredictionCache
+
+def test_parse_sgpa_history():
+    assert parse_sgpa_history(['9.1', 8.5, 7]) == [9.1, 8.5, 7.0]
+    for values, message in [([], 'non-empty'), (['9.1', 'abc'], 'Sem2'),
+                            ([10.5], 'Sem1'), ([float('nan')], 'Sem1'), ([None], 'Sem1')]:
+        with pytest.raises(ValueError, match=message):
+            parse_sgpa_history(values)
+
+def test_predict_histories():
+    registry = ModelRegistry('models')
+    histories = [[9.1, 8.5], [7.2], ['8.0', 8.1], [8.7, 8.6, 9.2]]
+    predictions = predict_histories(registry, histories)
+    expected = [registry.for_history(len(history)).predict(np.array([history], dtype=float))[0]
+                for history in histories]
+    np.testing.assert_array_equal(predictions, np.round(expected, 1))
+
+    with pytest.raises(ValueError, match='History 1: Sem1'):
+        predict_histories(registry, [[9.1], ['x']])
+    with pytest.raises(ModelNotFoundError):
+        predict_histories(registry, [[8.0] * 9])
+
+def test_predict_histories_with_cache():
+    registry = ModelRegistry('models')
+    cache = PredictionCache(maxsize=2)
+    histories = [[9.1, 8.5], [7.2], [9.1, 8.5]]
+    first = predict_histories(registry, histories, cache)
+    np.testing.assert_array_equal(first, predict_histories(registry, histories))
+    assert cache.stats() == {'hits': 0, 'misses': 2, 'size': 2, 'maxsize': 2}
+
+    np.testing.assert_array_equal(predict_histories(registry, histories, cache), first)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    predict_histories(registry, [[5.0, 5.0, 5.0]], cache)
+    assert cache.stats()['size'] == 2
+
+def test_predict_what_if():
+    registry = ModelRegistry('models')
+    surface = predict_what_if(registry, [9.1], unknown=2, start=6, stop=8, step=0.5)
+    assert surface['semesters'] == ['Sem2', 'Sem3']
+    assert surface['values'] == [6.0, 6.5, 7.0, 7.5, 8.0]
+    assert surface['predicted'] == 'Sem4'
+    expected = predict_histories(registry, [[9.1, 6.5, 8.0]])[0]
+    assert surface['predictions'][1][4] == expected
+
+    assert predict_what_if(registry, [], unknown=2, step=5)['values'] == [0.0, 5.0, 10.0]
+    for history, options, message in [([9.1], {'step': 0}, 'step'), ([9.1], {'stop': 11}, 'max'),
+                                      ([9.1], {'unknown': 0}, 'unknown'),
+                                      ([9.1], {'unknown': 3, 'step': 0.1}, 'at most'),
+                                      (['x'], {}, 'Sem1')]:
+        with pytest.raises(ValueError, match=message):
+            predict_what_if(registry, history, **options)
+    # The model lookup rejects a huge 'unknown' before the grid size is computed
+    with pytest.raises(ModelNotFoundError):
+        predict_what_if(registry, [9.1], unknown=10**9)
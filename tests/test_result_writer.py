@@ -0,0 +1,14 @@
+# tests/test_result_writer.py
+import gzip
+import numpy as np
+import pandas as pd
+from src.ResultWriter import iter_csv, iter_gzip
+
+def test_iter_csv():
+    result = pd.DataFrame({'StudentName': [f'S{i}' for i in range(7)],
+                           'Sem1': np.linspace(4, 9, 7), 'Sem2_Predicted': [0, 5.5, 6, 7, 8, 9, 10]})
+    chunks = list(iter_csv(result, chunk_rows=3))
+    assert len(chunks) == 4
+    assert b''.join(chunks) == result.to_csv(index=False).encode()
+    assert gzip.decompress(b''.join(iter_gzip(chunks))) == b''.join(chunks)
+    assert b''.join(iter_csv(result.iloc[:0])) == b'StudentName,Sem1,Sem2_Predicted\n'
@@ -0,0 +1,20 @@
+# tests/test_subject_schema.py
+from src.SubjectSchema import get_schema
+
+HEADER = ['CourseName', 'StudentId', 'StudentName', 'INT_BIT102', 'EXT_BIT102',
+          'INT_BIT1P1', 'EXT_BIT1P1', 'INT_BIT101', 'EXT_BIT101', 'Remark']
+
+def test_get_schema():
+    schema = get_schema(HEADER)
+    assert schema.subject_columns == tuple(HEADER[3:9])
+    assert schema.subject_indices == (3, 4, 5, 6, 7, 8)
+    assert schema.subject_names == ('BIT101', 'BIT102', 'BIT1P1')
+    assert schema.ext_columns == ('EXT_BIT101', 'EXT_BIT102', 'EXT_BIT1P1')
+    assert schema.int_columns == ('INT_BIT101', 'INT_BIT102', 'INT_BIT1P1')
+    assert schema.ext_indices == (8, 4, 6)
+    assert schema.int_indices == (7, 3, 5)
+    assert schema.practical_mask.tolist() == [False, False, True]
+
+def test_get_schema_is_cached_per_header():
+    assert get_schema(HEADER) is get_schema(list(HEADER))
+    assert get_schema(HEADER) is not get_schema(HEADER[:-1])
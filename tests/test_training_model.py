@@ -0,0 +1,14 @@
+# tests/test_training_model.py
+import numpy as np
+import pandas as pd
+from src.LinearModel import LinearModel
+from src.TrainingModel import load_semesters, train_models
+
+def test_train_models(tmp_path):
+    trained = train_models(load_semesters('data')[:3], models_dir=str(tmp_path))
+    assert sorted(trained) == [2, 3]
+    model, report = trained[3]
+    assert model.alpha == report['alpha'] and report['rows'] > 0
+    exported = LinearModel.load(str(tmp_path / 'sem3_model.npz'))
+    X = pd.DataFrame({'Sem1': [8.7, 6.1], 'Sem2': [8.6, 7.0]})
+    np.testing.assert_allclose(exported.predict(X), model.predict(X))
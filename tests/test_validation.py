@@ -0,0 +1,41 @@
+# tests/test_validation.py
+import io
+import pytest
+from src.Validation import UploadValidationError, validate_upload
+
+HEADER = b'StudentId,StudentName,INT_BIT101,EXT_BIT101,INT_BIT1P1,EXT_BIT1P1\n'
+
+def test_validate_upload_accepts_result_sheets():
+    for semester in range(1, 6):
+        assert 'StudentName' in validate_upload(f'data/Sem{semester}.csv')
+    assert validate_upload(HEADER + b'1,A,20,11*5,AB,40@2\n2,B,CC,45,20,30\n')[2] == 'INT_BIT101'
+    # Decimal marks parse in a column without markers or grace marks
+    assert validate_upload(HEADER + b'1,A,20,45.0,20,30\n2,B,20.0,45,AB,30\n')
+
+def test_validate_upload_rewinds_file():
+    file = io.BytesIO(HEADER + b'1,A,20,45,20,30\n')
+    validate_upload(file)
+    assert file.tell() == 0
+
+@pytest.mark.parametrize('content, column, row', [
+    (b'StudentId,INT_BIT101,EXT_BIT101\n', 'StudentName', None),
+    (b'StudentId,StudentName,INT_BIT101,EXT_BIT102\n', 'EXT_BIT101', None),
+    (b'StudentId,StudentName,INT_BIT101,EXT_BIT101,BIT101\n', 'BIT101', None),
+    (HEADER + b'1,A,20,45,20,30\n2,B,20,4x,20,30\n', 'EXT_BIT101', 2),
+    (HEADER + b'1,A,20,45,20,ABS\n', 'EXT_BIT1P1', 1),
+    (HEADER + b'1,A,20,45,20,\n', 'EXT_BIT1P1', 1),
+    (HEADER + b'S1,A,20,45,20,30\n', 'StudentId', 1),
+    (HEADER + b'1,A,20,45\n', None, 1),
+    (HEADER + b'1,A,20,45.0,20,30\n2,B,20,AB,20,30\n', 'EXT_BIT101', 2),
+    (HEADER + b'1,A,20,45,20,inf\n', 'EXT_BIT1P1', 1),
+])
+def test_validate_upload_rejects(content, column, row):
+    with pytest.raises(UploadValidationError) as error:
+        validate_upload(content)
+    assert (error.value.column, error.value.row) == (column, row)
+
+def test_validate_upload_reads_only_a_sample():
+    content = HEADER + b'1,A,20,45,20,30\n' * 10 + b'2,B,20,4x,20,30\n'
+    validate_upload(content, sample_rows=10)
+    with pytest.raises(UploadValidationError, match='Row 11'):
+        validate_upload(content, sample_rows=11)